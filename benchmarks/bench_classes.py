@@ -0,0 +1,149 @@
+"""Allocates and accesses millions of instances of compiled classes.
+
+Each variant defines a class Point with the attributes x, y and z, builds
+a list of n points, sums their attributes outside the class and sums them
+again in a method. The variants are:
+
+    class     the attributes are assigned in __init__, so the constructor
+              creates them in a fixed order
+    slots     the same class with __slots__, whose instances are sealed
+    dynamic   the attributes are assigned after the instance is created,
+              in an order that depends on the point, which gives the
+              instances different layouts in the javascript engine
+
+Each variant also runs compiled with inline caches. The compiled code is
+run with node, which must be installed, and the time of each phase and
+the heap use of the points are reported.
+
+    $ python benchmarks/bench_classes.py [n]
+"""
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from pyjs import pyjs
+
+CLASS = """
+class Point:
+    def __init__(self, x, y, z):
+        self.x = x
+        self.y = y
+        self.z = z
+
+    def sum(self):
+        return self.x + self.y + self.z
+
+def make(i):
+    return Point(i, i + 1, i + 2)
+"""
+
+SLOTS = """
+class Point(object):
+    __slots__ = ("x", "y", "z")
+
+    def __init__(self, x, y, z):
+        self.x = x
+        self.y = y
+        self.z = z
+
+    def sum(self):
+        return self.x + self.y + self.z
+
+def make(i):
+    return Point(i, i + 1, i + 2)
+"""
+
+DYNAMIC = """
+class Point:
+    def sum(self):
+        return self.x + self.y + self.z
+
+def make(i):
+    p = Point()
+    r = i & 3
+    if r == 0:
+        p.x = i
+        p.y = i + 1
+        p.z = i + 2
+    elif r == 1:
+        p.z = i + 2
+        p.y = i + 1
+        p.x = i
+    else:
+        p.y = i + 1
+        p.x = i
+        p.z = i + 2
+    return p
+"""
+
+PHASES = """
+def build(n):
+    points = []
+    for i in xrange(n):
+        points.append(make(i))
+    return points
+
+def access(points):
+    total = 0
+    for p in points:
+        total += p.x + p.y + p.z
+    return total
+
+def call(points):
+    total = 0
+    for p in points:
+        total += p.sum()
+    return total
+"""
+
+# prints the time of each phase in ms and the heap use of the points in KB
+HARNESS = """
+%(runtime)s
+%(code)s
+function timed(f) {
+    var t0 = Date.now();
+    var result = f();
+    return [result, Date.now() - t0];
+}
+// warms up the functions
+call(build(1000));
+access(build(1000));
+global.gc();
+var base = process.memoryUsage().heapUsed;
+var built = timed(function() { return build(%(n)d); });
+global.gc();
+var heap = process.memoryUsage().heapUsed - base;
+var accessed = timed(function() { return access(built[0]); });
+var called = timed(function() { return call(built[0]); });
+console.log(built[1] + " " + accessed[1] + " " + called[1] + " " + Math.round(heap / 1024));
+"""
+
+VARIANTS = [("class", CLASS), ("slots", SLOTS), ("dynamic", DYNAMIC)]
+
+def run(tmpdir, code, n, inline_caches=False):
+    runtime = open(os.path.join(os.path.dirname(pyjs.__file__), "py.js")).read()
+    js = HARNESS % dict(runtime=runtime, code=pyjs.compile(code + PHASES, inline_caches=inline_caches), n=n)
+    path = os.path.join(tmpdir, "bench.js")
+    f = open(path, "w")
+    f.write(js)
+    f.close()
+    return [int(x) for x in subprocess.check_output(["node", "--expose-gc", path]).split()]
+
+def main():
+    n = len(sys.argv) > 1 and int(sys.argv[1]) or 2000000
+    tmpdir = tempfile.mkdtemp()
+    try:
+        print "%d points" % n
+        print "%-16s %10s %10s %10s %10s" % ("variant", "build ms", "access ms", "call ms", "heap KB")
+        for name, code in VARIANTS:
+            for inline_caches in [False, True]:
+                build, access, call, heap = run(tmpdir, code, n, inline_caches)
+                print "%-16s %10d %10d %10d %10d" % (name + (inline_caches and "+ic" or ""), build, access, call, heap)
+    finally:
+        shutil.rmtree(tmpdir)
+
+if __name__ == "__main__":
+    main()
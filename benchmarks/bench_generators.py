@@ -0,0 +1,96 @@
+"""Compares the memory use of a pipeline of generators with the same
+pipeline built with lists.
+
+Both pipelines compute the sum of the squares of n numbers. The list
+version builds a list at each stage, while the generators pass on one item
+at a time. The compiled code is run with node, which must be installed,
+and the peak heap use while consuming the items is reported.
+
+    $ python benchmarks/bench_generators.py [n]
+"""
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from pyjs import pyjs
+
+LISTS = """
+def numbers(n):
+    result = []
+    for i in xrange(n):
+        result.append(i)
+    return result
+
+def squares(items):
+    result = []
+    for x in items:
+        result.append(x * x)
+    return result
+"""
+
+GENERATORS = """
+def numbers(n):
+    for i in xrange(n):
+        yield i
+
+def squares(items):
+    for x in items:
+        yield x * x
+"""
+
+CONSUMER = """
+def total(items):
+    t = 0
+    for x in items:
+        t = t + x
+        probe()
+    return t
+"""
+
+# samples the heap every 1000 items and prints the peak heap use above
+# the heap use at the start in KB and the time in ms
+HARNESS = """
+var window = {}, nil = null;
+%(runtime)s
+var py = window.py;
+var count = 0, peak = 0;
+function probe() {
+    if (++count %% 1000 === 0) {
+        peak = Math.max(peak, process.memoryUsage().heapUsed);
+    }
+}
+%(code)s
+global.gc();
+var base = process.memoryUsage().heapUsed;
+var t0 = Date.now();
+total(squares(numbers(%(n)d)));
+console.log(Math.round((peak - base) / 1024) + " " + (Date.now() - t0));
+"""
+
+def run(tmpdir, code, n, target="es5"):
+    runtime = open(os.path.join(os.path.dirname(pyjs.__file__), "py.js")).read()
+    js = HARNESS % dict(runtime=runtime, code=pyjs.compile(code + CONSUMER, target=target), n=n)
+    path = os.path.join(tmpdir, "bench.js")
+    f = open(path, "w")
+    f.write(js)
+    f.close()
+    memory, t = subprocess.check_output(["node", "--expose-gc", path]).split()
+    return int(memory), int(t)
+
+def main():
+    n = len(sys.argv) > 1 and int(sys.argv[1]) or 1000000
+    tmpdir = tempfile.mkdtemp()
+    try:
+        print "%d items" % n
+        print "%-16s %12s %10s" % ("pipeline", "peak KB", "time ms")
+        for name, code, target in [("lists", LISTS, "es5"), ("generators", GENERATORS, "es5"), ("generators-es6", GENERATORS, "es6")]:
+            memory, t = run(tmpdir, code, n, target)
+            print "%-16s %12d %10d" % (name, memory, t)
+    finally:
+        shutil.rmtree(tmpdir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Compares the slotted IR nodes with the nodes of the compiler package.
+
+Each case of the benchmark suite is parsed by the "ast" frontend twice,
+once into IR nodes and once into compiler.ast nodes, and the peak memory
+of compiling it, the time to walk the tree with getChildNodes and the
+code generation time are reported for both.
+
+    $ python benchmarks/bench_ir.py [--scale 4]
+
+Each case runs in a new process, so that the memory of one tree doesn't
+hide that of the next. Peak memory is the maximum resident set size of
+the process while parsing and compiling the first time, minus its size
+before. The times are the best of three runs.
+"""
+import os
+import sys
+import time
+import optparse
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from pyjs import pyjs, profiling, frontend
+from compiler import ast
+import corpus
+import suite
+
+def walk(tree):
+    """Returns the number of nodes in tree."""
+    n = 0
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        n += 1
+        stack.extend(node.getChildNodes())
+    return n
+
+def get_memory():
+    """Returns the resident set size of this process in KB."""
+    for line in open("/proc/self/status"):
+        if line.startswith("VmRSS:"):
+            return int(line.split()[1])
+
+def worker(kind, size, nodes, repeat=3):
+    """Prints the peak memory, node count, walk time and codegen time of
+    compiling one case into the given kind of nodes.
+    """
+    if nodes == "compiler.ast":
+        # the frontend looks up the node classes in the ir module
+        frontend.ir = ast
+    code = corpus.generate(kind, size)
+    base = get_memory()
+
+    codegen = None
+    for i in range(repeat):
+        profiler = profiling.Profiler()
+        pyjs.compile(code, frontend="ast", profile=profiler)
+        if i == 0:
+            memory = suite.get_peak_memory() - base
+        phases = profiler.report()["phases"]
+        phases.pop("parse")
+        t = sum(phases.values())
+        if codegen is None or t < codegen:
+            codegen = t
+
+    tree = frontend.parse(code, frontend="ast")
+    walk_time = None
+    for i in range(repeat):
+        t0 = time.time()
+        count = walk(tree)
+        t = time.time() - t0
+        if walk_time is None or t < walk_time:
+            walk_time = t
+    print memory, count, walk_time, codegen
+
+def run(kind, size, nodes):
+    cmd = [sys.executable, __file__, "--worker", kind, str(size), nodes]
+    memory, count, walk_time, codegen = subprocess.check_output(cmd).split()
+    return int(memory), int(count), float(walk_time), float(codegen)
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option("--scale", type="float", default=1.0)
+    parser.add_option("--worker", action="store_true")
+    options, args = parser.parse_args()
+
+    if options.worker:
+        kind, size, nodes = args
+        worker(kind, int(size), nodes)
+        return
+
+    print "%-16s %-13s %10s %12s %10s %10s" % ("case", "nodes", "count", "peak KB", "walk s", "codegen s")
+    for name, kind, size in corpus.get_cases(options.scale):
+        for nodes in ["compiler.ast", "ir"]:
+            memory, count, walk_time, codegen = run(kind, size, nodes)
+            print "%-16s %-13s %10d %12d %10.4f %10.4f" % (name, nodes, count, memory, walk_time, codegen)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Compares the size of the generated code and the compile time with and 
+without minification.
+
+Compiles the modules of the python standard library that pyjs can compile.
+
+    $ python benchmarks/bench_minify.py [limit]
+"""
+import os
+import sys
+import glob
+import time
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+import pyjs
+
+def load_corpus(limit):
+    libdir = os.path.dirname(os.__file__)
+    corpus = []
+    for path in sorted(glob.glob(os.path.join(libdir, "*.py"))):
+        code = open(path).read()
+        try:
+            pyjs.compile(code)
+        except Exception:
+            continue
+        corpus.append(code)
+        if len(corpus) == limit:
+            break
+    return corpus
+
+def bench(corpus, minify, repeat=3):
+    times = []
+    for i in range(repeat):
+        t0 = time.time()
+        output = [pyjs.compile(code, minify=minify) for code in corpus]
+        times.append(time.time() - t0)
+    js = "\n".join(output)
+    return len(js), len(zlib.compress(js, 9)), min(times)
+
+def main():
+    limit = len(sys.argv) > 1 and int(sys.argv[1]) or 100
+    corpus = load_corpus(limit)
+    print "%d modules, %d bytes of python" % (len(corpus), sum(len(c) for c in corpus))
+    print "%-10s %12s %12s %10s" % ("mode", "size", "compressed", "time")
+    for name, minify in [("default", False), ("minify", True)]:
+        size, compressed, t = bench(corpus, minify)
+        print "%-10s %12d %12d %10.3f" % (name, size, compressed, t)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Micro-benchmarks for the functions of the runtime.
+
+Runs each benchmark with a javascript engine, node by default, and reports
+the time per operation in nanoseconds. Some of them have a baseline with
+the closest native javascript, like a plain object for a dict with
+string keys.
+
+    $ python benchmarks/bench_runtime.py [--engine d8] [--scale 0.1]
+
+The engine is run with a single file that contains the runtime and the
+benchmarks, so any engine that prints with console.log or print works.
+"""
+import os
+import sys
+import shutil
+import optparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from pyjs import pyjs
+
+# name, setup and body of the benchmarks, the body runs n times with i
+# from 0 to n - 1; the getattr benchmarks compare py.getattr with the
+# inline caches of compile(code, inline_caches=True)
+BENCHMARKS = [
+    ("dict-set-str", "var d = py.dict(), keys = strings(n);", "d.__setitem__(keys[i], i);"),
+    ("object-set-str", "var d = {}, keys = strings(n);", "d[keys[i]] = i;"),
+    ("dict-get-str", "var d = py.dict(), keys = strings(1000); fill(d, keys);", "sink += d.__getitem__(keys[i % 1000]);"),
+    ("object-get-str", "var d = {}, keys = strings(1000); for (var j = 0; j < 1000; j++) d[keys[j]] = j;", "sink += d[keys[i % 1000]];"),
+    ("dict-set-int", "var d = py.dict();", "d.__setitem__(i, i);"),
+    ("dict-get-int", "var d = py.dict(); for (var j = 0; j < 1000; j++) d.__setitem__(j, j);", "sink += d.__getitem__(i % 1000);"),
+    ("dict-set-tuple", "var d = py.dict();", "d.__setitem__([i, 'x'], i);"),
+    ("dict-get-tuple", "var d = py.dict(), keys = tuples(1000); fill(d, keys);", "sink += d.__getitem__(keys[i % 1000]);"),
+    ("iter-array", "var a = strings(1000);", "var it = py.iter(a), x; while ((x = it.next()) !== py.stop) sink++;"),
+    ("native-array", "var a = strings(1000);", "for (var j = 0, m = a.length; j < m; j++) sink++;"),
+    ("iter-dict", "var d = py.dict(); fill(d, strings(1000));", "var it = py.iter(d), x; while ((x = it.next()) !== py.stop) sink++;"),
+    ("in-array-int", "var a = []; for (var j = 0; j < 100; j++) a.push(j);", "if (py.in(i % 200, a)) sink++;"),
+    ("in-array-tuple", "var a = tuples(100);", "if (py.in([i % 200, 'x'], a)) sink++;"),
+    ("in-str", "var s = strings(100).join(' ');", "if (py.in('k' + (i % 200), s)) sink++;"),
+    ("in-dict", "var d = py.dict(), keys = strings(200); fill(d, keys.slice(0, 100));", "if (py.in(keys[i % 200], d)) sink++;"),
+    ("floordiv", "", "sink += py.floordiv(i, 7);"),
+    ("getattr", "var o = {x: 1};", "sink += py.getattr(o, 'x');"),
+    ("getattr-ic", "var o = {x: 1}, c = cache('x');", "sink += c.get(o);"),
+    ("getattr-4-shapes", "var a = shapes(4, 'x');", "sink += py.getattr(a[i & 3], 'x');"),
+    ("getattr-ic-4-shapes", "var a = shapes(4, 'x'), c = cache('x');", "sink += c.get(a[i & 3]);"),
+    ("getattr-8-shapes", "var a = shapes(8, 'x');", "sink += py.getattr(a[i & 7], 'x');"),
+    ("getattr-ic-8-shapes", "var a = shapes(8, 'x'), c = cache('x');", "sink += c.get(a[i & 7]);"),
+    ("getattr-method", "var d = py.dict();", "sink += py.getattr(d, 'get') !== null;"),
+    ("getattr-ic-method", "var d = py.dict(), c = cache('get');", "sink += c.get(d) !== null;"),
+    ("repr-list", "var a = [1, 'a', [2, 3], null];", "sink += py.repr(a).length;"),
+]
+
+# operations per benchmark at scale 1; iterating over 1000 items counts as one
+OPERATIONS = {"iter-array": 10000, "native-array": 10000, "iter-dict": 10000}
+DEFAULT_OPERATIONS = 1000000
+
+HARNESS = """
+var log = typeof console !== "undefined" ? function(s) { console.log(s); } : print;
+var sink = 0;
+function strings(n) {
+    var result = [];
+    for (var i = 0; i < n; i++) result.push("k" + i);
+    return result;
+}
+function tuples(n) {
+    var result = [];
+    for (var i = 0; i < n; i++) result.push([i, "x"]);
+    return result;
+}
+function shapes(n, name) {
+    // objects with the attribute name and n different prototypes
+    var result = [];
+    for (var i = 0; i < n; i++) {
+        var C = function() { this[name] = 1; };
+        result.push(new C());
+    }
+    return result;
+}
+function cache(name) {
+    return py.inline_caches([name], [name])[0];
+}
+function megamorphic() {
+    // calls py.getattr and inline caches with many attributes and
+    // prototypes, like compiled code does from all of its sites
+    for (var i = 0; i < 50; i++) {
+        var a = shapes(4, "a" + i), c = cache("a" + i);
+        for (var j = 0; j < 100; j++) {
+            sink += py.getattr(a[j & 3], "a" + i) + c.get(a[j & 3]);
+        }
+    }
+}
+function fill(d, keys) {
+    for (var i = 0; i < keys.length; i++) d.__setitem__(keys[i], i);
+}
+function bench(name, n, f) {
+    // runs f once to warm up and once more to measure
+    f(Math.min(n, 1000));
+    var t0 = Date.now();
+    f(n);
+    var t = Date.now() - t0;
+    log(name + " " + (t * 1e6 / n).toFixed(1));
+}
+"""
+
+def generate(scale):
+    """Returns the javascript of the benchmarks."""
+    runtime = open(os.path.join(os.path.dirname(pyjs.__file__), "py.js")).read()
+    parts = [runtime, HARNESS]
+    parts.append("megamorphic();")
+    for name, setup, body in BENCHMARKS:
+        n = max(1, int(OPERATIONS.get(name, DEFAULT_OPERATIONS) * scale))
+        parts.append('bench("%s", %d, function(n) { %s for (var i = 0; i < n; i++) { %s } });' % (name, n, setup, body))
+    return "\n".join(parts) + "\n"
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option("--engine", default="node", help="javascript engine to run the benchmarks with")
+    parser.add_option("--scale", type="float", default=1.0, help="multiplies the number of operations")
+    options, args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmpdir, "bench_runtime.js")
+        f = open(path, "w")
+        f.write(generate(options.scale))
+        f.close()
+        output = subprocess.check_output([options.engine, path])
+    finally:
+        shutil.rmtree(tmpdir)
+
+    print "%-20s %10s" % ("benchmark", "ns/op")
+    for line in output.splitlines():
+        name, t = line.split()
+        print "%-20s %10s" % (name, t)
+
+if __name__ == "__main__":
+    main()
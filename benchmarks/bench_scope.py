@@ -0,0 +1,57 @@
+"""Benchmark for the scope analysis of deeply nested and very long functions.
+
+    $ python benchmarks/bench_scope.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+import pyjs
+from pyjs import frontend
+
+def nested_functions(depth, statements=5):
+    """Returns code with functions nested depth levels deep."""
+    lines = []
+    for i in range(depth):
+        indent = "    " * i
+        lines.append("%sdef f%d(a%d):" % (indent, i, i))
+        for j in range(statements):
+            lines.append("%s    x%d = a%d + %d" % (indent, j, i, j))
+    lines.append("    " * depth + "return x0")
+    return "\n".join(lines)
+
+def long_function(statements):
+    """Returns code with a single function with many statements."""
+    lines = ["def f(a):"]
+    for j in range(statements):
+        lines.append("    x%d = a * %d + x%d" % (j % 100, j, (j + 1) % 100))
+        lines.append("    if x%d > a:" % (j % 100))
+        lines.append("        a += 1")
+    lines.append("    return a")
+    return "\n".join(lines)
+
+def timeit(f, *args):
+    """Returns the best time of 3 runs of f(*args)."""
+    times = []
+    for i in range(3):
+        t0 = time.time()
+        f(*args)
+        times.append(time.time() - t0)
+    return min(times)
+
+def main():
+    cases = [
+        ("nested-10", nested_functions(10)),
+        ("nested-50", nested_functions(50)),
+        ("long-1000", long_function(1000)),
+        ("long-5000", long_function(5000)),
+    ]
+    print "%-12s %8s %10s %10s" % ("case", "bytes", "parse", "codegen")
+    for name, code in cases:
+        parse = timeit(frontend.parse, code)
+        total = timeit(pyjs.compile, code)
+        print "%-12s %8d %10.4f %10.4f" % (name, len(code), parse, total - parse)
+
+if __name__ == "__main__":
+    main()
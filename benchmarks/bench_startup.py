@@ -0,0 +1,93 @@
+"""Compares the startup time of lazy and eager bundles.
+
+Generates an application whose entry module imports a few modules at
+startup and many more only inside functions, as code for rarely used
+features would. Every module defines functions and does some work when it
+runs. The bundles are run with node, which must be installed, and the time
+to load the runtime and the bundle is reported.
+
+    $ python benchmarks/bench_startup.py [modules]
+"""
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from pyjs import bundle
+import corpus
+
+# number of modules imported by the entry module at startup
+STARTUP_MODULES = 3
+
+# runs the javascript file given as argument repeat times, each time in a new
+# function so that no module is cached, and prints the best time in ms
+HARNESS = """
+var fs = require("fs");
+var source = fs.readFileSync(process.argv[2], "utf8");
+var repeat = parseInt(process.argv[3]);
+var best = null;
+for (var i = 0; i < repeat; i++) {
+    var t0 = process.hrtime();
+    new Function("window", source)({});
+    var t = process.hrtime(t0);
+    var ms = t[0] * 1e3 + t[1] / 1e6;
+    if (best === null || ms < best) {
+        best = ms;
+    }
+}
+console.log(best);
+"""
+
+def make_app(root, n):
+    """Writes the entry module main and n other modules to root."""
+    lines = []
+    for i in range(n):
+        if i < STARTUP_MODULES:
+            lines.append("import m%d" % i)
+        else:
+            lines.append("def feature%d():" % i)
+            lines.append("    import m%d" % i)
+            lines.append("    return m%d.total" % i)
+    lines.append("features = [%s]" % ", ".join("feature%d" % i for i in range(STARTUP_MODULES, n)))
+    write(os.path.join(root, "main.py"), "\n".join(lines) + "\n")
+
+    for i in range(n):
+        code = corpus.generate("functions", 20)
+        code += "total = 0\nfor i in range(2000):\n    total = total + i * i\n"
+        code += "exported = [%s]\n" % ", ".join("f%d" % j for j in range(20))
+        write(os.path.join(root, "m%d.py" % i), code)
+
+def write(path, text):
+    f = open(path, "w")
+    f.write(text)
+    f.close()
+
+def run(tmpdir, js, repeat):
+    runtime = open(os.path.join(os.path.dirname(bundle.__file__), "py.js")).read()
+    path = os.path.join(tmpdir, "bundle.js")
+    write(path, runtime + "var py = window.py;\n" + js)
+    harness = os.path.join(tmpdir, "harness.js")
+    write(harness, HARNESS)
+    cmd = ["node", harness, path, str(repeat)]
+    return float(subprocess.check_output(cmd))
+
+def main():
+    n = len(sys.argv) > 1 and int(sys.argv[1]) or 50
+    tmpdir = tempfile.mkdtemp()
+    try:
+        root = os.path.join(tmpdir, "src")
+        os.mkdir(root)
+        make_app(root, n)
+
+        print "%d modules, %d imported at startup" % (n, STARTUP_MODULES)
+        print "%-10s %10s %10s" % ("mode", "size", "time ms")
+        for name, lazy in [("eager", False), ("lazy", True)]:
+            js = bundle.bundle("main", root, lazy=lazy)
+            print "%-10s %10d %10.2f" % (name, len(js), run(tmpdir, js, 20))
+    finally:
+        shutil.rmtree(tmpdir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Micro-benchmark for the visitor core.
+
+Reports the number of AST nodes visited per second while generating code.
+
+    $ python benchmarks/bench_visitor.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from pyjs import pyjs, scope, frontend
+
+def count_nodes(tree):
+    n = 0
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        n += 1
+        stack.extend(node.getChildNodes())
+    return n
+
+def wide_module(n):
+    return "\n".join("x%d = a * %d + b / %d - f(c, %d)" % (i, i, i+1, i) for i in range(n))
+
+def long_chain(n):
+    return "x = " + " + ".join("a%d" % i for i in range(n))
+
+def nested_blocks(depth, n):
+    lines = []
+    for i in range(depth):
+        lines.append("    " * i + "if x%d > %d:" % (i, i))
+        lines.append("    " * (i+1) + "y = x%d * %d" % (i, i))
+    code = "\n".join(lines) + "\n"
+    return code * n
+
+def bench(code, repeat=5):
+    tree = frontend.parse('""\n' + code)
+    scopes = scope.analyze(tree)
+    nodes = count_nodes(tree)
+
+    times = []
+    for i in range(repeat):
+        t0 = time.time()
+        pyjs.Visitor(scopes).visit(tree)
+        times.append(time.time() - t0)
+    return nodes, min(times)
+
+def main():
+    cases = [
+        ("wide-5000", wide_module(5000)),
+        ("chain-20000", long_chain(20000)),
+        ("nested-20x500", nested_blocks(20, 500)),
+    ]
+    print "%-15s %10s %10s %14s" % ("case", "nodes", "time", "nodes/s")
+    for name, code in cases:
+        nodes, t = bench(code)
+        print "%-15s %10d %10.4f %14.0f" % (name, nodes, t, nodes / t)
+
+if __name__ == "__main__":
+    main()
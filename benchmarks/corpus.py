@@ -0,0 +1,86 @@
+"""Generator of synthetic python modules for benchmarking the compiler.
+
+Each generator takes a size and returns python code that stresses one
+part of the compiler.
+
+    >>> code = corpus.generate("wide", 1000)
+"""
+
+def wide_module(n):
+    """Module with n simple top-level statements."""
+    lines = []
+    for i in range(n):
+        lines.append("x%d = a * %d + b / %d - f(c, %d)" % (i, i, i + 1, i))
+    return "\n".join(lines) + "\n"
+
+def wide_functions(n):
+    """Module with n small functions."""
+    lines = []
+    for i in range(n):
+        lines.append("def f%d(a, b):" % i)
+        lines.append("    x = a + b * %d" % i)
+        lines.append("    for i in range(x):")
+        lines.append("        if i > b:")
+        lines.append("            break")
+        lines.append("    return x")
+    return "\n".join(lines) + "\n"
+
+def nested_functions(depth, statements=5):
+    """Functions nested depth levels deep."""
+    lines = []
+    for i in range(depth):
+        indent = "    " * i
+        lines.append("%sdef f%d(a%d):" % (indent, i, i))
+        for j in range(statements):
+            lines.append("%s    x%d = a%d + %d" % (indent, j, i, j))
+    lines.append("    " * depth + "return x0")
+    return "\n".join(lines) + "\n"
+
+def expression_chain(n):
+    """A single expression with n operands."""
+    return "x = " + " + ".join("a%d * %d" % (i, i) for i in range(n)) + "\n"
+
+def dict_literal(n):
+    """A dict literal with n items."""
+    items = ",\n    ".join('"key%d": %d' % (i, i) for i in range(n))
+    return "d = {\n    %s\n}\n" % items
+
+def list_literal(n):
+    """A list literal with n items."""
+    items = ",\n    ".join("[%d, %d.5, \"s%d\"]" % (i, i, i) for i in range(n))
+    return "l = [\n    %s\n]\n" % items
+
+GENERATORS = {
+    "wide": wide_module,
+    "functions": wide_functions,
+    "nested": nested_functions,
+    "chain": expression_chain,
+    "dict": dict_literal,
+    "list": list_literal,
+}
+
+# (name, generator, size) of the cases of the benchmark suite at scale 1
+CASES = [
+    ("wide-2000", "wide", 2000),
+    ("functions-500", "functions", 500),
+    ("nested-50", "nested", 50),
+    ("chain-2000", "chain", 2000),
+    ("dict-5000", "dict", 5000),
+    ("list-5000", "list", 5000),
+]
+
+def generate(kind, size):
+    return GENERATORS[kind](size)
+
+def get_cases(scale=1.0):
+    """Returns (name, kind, size) of the benchmark cases with the sizes
+    multiplied by scale. Nesting depth is not scaled, because python
+    can't parse much deeper code.
+    """
+    cases = []
+    for name, kind, size in CASES:
+        if kind != "nested":
+            size = max(1, int(size * scale))
+            name = "%s-%d" % (kind, size)
+        cases.append((name, kind, size))
+    return cases
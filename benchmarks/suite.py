@@ -0,0 +1,155 @@
+"""Benchmark suite for the throughput and memory use of the compiler.
+
+Compiles the synthetic modules generated by corpus.py and reports parse
+time, code generation time, peak memory and output bytes per KB of input
+for each of them.
+
+    $ python benchmarks/suite.py --save baseline.json
+    $ python benchmarks/suite.py --compare baseline.json
+    $ python benchmarks/suite.py --frontend compiler --compare baseline.json
+
+benchmarks/baseline.json has the results of the default options for the 
+current version. The times and the memory depend on the machine, so 
+compare with a baseline saved on the same machine before trusting small 
+changes; the sizes of the output don't.
+
+Code generation time includes optimization and scope analysis. Peak memory
+is the maximum resident set size of a process that compiles the case minus
+that of a process that compiles an empty module.
+"""
+import os
+import sys
+import json
+import optparse
+import resource
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from pyjs import pyjs, profiling, frontend
+import corpus
+
+FIELDS = ["parse", "codegen", "memory", "ratio"]
+
+def run_case(kind, size, repeat):
+    """Returns the results for one case as a dictionary."""
+    code = corpus.generate(kind, size)
+
+    parse = codegen = None
+    for i in range(repeat):
+        profiler = profiling.Profiler()
+        js = pyjs.compile(code, profile=profiler)
+        phases = profiler.report()["phases"]
+        t = phases.pop("parse")
+        if parse is None or t < parse:
+            parse = t
+        t = sum(phases.values())
+        if codegen is None or t < codegen:
+            codegen = t
+
+    return {
+        "input": len(code),
+        "output": len(js),
+        "parse": parse,
+        "codegen": codegen,
+        "memory": measure_memory(code) - measure_memory(""),
+        "ratio": len(js) / (len(code) / 1024.0),
+    }
+
+_memory = {}
+
+def measure_memory(code):
+    """Returns the peak memory of a process that compiles code in KB.
+
+    The code is compiled in a new process, so that the memory of the 
+    earlier cases doesn't hide it. The process reads the code from a file
+    instead of generating it, so that only the memory of the compiler 
+    adds to the size of the code.
+    """
+    if code in _memory:
+        return _memory[code]
+
+    fd, path = tempfile.mkstemp(suffix=".py")
+    try:
+        os.write(fd, code)
+        os.close(fd)
+        cmd = [sys.executable, __file__, "--memory", path, "--frontend", frontend.DEFAULT]
+        _memory[code] = int(subprocess.check_output(cmd))
+        return _memory[code]
+    finally:
+        os.remove(path)
+
+def memory_worker(path):
+    pyjs.compile(open(path).read())
+    print get_peak_memory()
+
+def get_peak_memory():
+    """Returns the peak resident set size of this process in KB."""
+    # on linux, ru_maxrss includes the memory of the parent process at the
+    # time of fork, but VmHWM is reset when the process starts
+    if os.path.exists("/proc/self/status"):
+        for line in open("/proc/self/status"):
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def run(scale, repeat):
+    results = {}
+    for name, kind, size in corpus.get_cases(scale):
+        results[name] = run_case(kind, size, repeat)
+    return results
+
+def format_results(results, baseline=None):
+    lines = []
+    header = "%-16s %8s %10s %10s %10s %10s" % ("case", "input", "parse", "codegen", "memory KB", "bytes/KB")
+    lines.append(header)
+    for name in sorted(results):
+        r = results[name]
+        lines.append("%-16s %8d %10.4f %10.4f %10d %10.1f" % (name, r["input"], r["parse"], r["codegen"], r["memory"], r["ratio"]))
+        if baseline and name in baseline:
+            b = baseline[name]
+            changes = tuple(format_change(r[f], b[f]) for f in FIELDS)
+            lines.append("%-16s %8s %10s %10s %10s %10s" % (("", "") + changes))
+    return "\n".join(lines)
+
+def format_change(value, base):
+    """Formats the change from base to value as a percentage."""
+    if not base:
+        return "-"
+    return "%+.1f%%" % ((value - base) * 100.0 / base)
+
+def main():
+    parser = optparse.OptionParser(usage="python benchmarks/suite.py [options]")
+    parser.add_option("--scale", type="float", default=1.0,
+        help="multiply the sizes of the generated modules by SCALE")
+    parser.add_option("--repeat", type="int", default=3,
+        help="number of runs of each case, the best time is reported")
+    parser.add_option("--save", metavar="FILE",
+        help="save the results as JSON in FILE")
+    parser.add_option("--compare", metavar="FILE",
+        help="compare the results with the results saved in FILE")
+    parser.add_option("--frontend", default=frontend.DEFAULT,
+        help="parse with the FRONTEND, ast or compiler [default: %default]")
+    parser.add_option("--memory", metavar="FILE",
+        help=optparse.SUPPRESS_HELP)
+    options, args = parser.parse_args()
+    frontend.DEFAULT = options.frontend
+
+    if options.memory:
+        memory_worker(options.memory)
+        return
+
+    results = run(options.scale, options.repeat)
+
+    baseline = None
+    if options.compare:
+        baseline = json.load(open(options.compare))["results"]
+    print format_results(results, baseline)
+
+    if options.save:
+        f = open(options.save, "w")
+        json.dump({"version": pyjs.__version__, "scale": options.scale, "frontend": options.frontend, "results": results}, f, indent=4, sort_keys=True, separators=(",", ": "))
+        f.close()
+
+if __name__ == "__main__":
+    main()
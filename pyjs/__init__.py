@@ -1,4 +1,6 @@
 """pyjs: Python to Javascript compiler.
 """
 
-from pyjs import compile
+from pyjs import compile, compile_to, CompilerError, __version__
+from cache import Cache
+from incremental import IncrementalCompiler
@@ -0,0 +1,4 @@
+import sys
+import batch
+
+sys.exit(batch.main())
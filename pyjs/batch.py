@@ -0,0 +1,250 @@
+"""Batch compiler.
+
+Compiles python files into javascript using a pool of processes.
+
+    $ python -m pyjs src/ lib/*.py -o build/js
+
+Or bundles a module and the modules it imports into a single file.
+
+    $ python -m pyjs src/ --bundle app.main -o build/app.js
+"""
+import os
+import sys
+import glob
+import json
+import time
+import optparse
+import multiprocessing
+
+import pyjs
+import profiling
+import bundle
+from cache import Cache
+
+def find_sources(paths):
+    """Returns (source, basedir) for all python files specified by paths.
+
+    Each path can be a file, a directory or a glob pattern. Directories are
+    searched recursively. The basedir is used to decide the location of the
+    output file when an output directory is specified.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for f in sorted(filenames):
+                    if f.endswith(".py"):
+                        yield os.path.join(dirpath, f), path
+        elif glob.has_magic(path):
+            for p in sorted(glob.glob(path)):
+                for source in find_sources([p]):
+                    yield source
+        else:
+            yield path, os.path.dirname(path)
+
+def get_target(source, basedir, outdir=None):
+    """Returns path of the javascript file for the given source."""
+    name = os.path.splitext(source)[0] + ".js"
+    if outdir:
+        return os.path.join(outdir, os.path.relpath(name, basedir))
+    else:
+        return name
+
+def is_uptodate(source, target):
+    return os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source)
+
+# the file that records the options of the last build of each of the
+# javascript files in a directory
+STAMP = ".pyjs-build"
+
+def get_stamp(basedir, outdir=None):
+    """Returns the path of the file that records the options of the build
+    of the sources in basedir.
+    """
+    return os.path.join(outdir or basedir or ".", STAMP)
+
+def get_build_options(options):
+    """Returns the options that change the output of the compiler."""
+    return {"version": pyjs.get_fingerprint(), "minify": options.minify}
+
+def read_stamp(path):
+    """Returns the build options recorded in path by the path of the 
+    javascript file relative to the directory of path.
+    """
+    try:
+        f = open(path)
+    except IOError:
+        return {}
+    try:
+        files = json.load(f)
+    except ValueError:
+        return {}
+    finally:
+        f.close()
+    return isinstance(files, dict) and files or {}
+
+def write_stamp(path, files):
+    dirname = os.path.dirname(path)
+    if dirname and not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    f = open(path, "w")
+    try:
+        json.dump(files, f, sort_keys=True)
+    finally:
+        f.close()
+
+_cache = None
+_minify = False
+_profile = False
+
+def init_worker(cache_dir, minify=False, profile=False):
+    global _cache, _minify, _profile
+    if cache_dir:
+        _cache = Cache(cache_dir)
+    _minify = minify
+    _profile = profile
+
+def compile_file((source, target)):
+    """Compiles source and writes the result to target.
+
+    Returns (source, input size, output size, error message, profile report).
+    """
+    try:
+        code = open(source).read()
+        report = None
+        if _profile:
+            js, report = pyjs.compile(code, minify=_minify, profile=True)
+        else:
+            js = pyjs.compile(code, cache=_cache, minify=_minify)
+
+        dirname = os.path.dirname(target)
+        if dirname and not os.path.isdir(dirname):
+            try:
+                os.makedirs(dirname)
+            except OSError:
+                # created by another worker
+                pass
+
+        f = open(target, "w")
+        try:
+            f.write(js)
+        finally:
+            f.close()
+        return source, len(code), len(js), None, report
+    except Exception, e:
+        return source, 0, 0, "%s: %s" % (e.__class__.__name__, e), None
+
+def make_parser():
+    parser = optparse.OptionParser(usage="python -m pyjs [options] path...")
+    parser.add_option("-o", "--output", dest="outdir", metavar="DIR",
+        help="write javascript files into DIR instead of next to the sources or, with --bundle, the bundle into the file DIR")
+    parser.add_option("-j", "--jobs", type="int", default=multiprocessing.cpu_count(),
+        help="number of processes to use [default: number of cores]")
+    parser.add_option("-f", "--force", action="store_true", default=False,
+        help="compile even the files that are up-to-date")
+    parser.add_option("--cache", dest="cache_dir", metavar="DIR",
+        help="use compilation cache stored in DIR")
+    parser.add_option("--minify", action="store_true", default=False,
+        help="generate minified javascript")
+    parser.add_option("--profile", action="store_true", default=False,
+        help="print the time spent in each phase and for each type of node")
+    parser.add_option("--bundle", metavar="MODULE",
+        help="bundle MODULE and the modules it uses from the source root into the output file")
+    parser.add_option("--eager", action="store_true", default=False,
+        help="run all the modules of the bundle at startup")
+    parser.add_option("-q", "--quiet", action="store_true", default=False,
+        help="don't print the summary")
+    return parser
+
+def main(args=None):
+    parser = make_parser()
+    options, paths = parser.parse_args(args)
+    if options.bundle:
+        return main_bundle(parser, options, paths)
+    if not paths:
+        parser.error("no input files")
+
+    # the files compiled with other options are compiled again, and all 
+    # of them are compiled for the profile
+    build_options = get_build_options(options)
+    stamps = {}
+    names = {}
+    jobs = []
+    skipped = 0
+    for source, basedir in find_sources(paths):
+        target = get_target(source, basedir, options.outdir)
+        stamp = get_stamp(basedir, options.outdir)
+        if stamp not in stamps:
+            stamps[stamp] = read_stamp(stamp)
+        names[source] = stamp, os.path.relpath(target, os.path.dirname(stamp))
+        if (not options.force and not options.profile and is_uptodate(source, target)
+                and stamps[stamp].get(names[source][1]) == build_options):
+            skipped += 1
+        else:
+            jobs.append((source, target))
+
+    t0 = time.time()
+    if options.jobs > 1 and len(jobs) > 1:
+        pool = multiprocessing.Pool(options.jobs, init_worker, (options.cache_dir, options.minify, options.profile))
+        try:
+            results = pool.map(compile_file, jobs, chunksize=max(1, len(jobs) // (options.jobs * 4)))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        init_worker(options.cache_dir, options.minify, options.profile)
+        results = [compile_file(job) for job in jobs]
+    elapsed = time.time() - t0
+    
+    for source, insize, outsize, error, report in results:
+        stamp, name = names[source]
+        if error:
+            stamps[stamp].pop(name, None)
+        else:
+            stamps[stamp][name] = build_options
+    for stamp, files in stamps.items():
+        write_stamp(stamp, files)
+
+    failed = 0
+    nbytes = 0
+    for source, insize, outsize, error, report in results:
+        if error:
+            failed += 1
+            print >> sys.stderr, "%s: %s" % (source, error)
+        nbytes += insize
+
+    if not options.quiet:
+        compiled = len(results) - failed
+        print "compiled %d files (%d up-to-date, %d failed) in %.2f seconds" % (compiled, skipped, failed, elapsed)
+        if elapsed > 0:
+            print "%.1f files/s, %.1f KB/s" % (compiled / elapsed, nbytes / 1024.0 / elapsed)
+
+    if options.profile:
+        reports = [r[-1] for r in results if r[-1]]
+        print profiling.format_report(profiling.merge_reports(reports))
+
+    return failed and 1 or 0
+
+def main_bundle(parser, options, paths):
+    if len(paths) > 1:
+        parser.error("only one source root can be specified with --bundle")
+
+    b = bundle.Bundler(paths and paths[0] or ".", minify=options.minify, lazy=not options.eager)
+    try:
+        js = b.bundle(options.bundle)
+    except Exception, e:
+        print >> sys.stderr, "%s: %s" % (e.__class__.__name__, e)
+        return 1
+
+    if options.outdir:
+        f = open(options.outdir, "w")
+        f.write(js)
+        f.close()
+    else:
+        sys.stdout.write(js)
+
+    if not options.quiet:
+        print >> sys.stderr, "bundled %d modules, dropped %d unused functions" % (len(b.modules), len(b.dropped))
+        for name in b.missing:
+            print >> sys.stderr, "module not found: %s" % name
+    return 0
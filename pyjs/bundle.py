@@ -0,0 +1,391 @@
+"""Bundler.
+
+Compiles a python module and all the modules it imports from a source root
+into a single javascript file.
+
+    >>> js = bundle("app.main", root="src")
+
+Each module is compiled once into a factory function that is registered
+with py.define and runs when the module is first imported. The variables of
+the module are local to the factory, which returns the exported names of the
+module. Modules that are imported only inside functions don't run until the
+functions are called. With lazy=False, all modules run at startup instead.
+
+Top-level functions that are not used by any code reachable from the entry
+module are left out, and so are the modules that are imported only from
+such functions.
+"""
+import os
+import json
+from compiler import ast
+
+import pyjs
+import scope
+import optimizer
+import frontend
+
+class Module:
+    """A python module of a bundle."""
+    def __init__(self, name, path, code):
+        self.name = name
+        self.path = path
+        self.is_package = os.path.basename(path) == "__init__.py"
+        self.tree = frontend.parse('""\n' + code)
+        self.scopes = None
+
+        # module names bound by module-level import statements
+        self.aliases = {}
+
+        # top-level function statements by name
+        self.defs = {}
+
+    @property
+    def package(self):
+        if self.is_package:
+            return self.name
+        return self.name.rpartition(".")[0]
+
+    @property
+    def scope(self):
+        return self.scopes[self.tree]
+
+    def analyze(self):
+        self.scopes = scope.analyze(self.tree)
+
+        self.defs = {}
+        for node in self.tree.node.nodes:
+            # decorators can have side effects, so decorated functions are always kept
+            if isinstance(node, ast.Function) and not node.decorators:
+                self.defs.setdefault(node.name, []).append(node)
+
+    def get_public_names(self):
+        """Returns the names imported by from-import *."""
+        for node in self.tree.node.nodes:
+            if isinstance(node, ast.Assign) and [n.name for n in node.nodes if isinstance(n, ast.AssName)] == ["__all__"]:
+                if isinstance(node.expr, (ast.List, ast.Tuple)):
+                    return [n.value for n in node.expr.nodes if isinstance(n, ast.Const)]
+        return [name for name in self.scope.locals if not name.startswith("_")]
+
+class Bundler:
+    """Bundles modules found in the source root.
+
+    When lazy is false, every included module is imported at startup,
+    right after the entry module.
+
+    After bundling, modules is the list of included modules, dropped has
+    the full names of the functions that were left out and missing has
+    the names of imported modules that were not found.
+    """
+    def __init__(self, root=".", optimize=0, minify=False, shake=True, lazy=True):
+        self.root = root
+        self.optimize = optimize
+        self.minify = minify
+        self.shake = shake
+        self.lazy = lazy
+
+        self.loaded = {}
+        self.order = []
+        self.modules = []
+        self.dropped = []
+        self.missing = []
+
+    def find_module(self, name):
+        """Returns the path of the module with the given name or None."""
+        path = os.path.join(self.root, *name.split("."))
+        for p in [path + ".py", os.path.join(path, "__init__.py")]:
+            if os.path.isfile(p):
+                return p
+
+    def load(self, name):
+        """Loads the module and the modules it imports. Returns None if it is not found."""
+        if name in self.loaded:
+            return self.loaded[name]
+
+        path = self.find_module(name)
+        if path is None:
+            self.loaded[name] = None
+            if name not in self.missing:
+                self.missing.append(name)
+            return None
+
+        module = self.loaded[name] = Module(name, path, open(path).read())
+        module.tree = optimizer.optimize(module.tree, self.optimize)
+        self.order.append(module)
+
+        if "." in name:
+            self.load(name.rpartition(".")[0])
+        for dep in self.resolve_imports(module):
+            self.load(dep)
+        return module
+
+    def resolve(self, module, name):
+        """Returns the absolute name of the module imported as name from module.
+
+        Undotted names are looked up in the package of the module first, as
+        python 2 does.
+        """
+        if module.package and "." not in name:
+            relative = module.package + "." + name
+            if relative in self.loaded and self.loaded[relative] or self.find_module(relative):
+                return relative
+        return name
+
+    def resolve_imports(self, module):
+        """Rewrites the import statements of the module to use absolute
+        names and returns the names of the imported modules.
+        """
+        deps = []
+        stack = [module.tree]
+        while stack:
+            node = stack.pop()
+            stack.extend(node.getChildNodes())
+
+            if isinstance(node, ast.Import):
+                names = []
+                for name, asname in node.names:
+                    absname = self.resolve(module, name)
+                    if absname != name and not asname:
+                        asname = name
+                    names.append((absname, asname))
+                    deps.append(absname)
+                node.names = names
+            elif isinstance(node, ast.From) and node.modname != "__future__":
+                if node.level:
+                    parts = module.package.split(".")
+                    base = ".".join(parts[:len(parts) - node.level + 1])
+                    node.modname = base + (node.modname and base and "." or "") + node.modname
+                    node.level = 0
+                else:
+                    node.modname = self.resolve(module, node.modname)
+                deps.append(node.modname)
+
+                # the imported names can be submodules
+                for name, asname in node.names:
+                    if name != "*" and self.find_module(node.modname + "." + name):
+                        deps.append(node.modname + "." + name)
+        return deps
+
+    def expand_star_imports(self, module):
+        """Replaces the names of from-import * with the public names of
+        the module. Returns True if anything was replaced.
+        """
+        changed = False
+        stack = [module.tree]
+        while stack:
+            node = stack.pop()
+            stack.extend(node.getChildNodes())
+            if isinstance(node, ast.From) and node.names == [("*", None)]:
+                m = self.loaded.get(node.modname)
+                names = m and m.get_public_names() or []
+                node.names = [(name, None) for name in names]
+                changed = True
+        return changed
+
+    def analyze(self):
+        for m in self.order:
+            m.analyze()
+        for m in self.order:
+            if self.expand_star_imports(m):
+                m.analyze()
+
+        for m in self.order:
+            for node in m.tree.node.nodes:
+                if isinstance(node, ast.Import):
+                    for name, asname in node.names:
+                        if asname:
+                            m.aliases[asname] = name
+                        else:
+                            m.aliases[name.split(".")[0]] = name.split(".")[0]
+                elif isinstance(node, ast.From):
+                    for name, asname in node.names:
+                        if self.is_module(node.modname + "." + name):
+                            m.aliases[asname or name] = node.modname + "." + name
+
+    def is_module(self, name):
+        return self.loaded.get(name) is not None
+
+    # tree shaking
+
+    def find_reachable(self, entry):
+        """Returns the names of the included modules and the set of
+        (module name, function name) of the functions that are used.
+        """
+        modules = []
+        functions = set()
+        done = set()
+        work = [("init", entry)]
+
+        while work:
+            ref = work.pop()
+            if ref in done:
+                continue
+            done.add(ref)
+
+            kind, name = ref[0], ref[1]
+            m = self.loaded.get(name)
+            if m is None:
+                continue
+
+            if kind == "init":
+                modules.append(name)
+                if "." in name:
+                    work.append(("init", name.rpartition(".")[0]))
+                nodes = [n for n in m.tree.node.nodes if not self.is_def(m, n)]
+                work.extend(self.find_references(m, nodes))
+            elif kind == "name":
+                fname = ref[2]
+                if fname in m.defs:
+                    functions.add((name, fname))
+                    work.extend(self.find_references(m, m.defs[fname]))
+                elif fname in m.aliases:
+                    # module is used as a value
+                    work.append(("all", m.aliases[fname]))
+            elif kind == "attr":
+                work.append(("name", name, ref[2]))
+                work.append(("init", name + "." + ref[2]))
+            elif kind == "all":
+                work.append(("init", name))
+                for fname in m.defs:
+                    work.append(("name", name, fname))
+
+        return modules, functions
+
+    def is_def(self, module, node):
+        return isinstance(node, ast.Function) and node in module.defs.get(node.name, [])
+
+    def find_references(self, module, nodes):
+        """Returns the references from the code of nodes to modules and
+        module-level names.
+        """
+        refs = []
+        stack = [(n, module.scope) for n in nodes]
+        while stack:
+            node, s = stack.pop()
+            children = None
+
+            if isinstance(node, ast.Name):
+                if self.is_global(node.name, s):
+                    refs.append(("name", module.name, node.name))
+            elif isinstance(node, ast.Getattr):
+                path = get_dotted_name(node)
+                if path and path[0] in module.aliases and self.is_global(path[0], s):
+                    refs.append(self.attribute_reference(module.aliases[path[0]], path[1:]))
+                    children = []
+            elif isinstance(node, ast.Import):
+                for name, asname in node.names:
+                    refs.append(("init", name))
+                    if not isinstance(s.node, ast.Module):
+                        # the uses of local modules are not followed
+                        parts = name.split(".")
+                        refs.extend(("all", ".".join(parts[:i+1])) for i in range(len(parts)))
+            elif isinstance(node, ast.From):
+                refs.append(("init", node.modname))
+                for name, asname in node.names:
+                    refs.append(("attr", node.modname, name))
+                    if not isinstance(s.node, ast.Module) and self.is_module(node.modname + "." + name):
+                        refs.append(("all", node.modname + "." + name))
+            elif isinstance(node, (ast.Function, ast.Lambda)):
+                inner = module.scopes[node]
+                children = [(n, s) for n in node.defaults]
+                if getattr(node, "decorators", None):
+                    children.append((node.decorators, s))
+                children.append((node.code, inner))
+            elif isinstance(node, ast.Class):
+                inner = module.scopes[node]
+                children = [(n, s) for n in node.bases]
+                if node.decorators:
+                    children.append((node.decorators, s))
+                children.append((node.code, inner))
+            elif isinstance(node, ast.GenExpr):
+                inner = module.scopes[node]
+                children = [(n, inner) for n in node.getChildNodes()]
+                for q in node.code.quals:
+                    if getattr(q, "is_outmost", False):
+                        children.append((q.iter, s))
+
+            if children is None:
+                children = [(n, s) for n in node.getChildNodes()]
+            stack.extend(children)
+        return refs
+
+    def is_global(self, name, s):
+        """True if name in scope s refers to a module-level name."""
+        if s.node is None or isinstance(s.node, ast.Module) or name in s.globals:
+            return True
+        elif s.is_local(name):
+            return False
+        elif s.is_function() and name in s.free:
+            return False
+        return True
+
+    def attribute_reference(self, modname, attrs):
+        """Returns the reference for accessing the attributes attrs of a module."""
+        for i, attr in enumerate(attrs):
+            submodule = modname + "." + attr
+            if not self.is_module(submodule):
+                return ("attr", modname, attr)
+            modname = submodule
+        return ("all", modname)
+
+    # code generation
+
+    def bundle(self, entry):
+        """Returns the javascript for the entry module and the modules it uses."""
+        if self.load(entry) is None:
+            raise pyjs.CompilerError("No module named %s in %s" % (entry, self.root))
+        self.analyze()
+
+        if self.shake:
+            names, functions = self.find_reachable(entry)
+        else:
+            names = [m.name for m in self.order]
+            functions = set((m.name, f) for m in self.order for f in m.defs)
+
+        self.modules = [m for m in self.order if m.name in names]
+        self.dropped = []
+
+        buf = pyjs.Buffer()
+        write = buf.write
+        if self.minify:
+            write = pyjs.Minifier(write).write
+        for m in self.modules:
+            self.emit_module(m, m.name == entry, functions, write)
+        write("py.import(%s);\n" % json.dumps(entry))
+        if not self.lazy:
+            for m in self.modules:
+                if m.name != entry:
+                    write("py.import(%s);\n" % json.dumps(m.name))
+        return buf.getvalue()
+
+    def emit_module(self, module, is_entry, functions, write):
+        dropped = set(name for name in module.defs if (module.name, name) not in functions)
+        if dropped:
+            module.tree.node.nodes = [n for n in module.tree.node.nodes
+                if not (self.is_def(module, n) and n.name in dropped)]
+            self.dropped.extend(sorted(module.name + "." + name for name in dropped))
+
+            # the dropped functions are not variables of the module anymore
+            module.analyze()
+
+        visitor = pyjs.Visitor(module.scopes, minify=self.minify, module=module.name, main=is_entry)
+        visitor.emit(module.tree, write)
+
+def get_dotted_name(node):
+    """Returns the names of a chain of attributes like a.b.c as a list or None."""
+    names = []
+    while isinstance(node, ast.Getattr):
+        names.append(node.attrname)
+        node = node.expr
+    if isinstance(node, ast.Name):
+        names.append(node.name)
+        names.reverse()
+        return names
+
+def bundle(entry, root=".", optimize=0, minify=False, shake=True, lazy=True):
+    """Compiles the module entry and the modules that it uses from root into
+    a single javascript file and returns it.
+
+    When shake is true, functions and modules that are not used are left out.
+    When lazy is false, all the modules run at startup.
+    """
+    return Bundler(root, optimize=optimize, minify=minify, shake=shake, lazy=lazy).bundle(entry)
@@ -0,0 +1,164 @@
+"""On-disk compilation cache for pyjs.
+
+    >>> cache = Cache("/tmp/pyjs-cache")
+    >>> js = pyjs.compile("def square(x): return x*x", cache=cache)
+"""
+import os
+import errno
+import hashlib
+import tempfile
+
+class Cache:
+    """Content-addressed cache of compiled javascript.
+
+    Each entry is stored in a file under `path`, named after the sha1 of the
+    compiler version, the compile options and the source code. The version
+    is pyjs.get_fingerprint, which changes with the sources of the compiler. When the total
+    size of the entries grows beyond `max_size` bytes, the least recently used
+    entries are removed. Files are written to a temporary file and renamed
+    into place, so that processes sharing the same cache directory never see
+    partially written entries.
+    """
+    def __init__(self, path, max_size=64*1024*1024):
+        self.path = path
+        self.max_size = max_size
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # total size of the entries, computed lazily
+        self._size = None
+
+    def key(self, code, version, options):
+        """Returns the cache key for compiling code with the given compiler version and options."""
+        sha = hashlib.sha1()
+        sha.update(version + "\n")
+        for name in sorted(options):
+            sha.update("%s=%r\n" % (name, options[name]))
+        sha.update("\n")
+        if isinstance(code, unicode):
+            code = code.encode("utf-8")
+        sha.update(code)
+        return sha.hexdigest()
+
+    def _filename(self, key):
+        return os.path.join(self.path, key[:2], key[2:] + ".js")
+
+    def get(self, key):
+        """Returns the javascript stored for key or None if there is no such entry."""
+        filename = self._filename(key)
+        try:
+            f = open(filename, "rb")
+        except IOError, e:
+            if e.errno != errno.ENOENT:
+                raise
+            self.misses += 1
+            return None
+
+        try:
+            js = f.read()
+        finally:
+            f.close()
+
+        self.hits += 1
+
+        # modification time is used as the access time for LRU eviction
+        try:
+            os.utime(filename, None)
+        except OSError:
+            # evicted by another process in the meanwhile
+            pass
+        return js
+
+    def put(self, key, js):
+        """Stores js as the value of key."""
+        if isinstance(js, unicode):
+            js = js.encode("utf-8")
+
+        filename = self._filename(key)
+        dirname = os.path.dirname(filename)
+        if not os.path.isdir(dirname):
+            try:
+                os.makedirs(dirname)
+            except OSError, e:
+                if e.errno != errno.EEXIST:
+                    raise
+
+        # the size of the entry that is replaced
+        try:
+            replaced = os.path.getsize(filename)
+        except OSError:
+            replaced = 0
+
+        fd, tmpname = tempfile.mkstemp(dir=dirname, prefix=".tmp-")
+        try:
+            f = os.fdopen(fd, "wb")
+            try:
+                f.write(js)
+            finally:
+                f.close()
+            os.rename(tmpname, filename)
+        except:
+            if os.path.exists(tmpname):
+                os.remove(tmpname)
+            raise
+
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._entries())
+        else:
+            self._size += len(js) - replaced
+
+        if self._size > self.max_size:
+            self.evict()
+
+    def _entries(self):
+        """Returns (mtime, size, filename) of all the entries in the cache."""
+        entries = []
+        if not os.path.isdir(self.path):
+            return entries
+
+        for dirname in os.listdir(self.path):
+            dirpath = os.path.join(self.path, dirname)
+            if not os.path.isdir(dirpath):
+                continue
+            for name in os.listdir(dirpath):
+                if not name.endswith(".js"):
+                    continue
+                filename = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(filename)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, filename))
+        return entries
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits in max_size."""
+        entries = sorted(self._entries())
+        size = sum(size for _, size, _ in entries)
+
+        for mtime, filesize, filename in entries:
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(filename)
+                self.evictions += 1
+            except OSError:
+                # already removed by another process
+                pass
+            size -= filesize
+        self._size = size
+
+    def clear(self):
+        """Removes all the entries from the cache."""
+        for _, _, filename in self._entries():
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+        self._size = 0
+
+    def stats(self):
+        """Returns hit/miss statistics of this cache object."""
+        return dict(hits=self.hits, misses=self.misses, evictions=self.evictions)
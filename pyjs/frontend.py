@@ -0,0 +1,563 @@
+"""Frontends.
+
+The compiler works on the trees of the compiler package. The "compiler"
+frontend parses with compiler.parse, which is written in python and slow.
+The "ast" frontend parses with the ast module, which is written in C, and
+translates its tree into the tree that compiler.parse would return for the
+same code, so that both frontends generate identical javascript. The
+translated tree is made of the slotted nodes of the IR, see ir.py.
+
+    >>> tree = parse(code, frontend="ast")
+
+The frontend used when none is given can be set with the PYJS_FRONTEND
+environment variable, to run the tests and the benchmarks with either of
+them.
+
+The nodes of the translated tree have the line numbers of the ast module,
+which differ from those of the compiler package for some parts of
+expressions that span many lines.
+"""
+import os
+import re
+import bisect
+import tokenize
+import _ast
+import compiler
+import ir
+from compiler.consts import CO_VARARGS, CO_VARKEYWORDS, OP_ASSIGN, OP_DELETE, OP_APPLY
+
+DEFAULT = os.environ.get("PYJS_FRONTEND", "ast")
+
+def parse(code, frontend=None):
+    """Parses python code into a tree of compiler.ast nodes."""
+    frontend = frontend or DEFAULT
+    if frontend == "ast":
+        tree = compile(code, "<string>", "exec", _ast.PyCF_ONLY_AST)
+        if not has_future_syntax(tree):
+            return Transformer(code).transform_module(tree)
+        frontend = "compiler"
+    if frontend == "compiler":
+        return compiler.parse(code)
+    raise ValueError("Unknown frontend: %r" % frontend)
+
+# future imports that change how ast parses the code, which the compiler
+# package ignores
+FUTURE_SYNTAX = ["unicode_literals", "print_function"]
+
+def has_future_syntax(tree):
+    for node in tree.body:
+        if isinstance(node, _ast.ImportFrom) and node.module == "__future__":
+            if [a for a in node.names if a.name in FUTURE_SYNTAX]:
+                return True
+        elif not (isinstance(node, _ast.Expr) and isinstance(node.value, _ast.Str)):
+            return False
+    return False
+
+FLAGS = {_ast.Load: OP_APPLY, _ast.Store: OP_ASSIGN, _ast.Del: OP_DELETE, _ast.AugStore: OP_ASSIGN, _ast.Param: OP_ASSIGN}
+
+BINARY_OPERATORS = {
+    _ast.Add: ir.Add, _ast.Sub: ir.Sub, _ast.Mult: ir.Mul, _ast.Div: ir.Div,
+    _ast.Mod: ir.Mod, _ast.Pow: ir.Power, _ast.FloorDiv: ir.FloorDiv,
+    _ast.LShift: ir.LeftShift, _ast.RShift: ir.RightShift,
+}
+
+# operators whose chains are a single node with a list of operands
+BITWISE_OPERATORS = {_ast.BitOr: (ir.Bitor, "|"), _ast.BitXor: (ir.Bitxor, "^"), _ast.BitAnd: (ir.Bitand, "&")}
+
+UNARY_OPERATORS = {_ast.Not: ir.Not, _ast.UAdd: ir.UnaryAdd, _ast.USub: ir.UnarySub, _ast.Invert: ir.Invert}
+
+AUGMENTED_OPERATORS = {
+    _ast.Add: "+=", _ast.Sub: "-=", _ast.Mult: "*=", _ast.Div: "/=", _ast.Mod: "%=",
+    _ast.Pow: "**=", _ast.FloorDiv: "//=", _ast.LShift: "<<=", _ast.RShift: ">>=",
+    _ast.BitOr: "|=", _ast.BitXor: "^=", _ast.BitAnd: "&=",
+}
+
+COMPARISONS = {
+    _ast.Eq: "==", _ast.NotEq: "!=", _ast.Lt: "<", _ast.LtE: "<=", _ast.Gt: ">",
+    _ast.GtE: ">=", _ast.Is: "is", _ast.IsNot: "is not", _ast.In: "in", _ast.NotIn: "not in",
+}
+
+RE_DEF = re.compile(r"\s*(def|class)\b")
+RE_IF = re.compile(r"if\b")
+RE_SEMICOLON = re.compile(r";[ \t]*(#.*)?$")
+
+# statements with a body
+COMPOUND_STATEMENTS = (_ast.FunctionDef, _ast.ClassDef, _ast.For, _ast.While, _ast.If, _ast.With,
+    _ast.TryExcept, _ast.TryFinally)
+
+class Transformer:
+    """Translates the tree of the ast module into IR nodes.
+
+    The ast module loses some details of the source that the compiler
+    package keeps, like parentheses and elif, and they are looked up in
+    the source at the positions of the nodes.
+    """
+    def __init__(self, source):
+        self.source = source
+        self.lines = source.splitlines()
+
+        # simple statements followed by a semicolon at the end of the line
+        self.semicolons = set()
+
+        # visit methods by node class
+        self.handlers = {}
+
+    def transform_module(self, node):
+        if ";" in self.source:
+            self.find_semicolons(node)
+        return self.transform(node)
+
+    def transform(self, node):
+        f = self.handlers.get(node.__class__) or self.get_handler(node.__class__)
+        return f(node)
+
+    def get_handler(self, cls):
+        f = self.handlers[cls] = getattr(self, "visit_" + cls.__name__)
+        return f
+
+    def transform_list(self, nodes):
+        return [self.transform(n) for n in nodes]
+
+    def transform_optional(self, node):
+        return node and self.transform(node)
+
+    def stmt(self, nodes):
+        if not self.semicolons:
+            return ir.Stmt([self.transform(n) for n in nodes])
+
+        result = []
+        for n in nodes:
+            result.append(self.transform(n))
+            if n in self.semicolons:
+                # the compiler package adds an empty statement after the semicolon
+                result.append(ir.Discard(ir.Const(None)))
+        return ir.Stmt(result)
+
+    def stmt_optional(self, nodes):
+        return nodes and self.stmt(nodes) or None
+
+    def find_semicolons(self, tree):
+        candidates = []
+        for i, line in enumerate(self.lines):
+            if ";" in line:
+                m = RE_SEMICOLON.search(line)
+                if m:
+                    candidates.append((i + 1, m.start()))
+        if not candidates:
+            return
+
+        statements = sorted(((n.lineno, n.col_offset), n) for n in walk(tree)
+            if isinstance(n, _ast.stmt) and not isinstance(n, COMPOUND_STATEMENTS))
+        starts = [pos for pos, n in statements]
+
+        # the last line with a candidate for each statement that starts before them
+        ends = {}
+        for pos in candidates:
+            i = bisect.bisect(starts, pos) - 1
+            if i >= 0:
+                ends[i] = pos[0]
+        for i, end in ends.items():
+            if self.ends_with_semicolon(starts[i][0], end):
+                self.semicolons.add(statements[i][1])
+
+    def ends_with_semicolon(self, start, end):
+        """True if the logical line that starts at line start ends with a
+        semicolon on or before line end.
+        """
+        lines = iter([line + "\n" for line in self.lines[start - 1:end]])
+        last = None
+        try:
+            for tok in tokenize.generate_tokens(lambda: next(lines, "")):
+                if tok[0] == tokenize.NEWLINE:
+                    return last == ";"
+                elif tok[0] not in (tokenize.COMMENT, tokenize.NL, tokenize.INDENT):
+                    last = tok[1]
+        except (tokenize.TokenError, IndentationError):
+            pass
+        return False
+
+    def source_at(self, node):
+        """Returns the source from the position of node to the end of its line."""
+        if node.col_offset < 0 or node.lineno > len(self.lines):
+            return ""
+        return self.lines[node.lineno - 1][node.col_offset:]
+
+    def get_docstring(self, body):
+        """Returns the docstring of body and the statements after it."""
+        if body and isinstance(body[0], _ast.Expr) and isinstance(body[0].value, _ast.Str) \
+                and not self.source_at(body[0]).startswith("("):
+            return body[0].value.s, body[1:]
+        return None, body
+
+    # statements
+
+    def visit_Module(self, node):
+        doc, body = self.get_docstring(node.body)
+        return ir.Module(doc, self.stmt(body))
+
+    def visit_FunctionDef(self, node):
+        doc, body = self.get_docstring(node.body)
+        argnames, defaults, flags = self.arguments(node.args)
+        return ir.Function(self.decorators(node), node.name, argnames, defaults, flags, doc,
+            self.stmt(body), lineno=self.def_lineno(node))
+
+    def visit_ClassDef(self, node):
+        doc, body = self.get_docstring(node.body)
+        return ir.Class(node.name, self.transform_list(node.bases), doc, self.stmt(body),
+            self.decorators(node), lineno=self.def_lineno(node))
+
+    def decorators(self, node):
+        if not node.decorator_list:
+            return None
+
+        decorators = self.transform_list(node.decorator_list)
+        for d in decorators:
+            # the attributes of the dotted names of decorators have no line
+            if isinstance(d, ir.CallFunc):
+                d = d.node
+            while isinstance(d, ir.Getattr):
+                d.lineno = None
+                d = d.expr
+        return ir.Decorators(decorators)
+
+    def def_lineno(self, node):
+        """Returns the line of the def or class keyword, which ast puts at the first decorator."""
+        lineno = node.lineno
+        if node.decorator_list:
+            lineno = node.decorator_list[-1].lineno
+            while lineno < len(self.lines) and not RE_DEF.match(self.lines[lineno - 1]):
+                lineno += 1
+        return lineno
+
+    def arguments(self, args):
+        if not (args.args or args.vararg or args.kwarg):
+            return (), (), 0
+
+        argnames = [self.argname(a) for a in args.args]
+        flags = 0
+        if args.vararg:
+            argnames.append(args.vararg)
+            flags |= CO_VARARGS
+        if args.kwarg:
+            argnames.append(args.kwarg)
+            flags |= CO_VARKEYWORDS
+        return argnames, self.transform_list(args.defaults), flags
+
+    def argname(self, node):
+        if isinstance(node, _ast.Name):
+            return node.id
+        return tuple(self.argname(n) for n in node.elts)
+
+    def visit_Return(self, node):
+        value = node.value and self.transform(node.value) or ir.Const(None)
+        return ir.Return(value, lineno=node.lineno)
+
+    def visit_Delete(self, node):
+        if len(node.targets) == 1:
+            return self.transform(node.targets[0])
+        return ir.AssTuple(self.transform_list(node.targets), lineno=node.lineno)
+
+    def visit_Assign(self, node):
+        return ir.Assign(self.transform_list(node.targets), self.transform(node.value), lineno=node.lineno)
+
+    def visit_AugAssign(self, node):
+        # the target is compiled like an expression
+        target = node.target
+        if isinstance(target, _ast.Name):
+            target = ir.Name(target.id, lineno=target.lineno)
+        elif isinstance(target, _ast.Attribute):
+            target = ir.Getattr(self.transform(target.value), target.attr, lineno=target.lineno)
+        else:
+            target = self.subscript(target, OP_APPLY)
+        return ir.AugAssign(target, AUGMENTED_OPERATORS[node.op.__class__], self.transform(node.value), lineno=node.lineno)
+
+    def visit_Print(self, node):
+        cls = node.nl and ir.Printnl or ir.Print
+        return cls(self.transform_list(node.values), self.transform_optional(node.dest), lineno=node.lineno)
+
+    def visit_For(self, node):
+        return ir.For(self.transform(node.target), self.transform(node.iter), self.stmt(node.body),
+            self.stmt_optional(node.orelse), lineno=node.lineno)
+
+    def visit_While(self, node):
+        return ir.While(self.transform(node.test), self.stmt(node.body), self.stmt_optional(node.orelse),
+            lineno=node.lineno)
+
+    def visit_If(self, node):
+        tests = [(self.transform(node.test), self.stmt(node.body))]
+        orelse = node.orelse
+        # an elif is an if statement in the else clause, which starts at its test
+        while len(orelse) == 1 and isinstance(orelse[0], _ast.If) and not RE_IF.match(self.source_at(orelse[0])):
+            tests.append((self.transform(orelse[0].test), self.stmt(orelse[0].body)))
+            orelse = orelse[0].orelse
+        return ir.If(tests, self.stmt_optional(orelse), lineno=node.lineno)
+
+    def visit_With(self, node):
+        body = node.body
+        if len(body) == 1 and isinstance(body[0], _ast.With) and self.source_before(body[0]).endswith(","):
+            # a with statement with many items
+            body = self.transform(body[0])
+            body.lineno = node.lineno
+        else:
+            body = self.stmt(body)
+        return ir.With(self.transform(node.context_expr), self.transform_optional(node.optional_vars),
+            body, lineno=node.lineno)
+
+    def visit_Raise(self, node):
+        return ir.Raise(self.transform_optional(node.type), self.transform_optional(node.inst),
+            self.transform_optional(node.tback), lineno=node.lineno)
+
+    def visit_TryExcept(self, node):
+        handlers = [(self.transform_optional(h.type), self.transform_optional(h.name), self.stmt(h.body))
+            for h in node.handlers]
+        return ir.TryExcept(self.stmt(node.body), handlers, self.stmt_optional(node.orelse), lineno=node.lineno)
+
+    def visit_TryFinally(self, node):
+        body = node.body
+        if len(body) == 1 and isinstance(body[0], _ast.TryExcept) \
+                and (body[0].lineno, body[0].col_offset) == (node.lineno, node.col_offset):
+            # try-except-finally in a single statement
+            body = self.transform(body[0])
+        else:
+            body = self.stmt(body)
+        return ir.TryFinally(body, self.stmt(node.finalbody), lineno=node.lineno)
+
+    def visit_Assert(self, node):
+        return ir.Assert(self.transform(node.test), self.transform_optional(node.msg), lineno=node.lineno)
+
+    def visit_Import(self, node):
+        return ir.Import([(a.name, a.asname) for a in node.names], lineno=node.lineno)
+
+    def visit_ImportFrom(self, node):
+        return ir.From(node.module or "", [(a.name, a.asname) for a in node.names], node.level,
+            lineno=node.lineno)
+
+    def visit_Exec(self, node):
+        if node.globals and self.source_before(node.globals).endswith(","):
+            # ast unpacks exec(code, globals)
+            items = [n for n in (node.body, node.globals, node.locals) if n]
+            return ir.Exec(ir.Tuple(self.transform_list(items), lineno=node.body.lineno), None, None,
+                lineno=node.lineno)
+        # the compiler package keeps the globals in the locals attribute
+        return ir.Exec(self.transform(node.body), self.transform_optional(node.globals),
+            self.transform_optional(node.locals), lineno=node.lineno)
+
+    def visit_Global(self, node):
+        return ir.Global(node.names, lineno=node.lineno)
+
+    def visit_Expr(self, node):
+        expr = self.transform(node.value)
+        return ir.Discard(expr, lineno=expr.lineno)
+
+    def visit_Pass(self, node):
+        return ir.Pass(lineno=node.lineno)
+
+    def visit_Break(self, node):
+        return ir.Break(lineno=node.lineno)
+
+    def visit_Continue(self, node):
+        return ir.Continue(lineno=node.lineno)
+
+    # expressions
+
+    def visit_BoolOp(self, node):
+        cls = isinstance(node.op, _ast.And) and ir.And or ir.Or
+        return cls(self.transform_list(node.values), lineno=first_line(node.values[0]))
+
+    def visit_BinOp(self, node):
+        # long chains like a + b + c + ... nest to the left, so they are
+        # walked down without recursion and built up from the first operand
+        chain = []
+        while isinstance(node, _ast.BinOp):
+            op = node.op.__class__
+            operands = [node.right]
+            if op in BITWISE_OPERATORS:
+                # a | b | c is a single node, unlike (a | b) | c
+                char = BITWISE_OPERATORS[op][1]
+                while isinstance(node.left, _ast.BinOp) and node.left.op.__class__ is op \
+                        and self.source_at(node).startswith(char):
+                    node = node.left
+                    operands.append(node.right)
+                operands.reverse()
+            chain.append((op, node, operands))
+            node = node.left
+
+        result = self.transform(node)
+        for op, node, operands in reversed(chain):
+            if op in BITWISE_OPERATORS:
+                result = BITWISE_OPERATORS[op][0]([result] + self.transform_list(operands), lineno=first_line(node))
+            else:
+                result = BINARY_OPERATORS[op]((result, self.transform(operands[0])), lineno=node.lineno)
+        return result
+
+    def visit_UnaryOp(self, node):
+        return UNARY_OPERATORS[node.op.__class__](self.transform(node.operand), lineno=node.lineno)
+
+    def visit_Lambda(self, node):
+        argnames, defaults, flags = self.arguments(node.args)
+        return ir.Lambda(argnames, defaults, flags, self.transform(node.body), lineno=node.lineno)
+
+    def visit_IfExp(self, node):
+        return ir.IfExp(self.transform(node.test), self.transform(node.body), self.transform(node.orelse),
+            lineno=first_line(node.test))
+
+    def visit_Dict(self, node):
+        items = [(self.transform(k), self.transform(v)) for k, v in zip(node.keys, node.values)]
+        return ir.Dict(items or (), lineno=items and items[0][0].lineno or node.lineno)
+
+    def visit_Set(self, node):
+        items = self.transform_list(node.elts)
+        return ir.Set(items, lineno=items[0].lineno)
+
+    def visit_ListComp(self, node):
+        return ir.ListComp(self.transform(node.elt), self.comprehension(node), lineno=comprehension_line(node))
+
+    def visit_SetComp(self, node):
+        return ir.SetComp(self.transform(node.elt), self.comprehension(node), lineno=comprehension_line(node))
+
+    def visit_DictComp(self, node):
+        return ir.DictComp(self.transform(node.key), self.transform(node.value), self.comprehension(node),
+            lineno=comprehension_line(node))
+
+    def comprehension(self, node):
+        quals = []
+        for g in node.generators:
+            ifs = [ir.ListCompIf(self.transform(test), lineno=test.lineno) for test in g.ifs]
+            quals.append(ir.ListCompFor(self.transform(g.target), self.transform(g.iter), ifs, lineno=g.target.lineno))
+        return quals
+
+    def visit_GeneratorExp(self, node):
+        quals = []
+        for g in node.generators:
+            ifs = [ir.GenExprIf(self.transform(test), lineno=test.lineno) for test in g.ifs]
+            quals.append(ir.GenExprFor(self.transform(g.target), self.transform(g.iter), ifs, lineno=g.target.lineno))
+        quals[0].is_outmost = True
+        return ir.GenExpr(ir.GenExprInner(self.transform(node.elt), quals), lineno=comprehension_line(node))
+
+    def visit_Yield(self, node):
+        value = node.value and self.transform(node.value) or ir.Const(None)
+        return ir.Yield(value, lineno=node.lineno)
+
+    def visit_Compare(self, node):
+        ops = [(COMPARISONS[op.__class__], self.transform(n)) for op, n in zip(node.ops, node.comparators)]
+        return ir.Compare(self.transform(node.left), ops, lineno=node.lineno)
+
+    def visit_Call(self, node):
+        args = self.transform_list(node.args)
+        for k in node.keywords:
+            args.append(ir.Keyword(k.arg, self.transform(k.value), lineno=k.value.lineno))
+
+        # the line of the first argument or of the call without arguments
+        first = [n for n in node.args[:1] + [k.value for k in node.keywords] + [node.starargs, node.kwargs] if n]
+        lineno = first and min(first_line(n) for n in first) or node.lineno
+
+        return ir.CallFunc(self.transform(node.func), args, self.transform_optional(node.starargs),
+            self.transform_optional(node.kwargs), lineno=lineno)
+
+    def visit_Repr(self, node):
+        return ir.Backquote(self.transform(node.value))
+
+    def visit_Num(self, node):
+        if self.source_at(node).startswith("-"):
+            # ast folds the sign into negative numbers
+            if isinstance(node.n, complex):
+                n = complex(0, -node.n.imag)
+            else:
+                n = -node.n
+            return ir.UnarySub(ir.Const(n, lineno=node.lineno), lineno=node.lineno)
+        return ir.Const(node.n, lineno=node.lineno)
+
+    def visit_Str(self, node):
+        return ir.Const(node.s, lineno=node.lineno)
+
+    def visit_Attribute(self, node):
+        if isinstance(node.ctx, _ast.Load):
+            return ir.Getattr(self.transform(node.value), node.attr, lineno=node.lineno)
+        return ir.AssAttr(self.transform(node.value), node.attr, FLAGS[node.ctx.__class__], lineno=node.lineno)
+
+    def visit_Subscript(self, node):
+        return self.subscript(node, FLAGS[node.ctx.__class__])
+
+    def subscript(self, node, flags):
+        expr = self.transform(node.value)
+        s = node.slice
+        if isinstance(s, _ast.Slice) and s.step is None:
+            return ir.Slice(expr, flags, self.transform_optional(s.lower), self.transform_optional(s.upper),
+                lineno=node.lineno)
+        elif isinstance(s, _ast.ExtSlice):
+            subs = [self.subscript_item(d, node.lineno) for d in s.dims]
+        elif isinstance(s, _ast.Index) and isinstance(s.value, _ast.Tuple) and s.value.elts \
+                and not self.is_parenthesized(s.value):
+            # a[1, 2] has two subscripts, a[(1, 2)] has one
+            subs = self.transform_list(s.value.elts)
+        else:
+            subs = [self.subscript_item(s, node.lineno)]
+        return ir.Subscript(expr, flags, subs, lineno=node.lineno)
+
+    def subscript_item(self, node, lineno):
+        if isinstance(node, _ast.Index):
+            return self.transform(node.value)
+        elif isinstance(node, _ast.Ellipsis):
+            return ir.Ellipsis()
+
+        items = [node.lower and self.transform(node.lower) or ir.Const(None),
+                 node.upper and self.transform(node.upper) or ir.Const(None)]
+        if node.step is not None:
+            # ast adds None for a colon without a stride
+            if isinstance(node.step, _ast.Name) and node.step.id == "None" and not self.source_at(node.step).startswith("None"):
+                items.append(ir.Const(None))
+            else:
+                items.append(self.transform(node.step))
+        return ir.Sliceobj(items, lineno=lineno)
+
+    def is_parenthesized(self, node):
+        return self.source_before(node).endswith("(")
+
+    def source_before(self, node):
+        """Returns the source before the position of node, without the
+        whitespace and line continuations at its end.
+        """
+        lineno = node.lineno
+        text = self.lines[lineno - 1][:node.col_offset].rstrip()
+        while not text and lineno > 1:
+            lineno -= 1
+            text = self.lines[lineno - 1].rstrip(" \t\\")
+        return text
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, _ast.Load):
+            return ir.Name(node.id, lineno=node.lineno)
+        return ir.AssName(node.id, FLAGS[node.ctx.__class__], lineno=node.lineno)
+
+    def visit_List(self, node):
+        if isinstance(node.ctx, _ast.Load):
+            items = self.transform_list(node.elts)
+            return ir.List(items or (), lineno=items and items[0].lineno or node.lineno)
+        return ir.AssList(self.transform_list(node.elts), lineno=node.lineno)
+
+    def visit_Tuple(self, node):
+        if isinstance(node.ctx, _ast.Load):
+            return ir.Tuple(self.transform_list(node.elts) or (), lineno=node.elts and first_line(node.elts[0]) or node.lineno)
+        return ir.AssTuple(self.transform_list(node.elts), lineno=node.lineno)
+
+def first_line(node):
+    """Returns the line of the first token of an expression."""
+    # ast puts operators after the first at the position of the operator
+    while isinstance(node, _ast.BinOp):
+        node = node.left
+    return node.lineno
+
+def comprehension_line(node):
+    """Returns the line of the first for of a comprehension."""
+    return node.generators[0].target.lineno
+
+def walk(node):
+    """Generates the statements in the tree of node."""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        for name in ("body", "orelse", "finalbody", "handlers"):
+            nodes = getattr(node, name, None)
+            if isinstance(nodes, list):
+                stack.extend(nodes)
@@ -0,0 +1,252 @@
+"""Generators.
+
+Compiles the body of a generator function into a state machine, which
+runs in any javascript engine. The state machine is a function that runs
+the generator until the next yield and returns the yielded value, or
+py.stop when the generator is finished. Each yield and each jump target
+of the control flow around the yields starts a new case of a switch
+statement on the current state.
+
+    def count(n):                  function count(n) {
+        i = 0                      var i, __state = 0;
+        while i < n:               return py.generator(function(__sent) {
+            yield i                while (true) { switch (__state) {
+            i = i + 1              case 0: i = 0;
+                                   case 1: if (!(i < n)) { __state = 3; continue; } __state = 2; return i;
+                                   case 2: i = i + 1;
+                                   __state = 1; continue;
+                                   case 3: return py.stop;
+                                   } }
+                                   });
+                                   }
+
+Statements without yield are compiled as usual, so loops that don't yield
+run natively inside a single step of the state machine.
+"""
+from compiler import ast
+import ir
+
+class Label:
+    """A position in the state machine, which gets the number of its state
+    when its block is started.
+    """
+    def __init__(self):
+        self.state = None
+
+class Jump:
+    """Continues the state machine at the label."""
+    def __init__(self, label):
+        self.label = label
+
+class StateMachine:
+    """Lowers the body of a generator into the cases of a switch statement.
+
+    The blocks are lists of fragments, which can contain Labels, replaced
+    by their state numbers, and Jumps to Labels. Temporary variables, which
+    must keep their values between the steps of the generator, are added
+    to temps and must be declared by the enclosing function.
+    """
+    def __init__(self, visitor):
+        self.visitor = visitor
+        self.blocks = []
+        self.block = None
+        self.temps = []
+
+        # (break label, continue label) of the enclosing lowered loops
+        self.loops = []
+
+        # memoized results of contains_yield by node
+        self._yields = {}
+
+    def compile(self, code):
+        """Returns fragments for the cases of the state machine of code."""
+        self.start(Label())
+        self.lower(code)
+        self.emit("return py.stop;\n")
+        return self.finish()
+
+    def finish(self):
+        fragments = []
+        for i, block in enumerate(self.blocks):
+            # no need to jump to the next case
+            if block and isinstance(block[-1], Jump) and block[-1].label.state == i + 1:
+                block.pop()
+
+            fragments.append("case %d: " % i)
+            for f in block:
+                if isinstance(f, Jump):
+                    f = "__state = %d; continue; " % f.label.state
+                elif isinstance(f, Label):
+                    f = str(f.state)
+                fragments.append(f)
+            if block and isinstance(block[-1], Jump):
+                fragments.append("\n")
+        return fragments
+
+    def start(self, label):
+        label.state = len(self.blocks)
+        self.block = []
+        self.blocks.append(self.block)
+
+    def emit(self, *fragments):
+        self.block.extend(fragments)
+
+    def jump(self, label):
+        self.block.append(Jump(label))
+
+    def temp(self):
+        name = "__g%d" % len(self.temps)
+        self.temps.append(name)
+        return name
+
+    # lowering of statements
+
+    def lower(self, node):
+        if isinstance(node, ast.Stmt):
+            for n in node.nodes:
+                self.lower(n)
+        elif isinstance(node, ast.Discard) and isinstance(node.expr, ast.Yield):
+            self.lower_yield(node.expr.value)
+        elif isinstance(node, ast.Assign) and isinstance(node.expr, ast.Yield) and len(node.nodes) == 1:
+            self.lower_yield(node.expr.value, node.nodes[0])
+        elif isinstance(node, (ast.Break, ast.Continue)):
+            # statements with jumps to lowered loops are always lowered
+            exit, next = self.loops[-1]
+            self.jump(isinstance(node, ast.Break) and exit or next)
+        elif isinstance(node, (ast.If, ast.While, ast.For)) and self.needs_lowering(node):
+            getattr(self, "lower_" + node.__class__.__name__)(node)
+        else:
+            # yields in other places are reported by the visitor
+            self.emit(node, "\n")
+
+    def lower_yield(self, value, target=None):
+        resume = Label()
+        self.emit("__state = ", resume, "; return ", value, ";\n")
+        self.start(resume)
+        if target:
+            # the value passed to send
+            self.emit(ir.Assign([target], ir.Name("__sent")), "\n")
+
+    def lower_If(self, node):
+        end = Label()
+        else_ = node.else_ and Label() or end
+
+        labels = []
+        for test, code in node.tests:
+            label = Label()
+            labels.append((label, code))
+            self.emit("if (", test, ") { ", Jump(label), "} ")
+        self.jump(else_)
+
+        for label, code in labels:
+            self.start(label)
+            self.lower(code)
+            self.jump(end)
+
+        if node.else_:
+            self.start(else_)
+            self.lower(node.else_)
+            self.jump(end)
+        self.start(end)
+
+    def lower_While(self, node):
+        test, end = Label(), Label()
+        else_ = node.else_ and Label() or end
+
+        self.jump(test)
+        self.start(test)
+        self.emit("if (!(", node.test, ")) { ", Jump(else_), "} ")
+        self.lower_body(node.body, end, test)
+        self.jump(test)
+        self.lower_else(node.else_, else_, end)
+
+    def lower_For(self, node):
+        name, expr, code, else_part = node.asList()
+        test, end = Label(), Label()
+        else_ = else_part and Label() or end
+
+        if self.visitor.is_range(expr):
+            start, stop, step, value = self.visitor.get_range_args(expr)
+            i, n = self.temp(), self.temp()
+            self.emit(i, " = ", start, "; ", n, " = ", stop, "; ")
+            if value is None:
+                s = self.temp()
+                self.emit(s, " = ", step, "; ")
+                condition = s, " > 0 ? ", i, " < ", n, " : ", i, " > ", n
+                increment = i, " += ", s, ";"
+            elif value > 0:
+                condition = i, " < ", n
+                increment = value == 1 and (i, "++;") or (i, " += ", step, ";")
+            else:
+                condition = i, " > ", n
+                increment = value == -1 and (i, "--;") or (i, " += ", step, ";")
+
+            next = Label()
+            self.jump(test)
+            self.start(test)
+            self.emit("if (!(", condition, ")) { ", Jump(else_), "} ")
+            self.emit(ir.Assign([name], ir.Name(i)), "\n")
+            self.lower_body(code, end, next)
+            self.jump(next)
+            self.start(next)
+            self.emit(increment, "\n")
+            self.jump(test)
+        else:
+            iterator, value = self.temp(), self.temp()
+            self.emit(iterator, " = py.iter(", expr, ");\n")
+            self.jump(test)
+            self.start(test)
+            self.emit("if ((", value, " = ", iterator, ".next()) === py.stop) { ", Jump(else_), "} ")
+            self.emit(ir.Assign([name], ir.Name(value)), "\n")
+            self.lower_body(code, end, test)
+            self.jump(test)
+
+        self.lower_else(else_part, else_, end)
+
+    def lower_body(self, code, exit, next):
+        self.loops.append((exit, next))
+        self.lower(code)
+        self.loops.pop()
+
+    def lower_else(self, code, label, end):
+        if code:
+            self.start(label)
+            self.lower(code)
+            self.jump(end)
+        self.start(end)
+
+    def needs_lowering(self, node):
+        """True if node contains a yield or a break or continue of an
+        enclosing loop.
+        """
+        if self.contains_yield(node):
+            return True
+        elif isinstance(node, ast.If):
+            return contains_jump(node)
+        else:
+            # break and continue in the else clause of a loop are not its own
+            return node.else_ is not None and contains_jump(node.else_)
+
+    def contains_yield(self, node):
+        if node not in self._yields:
+            self._yields[node] = find(node, (ast.Yield,), SCOPE_NODES) is not None
+        return self._yields[node]
+
+# nodes that have a scope of their own
+SCOPE_NODES = (ast.Function, ast.Lambda, ast.Class, ast.GenExpr)
+
+def contains_jump(node):
+    """True if node contains a break or continue statement of a loop outside node."""
+    return find(node, (ast.Break, ast.Continue), SCOPE_NODES + (ast.For, ast.While)) is not None
+
+def find(node, types, skip):
+    """Returns a node of one of the types in the tree of node, without
+    looking into nodes of the types in skip, or None.
+    """
+    stack = list(node.getChildNodes())
+    while stack:
+        n = stack.pop()
+        if isinstance(n, types):
+            return n
+        elif not isinstance(n, skip):
+            stack.extend(n.getChildNodes())
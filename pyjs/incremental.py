@@ -0,0 +1,200 @@
+"""Incremental compilation of python modules.
+
+The source is split into top-level statements and the parse tree and the
+javascript of every statement is remembered. When a new revision of the
+module is compiled, only the statements whose source changed are parsed and
+compiled again.
+
+    >>> c = IncrementalCompiler()
+    >>> js = c.compile(code)
+    >>> js = c.compile(modified_code)
+    >>> c.reused, c.compiled
+    (42, 1)
+"""
+import tokenize
+from cStringIO import StringIO
+from compiler import ast
+
+import pyjs
+import scope
+import typeinfer
+import frontend
+
+# keywords that continue the previous compound statement
+CONTINUATION_KEYWORDS = ["else", "elif", "except", "finally"]
+
+class Chunk:
+    """Source, parse tree and compiled javascript of a top-level statement."""
+    def __init__(self, source):
+        self.source = source
+        self.tree = frontend.parse('""\n' + source)
+        self.scopes = scope.analyze(self.tree)
+
+        # names bound by this statement at module level and names used 
+        # anywhere in it
+        self.names = self.scopes[self.tree].locals
+        self.uses = set(name for s in self.scopes.values() for name in s.uses)
+
+        self.js = None
+        self.context = None
+
+    def compile(self, context, scopes, definitions):
+        """Compiles the chunk unless it is already compiled with the same context.
+
+        The context is what the other parts of the module change in the
+        generated code: the names of builtins they bind and the interfaces
+        of the definitions used by this chunk, see get_interface. The
+        scopes and the definitions are those of the whole module.
+        Returns True if the chunk is compiled.
+        """
+        key = context, get_interfaces(self.uses, definitions)
+        if self.js is not None and self.context == key:
+            return False
+        self.js = pyjs.Visitor(dict(scopes), context, definitions=definitions).visit(self.tree)
+        self.context = key
+        return True
+
+    def __len__(self):
+        """Returns the number of top-level nodes in this chunk."""
+        return len(self.tree.node.nodes)
+
+class IncrementalCompiler:
+    """Compiler that reuses the javascript of top-level statements
+    that did not change since the previous revision.
+
+    The output is always identical to that of pyjs.compile.
+    """
+    def __init__(self):
+        self.chunks = {}
+
+        # number of top-level nodes reused and compiled in the last revision
+        self.reused = 0
+        self.compiled = 0
+
+    def compile(self, code):
+        try:
+            sources = split_statements(code)
+        except (tokenize.TokenError, IndentationError):
+            # let the compiler report the error
+            return pyjs.compile(code)
+
+        self.reused = self.compiled = 0
+        chunks = {}
+
+        for source in sources:
+            chunk = chunks.get(source)
+            if chunk is None:
+                chunk = self.chunks.get(source)
+            if chunk is None:
+                chunk = Chunk(source)
+            chunks[source] = chunk
+
+        context = set()
+        for chunk in chunks.values():
+            context.update(chunk.names)
+        context = frozenset(context & typeinfer.KNOWN_BUILTINS)
+
+        scopes = {}
+        for chunk in chunks.values():
+            scopes.update(chunk.scopes)
+        definitions = get_definitions([chunks[source] for source in sources])
+
+        for source in sources:
+            chunk = chunks[source]
+            if chunk.compile(context, scopes, definitions):
+                self.compiled += len(chunk)
+            else:
+                self.reused += len(chunk)
+
+        # forget the statements that are not part of this revision
+        self.chunks = chunks
+        return "".join(chunks[source].js for source in sources)
+
+def get_definitions(chunks):
+    """Returns the Function and Class nodes of the def and class statements
+    of the module made of chunks by name, for the names that they are the 
+    only binding of, like pyjs.Visitor.get_definition.
+    """
+    counts = {}
+    nodes = {}
+    rebound = set()
+    for chunk in chunks:
+        module = chunk.scopes[chunk.tree]
+        for name, node in module.assignments:
+            counts[name] = counts.get(name, 0) + 1
+        nodes.update(module.functions)
+        nodes.update(module.classes)
+        for s in chunk.scopes.values():
+            if s is not module:
+                # rebound by a function that declares it global
+                rebound.update(name for name in s.globals if name in s.locals)
+    return dict((name, node) for name, node in nodes.items() if counts.get(name) == 1 and name not in rebound)
+
+def get_interfaces(names, definitions):
+    """Returns the interfaces of the definitions of names and of the base
+    classes of those that are classes.
+    """
+    result = {}
+    names = list(names)
+    while names:
+        name = names.pop()
+        node = definitions.get(name)
+        if name in result or node is None:
+            continue
+        result[name] = get_interface(node)
+        if isinstance(node, ast.Class):
+            names.extend(b.name for b in node.bases if isinstance(b, ast.Name))
+    return frozenset(result.items())
+
+def get_interface(node):
+    """Returns what the code that uses a def or class statement depends on:
+    the parameters of a function, and the bases, the attributes and the 
+    interfaces of the methods of a class. The bodies of the functions 
+    aren't part of it, so they can change without compiling the code that
+    calls them again.
+    """
+    if isinstance(node, ast.Function):
+        return ("def", tuple(map(repr, node.argnames)), repr(node.defaults), node.varargs, node.kwargs, repr(node.decorators))
+    methods = tuple((n.name, get_interface(n)) for n in node.code.nodes if isinstance(n, ast.Function))
+    init = [n for n in node.code.nodes if isinstance(n, ast.Function) and n.name == "__init__"]
+    attributes = init and pyjs.get_self_attributes(init[-1]) or []
+    return ("class", repr(node.bases), repr(pyjs.get_slots(node)), tuple(attributes), methods)
+
+def split_statements(code):
+    """Splits python code into the source of its top-level statements.
+
+    Comments and blank lines are attached to the statement before them.
+
+        >>> split_statements("x = 1\\nif x:\\n    y = 1\\nelse:\\n    y = 2\\n")
+        ['x = 1\\n', 'if x:\\n    y = 1\\nelse:\\n    y = 2\\n']
+    """
+    lines = StringIO(code).readlines()
+
+    starts = []
+    depth = 0
+    new_line = True
+    decorated = False
+
+    for type, token, (row, col), _, _ in tokenize.generate_tokens(StringIO(code).readline):
+        if type == tokenize.INDENT:
+            depth += 1
+        elif type == tokenize.DEDENT:
+            depth -= 1
+        elif type == tokenize.NEWLINE:
+            new_line = True
+        elif type in (tokenize.NL, tokenize.COMMENT, tokenize.ENDMARKER):
+            pass
+        elif new_line:
+            new_line = False
+            if depth == 0:
+                if not decorated and token not in CONTINUATION_KEYWORDS:
+                    starts.append(row - 1)
+                decorated = (token == "@")
+
+    if not starts:
+        return []
+
+    # comments before the first statement belong to it
+    starts[0] = 0
+    ends = starts[1:] + [len(lines)]
+    return ["".join(lines[start:end]) for start, end in zip(starts, ends)]
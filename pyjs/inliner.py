@@ -0,0 +1,287 @@
+"""Inlining of small functions.
+
+Replaces the calls to small functions of a module with the expressions
+that the functions return. The functions that are inlined are defined by
+a def statement at module level, which is the only binding of their name,
+and have a body of a single return statement, whose expression has no
+side effects: it uses only the arguments, other names of the module and
+operators, and calls only builtins without side effects and other
+functions that are inlined. Recursive functions are never inlined.
+
+    >>> inliner = Inliner(budget=20)
+    >>> tree = inliner.inline(tree)
+    >>> print format_report(inliner.report())
+
+The arguments of an inlined call are evaluated exactly once and in order:
+constants and names are substituted for the arguments of the function,
+other arguments are assigned to temporary variables with an ir.Let node.
+"""
+import copy
+from compiler import ast
+import ir
+import scope
+import optimizer
+
+# the most nodes in the expression of an inlined function, by default
+DEFAULT_BUDGET = 20
+
+# builtins without side effects that inlined functions can call
+PURE_BUILTINS = frozenset(["abs", "len", "max", "min"])
+
+# classes of the nodes that can be in the expression of an inlined
+# function, besides calls
+PURE_NODES = (ast.Name, ast.Const, ast.Add, ast.Sub, ast.Mul, ast.Div, ast.FloorDiv, ast.Mod,
+    ast.Power, ast.LeftShift, ast.RightShift, ast.Bitand, ast.Bitor, ast.Bitxor, ast.UnaryAdd,
+    ast.UnarySub, ast.Invert, ast.Not, ast.And, ast.Or, ast.Compare, ast.IfExp, ast.Tuple,
+    ast.List, ast.Dict, ast.Getattr, ast.Subscript, ast.Keyword)
+
+class Inliner:
+    """Inlines the small functions of one or more modules and records the
+    inlined calls.
+
+    The budget is the most nodes in the expression of a function that is
+    inlined, after inlining the calls in it.
+    """
+    def __init__(self, budget=DEFAULT_BUDGET):
+        self.budget = budget
+        self.sites = []
+
+    def inline(self, tree, line_offset=0):
+        """Inlines the calls in the module tree in place and returns it.
+        The line_offset is subtracted from the lines in the report.
+        """
+        if not isinstance(tree, ast.Module):
+            return tree
+
+        self.scopes = scope.analyze(tree)
+        self.root = self.scopes[tree]
+
+        # the expression and the size of the functions that are inlined by name
+        self.functions = {}
+        self.temps = 0
+        self.line_offset = line_offset
+
+        candidates = self.find_candidates(tree)
+        for name in self.sort(candidates):
+            f = candidates[name]
+            f.code.nodes[0].value = self.inline_calls(f.code.nodes[0].value, self.scopes[f])
+            expr = f.code.nodes[0].value
+            size = count_nodes(expr)
+            if size <= self.budget:
+                self.functions[name] = f, size
+
+        tree.node = self.inline_calls(tree.node, self.root)
+        return tree
+
+    def find_candidates(self, tree):
+        """Returns the Function nodes at module level that could be inlined
+        by name, without checking the functions they call.
+        """
+        candidates = {}
+        for name, f in self.root.functions.items():
+            if not (isinstance(f.code, ast.Stmt) and len(f.code.nodes) == 1 and isinstance(f.code.nodes[0], ast.Return)):
+                continue
+            if f.varargs or f.kwargs or getattr(f, "decorators", None) or [a for a in f.argnames if not isinstance(a, str)]:
+                continue
+            if [d for d in f.defaults if not optimizer.is_constant(d)]:
+                continue
+            if not self.is_only_binding(name) or not is_pure(f.code.nodes[0].value):
+                continue
+            if self.scopes[f].locals or [c for c in get_calls(f.code.nodes[0].value) if c in f.argnames]:
+                continue
+            candidates[name] = f
+        return candidates
+
+    def sort(self, candidates):
+        """Returns the names of the candidates in an order where every
+        function comes after the candidates that it calls, leaving out the
+        functions that call themselves, directly or through others, and
+        those that call a function that is not a builtin or a candidate.
+        """
+        calls = {}
+        for name, f in candidates.items():
+            calls[name] = set(get_calls(f.code.nodes[0].value))
+
+        order = []
+        done = set()
+        changed = True
+        while changed:
+            changed = False
+            for name in sorted(candidates):
+                if name in done:
+                    continue
+                callees = calls[name]
+                # a builtin must not be a name of the module
+                if all(c in done or c in PURE_BUILTINS and c not in self.root.locals for c in callees):
+                    order.append(name)
+                    done.add(name)
+                    changed = True
+        return order
+
+    def is_only_binding(self, name):
+        """True if the def statement of name at module level is its only binding."""
+        if [c for c in self.scopes.values() if c is not self.root and name in c.globals and name in c.locals]:
+            return False
+        return len([n for n, node in self.root.assignments if n == name]) == 1
+
+    def is_module_name(self, name, s):
+        """True if name refers to the module level name, or the builtin,
+        in the scope s.
+        """
+        start = s
+        while s is not self.root:
+            if name in s.globals:
+                break
+            # the names of class bodies aren't visible in their methods
+            if s.is_local(name) and (s is start or not isinstance(s.node, ast.Class)):
+                return False
+            s = s.parent
+        return True
+
+    def inline_calls(self, tree, s):
+        """Returns tree with the calls to the inlined functions replaced,
+        where s is the scope of tree.
+        """
+        nodes = []
+        stack = [(tree, s)]
+        while stack:
+            node, s = stack.pop()
+            nodes.append((node, s))
+            if isinstance(node, (ast.Function, ast.Lambda)):
+                stack.extend((n, s) for n in node.defaults)
+                stack.append((node.code, self.scopes[node]))
+            elif isinstance(node, ast.Class):
+                stack.extend((n, s) for n in node.bases)
+                stack.append((node.code, self.scopes[node]))
+            elif isinstance(node, ast.GenExpr):
+                stack.extend((n, self.scopes[node]) for n in node.getChildNodes())
+            else:
+                stack.extend((n, s) for n in node.getChildNodes())
+
+        # reversed pre-order puts children before their parents
+        nodes.reverse()
+
+        replacer = optimizer.Optimizer(0)
+        replaced = {}
+        for node, s in nodes:
+            replacer.replace_children(node, replaced)
+            if isinstance(node, ast.CallFunc):
+                new = self.inline_call(node, s)
+                if new is not None:
+                    replaced[node] = new
+        return replaced.get(tree, tree)
+
+    def inline_call(self, node, s):
+        """Returns the expression that replaces the call node in the scope s
+        or None if it is not inlined.
+        """
+        if not isinstance(node.node, ast.Name) or node.node.name not in self.functions:
+            return None
+        if node.star_args or node.dstar_args or isinstance(s.node, ast.Class):
+            return None
+
+        name = node.node.name
+        f, size = self.functions[name]
+        expr = f.code.nodes[0].value
+        if not all(self.is_module_name(n, s) for n in [name] + get_names(expr, f.argnames)):
+            return None
+        if [n for n in node.args if contains(n, ast.Yield)]:
+            return None
+
+        # the arguments in the order of evaluation and by name
+        args = [isinstance(a, ast.Keyword) and a.expr or a for a in node.args]
+        values = {}
+        for i, a in enumerate(node.args):
+            if isinstance(a, ast.Keyword):
+                if a.name not in f.argnames or a.name in values:
+                    return None
+                values[a.name] = a.expr
+            elif i < len(f.argnames):
+                values[f.argnames[i]] = a
+            else:
+                return None
+
+        first_default = len(f.argnames) - len(f.defaults)
+        for i, arg in enumerate(f.argnames):
+            if arg not in values:
+                if i < first_default:
+                    return None
+                values[arg] = f.defaults[i - first_default]
+
+        # the arguments before the last one that may have side effects are
+        # assigned to variables, so that they are evaluated before it
+        last = max([i for i, a in enumerate(args) if not optimizer.is_simple(a)] or [-1])
+        temps = {}
+        names = []
+        for i, a in enumerate(args):
+            if i <= last and not optimizer.is_constant(a):
+                temps[a] = "$a%d" % self.temps
+                self.temps += 1
+                names.append(ir.AssName(temps[a], "OP_ASSIGN", lineno=node.lineno))
+
+        memo = {}
+        for n in get_name_nodes(expr, f.argnames):
+            value = values[n.name]
+            if value in temps:
+                memo[id(n)] = ir.Name(temps[value], lineno=n.lineno)
+            else:
+                memo[id(n)] = copy.deepcopy(value)
+        body = copy.deepcopy(expr, memo)
+
+        self.sites.append({
+            "line": node.lineno and node.lineno - self.line_offset,
+            "function": name,
+            "caller": isinstance(s.node, ast.Function) and s.node.name or "<module>",
+            "size": size,
+        })
+        return ir.Let(names, [a for a in args if a in temps], body, lineno=node.lineno)
+
+    def report(self):
+        """Returns the inlined calls as a list of dicts with the line of the
+        call, the name of the inlined function, the name of the function
+        that calls it and the number of nodes of the inlined expression.
+        """
+        return list(self.sites)
+
+def format_report(report):
+    """Formats the report as a text table."""
+    lines = ["%-6s %-20s %-20s %6s" % ("line", "function", "caller", "size")]
+    for site in report:
+        lines.append("%-6s %-20s %-20s %6d" % (site["line"], site["function"], site["caller"], site["size"]))
+    return "\n".join(lines)
+
+def walk(tree):
+    """Yields the nodes of the tree in pre-order."""
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(node.getChildNodes()))
+
+def contains(tree, cls):
+    return [n for n in walk(tree) if isinstance(n, cls)] != []
+
+def count_nodes(tree):
+    return len(list(walk(tree)))
+
+def is_pure(expr):
+    """True if expr has no side effects, if the functions it calls have none."""
+    for node in walk(expr):
+        if isinstance(node, ast.CallFunc):
+            if not isinstance(node.node, ast.Name) or node.star_args or node.dstar_args:
+                return False
+        elif not isinstance(node, PURE_NODES):
+            return False
+    return True
+
+def get_calls(expr):
+    """Returns the names of the functions that expr calls."""
+    return [n.node.name for n in walk(expr) if isinstance(n, ast.CallFunc)]
+
+def get_name_nodes(expr, names):
+    """Returns the Name nodes in expr for the given names."""
+    return [n for n in walk(expr) if isinstance(n, ast.Name) and n.name in names]
+
+def get_names(expr, skip):
+    """Returns the names that expr uses, except those in skip."""
+    return [n.name for n in walk(expr) if isinstance(n, ast.Name) and n.name not in skip and n.name not in optimizer.CONSTANT_NAMES]
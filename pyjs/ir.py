@@ -0,0 +1,115 @@
+"""Intermediate representation.
+
+The nodes of the compiler package are instances of old-style classes, each
+with a dict of its attributes, which takes several times the memory of the
+attributes themselves. The IR has a class for each class of compiler.ast,
+with the same name, arguments and attributes, whose instances store their
+attributes in __slots__. Like other subclasses of old-style classes, they
+still get a dict, but only when an attribute that is not in __slots__ is
+set, which the compiler doesn't do.
+
+    >>> node = ir.Name("x", lineno=1)
+    >>> isinstance(node, ast.Name)
+    True
+
+The IR classes are subclasses of the compiler.ast classes, so that all the
+passes of the compiler work on trees of IR nodes, trees of compiler.ast
+nodes and trees with both. The "ast" frontend builds trees of IR nodes
+directly, and the nodes that the passes create are IR nodes too.
+
+Tables keyed by compiler.ast classes must also have the IR classes as keys,
+see with_ir_classes.
+"""
+import dis
+from types import ClassType
+from compiler import ast
+
+STORE_ATTR = dis.opmap["STORE_ATTR"]
+
+def stored_attributes(f):
+    """Returns the names of the attributes that the function f assigns."""
+    code = f.func_code
+    bytecode = code.co_code
+    names = []
+    i = 0
+    while i < len(bytecode):
+        op = ord(bytecode[i])
+        if op >= dis.HAVE_ARGUMENT:
+            if op == STORE_ATTR:
+                name = code.co_names[ord(bytecode[i + 1]) | ord(bytecode[i + 2]) << 8]
+                if name not in names:
+                    names.append(name)
+            i += 3
+        else:
+            i += 1
+    return names
+
+def get_nodes(self):
+    """getChildNodes of the classes whose only children are the list in
+    self.nodes, which returns the list as it is, instead of flattening it
+    like compiler.ast does.
+    """
+    return tuple(self.nodes)
+
+def make_class(cls):
+    """Returns a slotted subclass of the compiler.ast class cls."""
+    slots = stored_attributes(cls.__init__.im_func)
+    if "lineno" not in slots:
+        slots.append("lineno")
+    namespace = {"__slots__": tuple(slots), "__module__": __name__}
+    if slots == ["nodes", "lineno"]:
+        namespace["getChildNodes"] = get_nodes
+    return type(cls.__name__, (cls, object), namespace)
+
+# IR class by compiler.ast class
+CLASSES = {}
+
+for _name, _cls in sorted(vars(ast).items()):
+    # compiler.ast also has a loop variable left bound to a node class
+    if isinstance(_cls, ClassType) and issubclass(_cls, ast.Node) and "__init__" in vars(_cls) \
+            and _cls.__name__ == _name:
+        CLASSES[_cls] = globals()[_name] = make_class(_cls)
+
+class Let(ast.Node):
+    """Assigns the values to the names, a list of AssName nodes, and then 
+    evaluates expr, like (a = 1, b = 2, expr) in javascript. The inliner 
+    binds the arguments of inlined calls with it; it has no python syntax 
+    and no compiler.ast class.
+    """
+    def __init__(self, names, values, expr, lineno=None):
+        self.names = names
+        self.values = values
+        self.expr = expr
+        self.lineno = lineno
+
+    def getChildren(self):
+        return tuple(self.names) + tuple(self.values) + (self.expr,)
+
+    def getChildNodes(self):
+        return tuple(self.names) + tuple(self.values) + (self.expr,)
+
+    def __repr__(self):
+        return "Let(%r, %r, %r)" % (self.names, self.values, self.expr)
+
+Let = make_class(Let)
+
+NODES = frozenset(CLASSES.values()) | frozenset([Let])
+
+def with_ir_classes(table):
+    """Returns a copy of a dict keyed by compiler.ast classes, with the
+    IR class of each key as another key for the same value.
+    """
+    result = dict(table)
+    for cls, value in table.items():
+        if cls in CLASSES:
+            result[CLASSES[cls]] = value
+    return result
+
+def attributes(node):
+    """Returns the names and values of the attributes of a compiler.ast or
+    IR node.
+    """
+    slots = getattr(node.__class__, "__slots__", None)
+    if slots is None:
+        return node.__dict__.items()
+    return [(name, getattr(node, name, None)) for name in slots]
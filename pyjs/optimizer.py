@@ -0,0 +1,315 @@
+"""Optimization passes over the AST.
+
+Optimization levels:
+
+    0 - no optimization
+    1 - constant folding
+    2 - constant folding and dead code elimination
+"""
+from compiler import ast
+import ir
+import generators
+import operator
+
+# largest integer that can be represented exactly in javascript
+MAX_SAFE_INTEGER = 2**53
+
+# strings longer than this are not created by folding
+MAX_STRING_LENGTH = 4096
+
+BINARY_OPERATORS = ir.with_ir_classes({
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mul: operator.mul,
+    ast.Div: operator.div,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Power: operator.pow,
+    ast.LeftShift: operator.lshift,
+    ast.RightShift: operator.rshift,
+})
+
+BITWISE_OPERATORS = ir.with_ir_classes({
+    ast.Bitand: operator.and_,
+    ast.Bitor: operator.or_,
+    ast.Bitxor: operator.xor,
+})
+
+UNARY_OPERATORS = ir.with_ir_classes({
+    ast.UnaryAdd: operator.pos,
+    ast.UnarySub: operator.neg,
+    ast.Invert: operator.invert,
+})
+
+CONSTANT_NAMES = {
+    "True": True,
+    "False": False,
+    "None": None,
+}
+
+# marker for statements that are removed
+REMOVED = object()
+
+def optimize(tree, level):
+    """Optimizes the tree in place and returns it."""
+    if level <= 0:
+        return tree
+    return Optimizer(level).optimize(tree)
+
+def is_constant(node):
+    return isinstance(node, ast.Const) or isinstance(node, ast.Name) and node.name in CONSTANT_NAMES
+
+def is_simple(node):
+    """True if evaluating node has no side effects."""
+    return isinstance(node, (ast.Const, ast.Name))
+
+def contains_yield(nodes):
+    """True if one of the nodes has a yield of its function, which makes 
+    the function a generator even where the yield is never executed.
+    """
+    return [n for n in nodes if n is not None and generators.find(ir.Stmt([n]), (ast.Yield,), generators.SCOPE_NODES)] != []
+
+def get_value(node):
+    if isinstance(node, ast.Const):
+        return node.value
+    else:
+        return CONSTANT_NAMES[node.name]
+
+def make_constant(value, lineno=None):
+    """Returns a node for value or None if value can't be represented in javascript."""
+    if isinstance(value, bool) or value is None:
+        return ir.Name(repr(value), lineno=lineno)
+    elif isinstance(value, (int, long)):
+        if -MAX_SAFE_INTEGER <= value <= MAX_SAFE_INTEGER:
+            return ir.Const(int(value), lineno=lineno)
+    elif isinstance(value, float):
+        # inf and nan have no literals
+        if value - value == 0:
+            return ir.Const(value, lineno=lineno)
+    elif isinstance(value, basestring):
+        if len(value) <= MAX_STRING_LENGTH:
+            return ir.Const(value, lineno=lineno)
+
+def is_number(value):
+    return isinstance(value, (int, long, float)) and not isinstance(value, bool)
+
+class Optimizer:
+    def __init__(self, level):
+        self.level = level
+
+    def optimize(self, tree):
+        """Optimizes every node of the tree after optimizing its children.
+
+        The nodes are processed in an explicit post-order, so that very
+        deep trees do not hit the recursion limit.
+        """
+        nodes = []
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            stack.extend(node.getChildNodes())
+
+        # reversed pre-order puts children before their parents
+        nodes.reverse()
+
+        replaced = {}
+        for node in nodes:
+            self.replace_children(node, replaced)
+            new = self.optimize_node(node)
+            if new is not node:
+                replaced[node] = new
+
+        return replaced.get(tree, tree)
+
+    def replace_children(self, node, replaced):
+        if not replaced:
+            return
+
+        if isinstance(node, ast.Stmt):
+            node.nodes = self.replace_statements(node.nodes, replaced)
+            return
+
+        for name, value in ir.attributes(node):
+            if isinstance(value, ast.Node):
+                if value in replaced:
+                    setattr(node, name, replaced[value])
+            elif isinstance(value, (list, tuple)):
+                new = self.replace_in(value, replaced)
+                if new is not value:
+                    setattr(node, name, new)
+
+    def replace_in(self, values, replaced):
+        """Replaces the nodes in a list or tuple, which can contain more lists and tuples."""
+        result = []
+        changed = False
+        for v in values:
+            if isinstance(v, ast.Node) and v in replaced:
+                v = replaced[v]
+                changed = True
+            elif isinstance(v, (list, tuple)):
+                v2 = self.replace_in(v, replaced)
+                changed = changed or v2 is not v
+                v = v2
+            result.append(v)
+
+        if not changed:
+            return values
+        elif isinstance(values, tuple):
+            return tuple(result)
+        else:
+            return result
+
+    def replace_statements(self, statements, replaced):
+        result = []
+        for n in statements:
+            n = replaced.get(n, n)
+            if n is REMOVED:
+                pass
+            elif isinstance(n, ast.Stmt):
+                # body of an eliminated compound statement
+                result.extend(n.nodes)
+            else:
+                result.append(n)
+        return result
+
+    def optimize_node(self, node):
+        f = getattr(self, "optimize_" + node.__class__.__name__, None)
+        if f:
+            return f(node)
+        elif node.__class__ in BINARY_OPERATORS:
+            return self.fold_binary(node, BINARY_OPERATORS[node.__class__])
+        elif node.__class__ in BITWISE_OPERATORS:
+            return self.fold_bitwise(node, BITWISE_OPERATORS[node.__class__])
+        elif node.__class__ in UNARY_OPERATORS:
+            return self.fold_unary(node, UNARY_OPERATORS[node.__class__])
+        else:
+            return node
+
+    # constant folding
+
+    def fold_binary(self, node, op):
+        if not (isinstance(node.left, ast.Const) and isinstance(node.right, ast.Const)):
+            return node
+
+        left, right = node.left.value, node.right.value
+        if is_number(left) and is_number(right):
+            pass
+        elif isinstance(node, ast.Add) and isinstance(left, basestring) and isinstance(right, basestring):
+            pass
+        else:
+            return node
+
+        if op in (operator.pow, operator.lshift) and right > 128:
+            # don't create huge numbers just to find that they can't be represented
+            return node
+
+        try:
+            value = op(left, right)
+        except (ArithmeticError, ValueError):
+            # leave the error to runtime
+            return node
+        return make_constant(value, node.lineno) or node
+
+    def fold_bitwise(self, node, op):
+        values = [n.value for n in node.nodes if isinstance(n, ast.Const)]
+        if len(values) != len(node.nodes) or not all(isinstance(v, (int, long)) for v in values):
+            return node
+        return make_constant(reduce(op, values), node.lineno) or node
+
+    def fold_unary(self, node, op):
+        if isinstance(node.expr, ast.Const) and is_number(node.expr.value):
+            if op is operator.invert and isinstance(node.expr.value, float):
+                return node
+            return make_constant(op(node.expr.value), node.lineno) or node
+        return node
+
+    def optimize_Not(self, node):
+        if is_constant(node.expr):
+            return make_constant(not get_value(node.expr), node.lineno)
+        return node
+
+    def optimize_Let(self, node):
+        # an inlined expression that is a constant or a name needs no parentheses
+        if not node.names and isinstance(node.expr, (ast.Const, ast.Name)):
+            return node.expr
+        return node
+
+    def optimize_And(self, node):
+        return self.fold_boolean(node, stop_when=False)
+
+    def optimize_Or(self, node):
+        return self.fold_boolean(node, stop_when=True)
+
+    def fold_boolean(self, node, stop_when):
+        """Folds an and/or expression.
+
+        Evaluation stops at the first operand whose truth value is stop_when
+        (False for and, True for or) and that operand is the result.
+        Constants that don't stop the evaluation can be dropped, unless they
+        are the last operand.
+        """
+        nodes = []
+        last = len(node.nodes) - 1
+        for i, n in enumerate(node.nodes):
+            if is_constant(n):
+                if bool(get_value(n)) == stop_when:
+                    nodes.append(n)
+                    break
+                elif i == last:
+                    nodes.append(n)
+            else:
+                nodes.append(n)
+
+        if len(nodes) == 1:
+            return nodes[0]
+        elif len(nodes) != len(node.nodes):
+            return node.__class__(nodes, lineno=node.lineno)
+        else:
+            return node
+
+    # dead code elimination
+
+    def optimize_Stmt(self, node):
+        if self.level < 2:
+            return node
+
+        # statements after return, break, continue and raise are never executed
+        for i, n in enumerate(node.nodes):
+            if isinstance(n, (ast.Return, ast.Break, ast.Continue, ast.Raise)):
+                if not contains_yield(node.nodes[i+1:]):
+                    del node.nodes[i+1:]
+                break
+        return node
+
+    def optimize_If(self, node):
+        if self.level < 2:
+            return node
+
+        tests = []
+        else_ = node.else_
+        for test, code in node.tests:
+            if not is_constant(test):
+                tests.append((test, code))
+            elif get_value(test):
+                # rest of the branches are never executed
+                else_ = code
+                break
+
+        removed = [code for test, code in node.tests if (test, code) not in tests and code is not else_]
+        if else_ is not node.else_:
+            removed.append(node.else_)
+        if contains_yield(removed):
+            return node
+
+        if not tests:
+            return else_ or REMOVED
+        elif len(tests) != len(node.tests) or else_ is not node.else_:
+            return ir.If(tests, else_, lineno=node.lineno)
+        else:
+            return node
+
+    def optimize_While(self, node):
+        if self.level >= 2 and is_constant(node.test) and not get_value(node.test) and not contains_yield([node.body]):
+            return node.else_ or REMOVED
+        return node
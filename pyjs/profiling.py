@@ -0,0 +1,130 @@
+"""Profiling of the compiler.
+
+Measures the time spent in each phase of the compilation and, for each
+type of AST node, the number of nodes visited, the time spent in visiting
+them and the number of bytes of javascript generated for them.
+
+    >>> js, report = pyjs.compile(code, profile=True)
+    >>> print profiling.format_report(report)
+"""
+from timeit import default_timer as timer
+
+PHASES = ["parse", "inline", "optimize", "scope", "codegen"]
+
+# fields of the statistics of a node type
+CALLS, CUMULATIVE, SELF, BYTES, SELF_BYTES = range(5)
+FIELDS = ["calls", "cumulative", "self", "bytes", "self_bytes"]
+
+class Profiler:
+    """Collects the profile of one or more compilations.
+
+    The compiler calls timed for each phase and wraps the visit functions
+    and the output with wrap and writer. Cumulative time and bytes of a
+    node include its children, self time and bytes don't.
+    """
+    def __init__(self):
+        self.phases = {}
+        self.nodes = {}
+
+        # [name, start time, time in children, bytes at start] for each node being visited
+        self.stack = []
+
+        # number of nodes of each type being visited, to avoid counting the
+        # cumulative values of nested nodes of the same type twice
+        self.active = {}
+
+        self.bytes = 0
+
+    def timed(self, phase, f, *args):
+        """Calls f with args and adds the time taken to the phase."""
+        t0 = timer()
+        try:
+            return f(*args)
+        finally:
+            self.phases[phase] = self.phases.get(phase, 0.0) + timer() - t0
+
+    def wrap(self, f, name):
+        """Returns a visit function that calls f and profiles it under name."""
+        def visit(node):
+            self.enter(name)
+            return self.track(f(node))
+        return visit
+
+    def track(self, code):
+        # the fragments of the node are emitted before the generator resumes
+        yield code
+        self.leave()
+
+    def writer(self, write):
+        """Returns a write function that counts the bytes written with it."""
+        def counting_write(fragment):
+            n = len(fragment)
+            self.bytes += n
+            if self.stack:
+                self.nodes[self.stack[-1][0]][SELF_BYTES] += n
+            write(fragment)
+        return counting_write
+
+    def enter(self, name):
+        if name not in self.nodes:
+            self.nodes[name] = [0, 0.0, 0.0, 0, 0]
+        self.nodes[name][CALLS] += 1
+        self.active[name] = self.active.get(name, 0) + 1
+        self.stack.append([name, timer(), 0.0, self.bytes])
+
+    def leave(self):
+        name, t0, children, bytes0 = self.stack.pop()
+        elapsed = timer() - t0
+
+        stats = self.nodes[name]
+        stats[SELF] += elapsed - children
+
+        self.active[name] -= 1
+        if not self.active[name]:
+            stats[CUMULATIVE] += elapsed
+            stats[BYTES] += self.bytes - bytes0
+
+        if self.stack:
+            self.stack[-1][2] += elapsed
+
+    def report(self):
+        """Returns the profile as a dictionary with phases and nodes.
+
+        The phases map each phase to its time in seconds and the nodes map
+        each node type to a dictionary with calls, cumulative, self, bytes
+        and self_bytes.
+        """
+        return {
+            "phases": dict(self.phases),
+            "nodes": dict((name, dict(zip(FIELDS, stats))) for name, stats in self.nodes.items()),
+        }
+
+def merge_reports(reports):
+    """Adds up the reports of many compilations."""
+    phases = {}
+    nodes = {}
+    for report in reports:
+        for phase, t in report["phases"].items():
+            phases[phase] = phases.get(phase, 0.0) + t
+        for name, stats in report["nodes"].items():
+            total = nodes.setdefault(name, dict.fromkeys(FIELDS, 0))
+            for field in FIELDS:
+                total[field] += stats[field]
+    return {"phases": phases, "nodes": nodes}
+
+def format_report(report, limit=None):
+    """Formats the report as text tables, with the node types sorted by self time."""
+    lines = []
+    lines.append("%-12s %10s" % ("phase", "time"))
+    order = dict((phase, i) for i, phase in enumerate(PHASES))
+    for phase in sorted(report["phases"], key=lambda p: (order.get(p, len(PHASES)), p)):
+        lines.append("%-12s %10.4f" % (phase, report["phases"][phase]))
+    lines.append("%-12s %10.4f" % ("total", sum(report["phases"].values())))
+    lines.append("")
+
+    lines.append("%-16s %8s %10s %10s %10s %10s" % ("node", "calls", "cumulative", "self", "bytes", "self bytes"))
+    nodes = sorted(report["nodes"].items(), key=lambda (name, stats): (-stats["self"], name))
+    for name, stats in nodes[:limit]:
+        lines.append("%-16s %8d %10.4f %10.4f %10d %10d" % (
+            name, stats["calls"], stats["cumulative"], stats["self"], stats["bytes"], stats["self_bytes"]))
+    return "\n".join(lines)
@@ -2,26 +2,1201 @@
  * pyjs runtime.
  *
  * Javascript library required for running code generated by pyjs compiler.
+ * It needs Map, which every current javascript engine has. In browsers it
+ * defines window.py and with node require returns py.
  */
 ;(function() {
+    var hasOwn = Object.prototype.hasOwnProperty;
+    var hasSymbols = typeof Symbol === "function" && typeof Symbol.iterator === "symbol";
+
+    function bind(f, obj) {
+        // binds a method to obj, keeping the signature of its parameters
+        var bound = f.bind(obj);
+        if (f.__signature__ !== undefined) {
+            bound.__signature__ = f.__signature__;
+        }
+        return bound;
+    }
+
+    // dicts
+
+    function Token(key) {
+        // the key in the map of a dict for a key that is equal by value,
+        // like a tuple, which must not be compared by identity
+        this.key = key;
+    }
+
+    // unique ids of the objects in the hashes of tuples
+    var ids = typeof WeakMap === "function" ? new WeakMap() : new Map();
+    var nextId = 1;
+
+    function hash(key) {
+        // returns a string that is equal for equal tuples
+        var h = "(";
+        for (var i = 0; i < key.length; i++) {
+            var x = key[i];
+            switch (typeof x) {
+            case "string":
+                h += JSON.stringify(x);
+                break;
+            case "number":
+                h += x === 0 ? "0" : x;
+                break;
+            case "boolean":
+                h += x ? "1" : "0";
+                break;
+            case "undefined":
+                h += "None";
+                break;
+            default:
+                if (x === null) {
+                    h += "None";
+                }
+                else if (Array.isArray(x)) {
+                    h += hash(x);
+                }
+                else {
+                    var id = ids.get(x);
+                    if (id === undefined) {
+                        ids.set(x, id = nextId++);
+                    }
+                    h += "#" + id;
+                }
+            }
+            h += ",";
+        }
+        return h + ")";
+    }
+
+    function Dict(items) {
+        // a python dict, which keeps the items in a Map.
+        //
+        // Strings, numbers and other objects are keys of the map
+        // themselves. Booleans are stored as 1 and 0, as they are equal
+        // in python, and tuples as a Token that is found by their hash.
+        this.map = new Map();
+        this.tokens = null;
+        this.booleans = null;
+        if (items) {
+            for (var i = 0; i < items.length; i++) {
+                this.__setitem__(items[i][0], items[i][1]);
+            }
+        }
+    }
+
+    Dict.prototype = {
+        key: function(key, create) {
+            // returns the key of the map for key, or undefined if it
+            // isn't in the map and create is false
+            switch (typeof key) {
+            case "string":
+            case "number":
+                return key;
+            case "boolean":
+                if (create && !this.map.has(+key)) {
+                    (this.booleans || (this.booleans = new Map())).set(+key, key);
+                }
+                return +key;
+            case "undefined":
+                return null;
+            }
+            if (!Array.isArray(key)) {
+                return key;
+            }
+            var h = hash(key);
+            var token = this.tokens !== null ? this.tokens.get(h) : undefined;
+            if (!token && create) {
+                token = new Token(key);
+                (this.tokens || (this.tokens = new Map())).set(h, token);
+            }
+            return token;
+        },
+
+        pykey: function(key) {
+            // returns the python key for a key of the map
+            if (key instanceof Token) {
+                return key.key;
+            }
+            if (this.booleans !== null && typeof key === "number" && this.booleans.has(key)) {
+                return this.booleans.get(key);
+            }
+            return key;
+        },
+
+        __getitem__: function(key) {
+            var k = this.key(key, false);
+            var value = this.map.get(k);
+            if (value === undefined && !this.map.has(k)) {
+                throw new Error("KeyError: " + py.repr(key));
+            }
+            return value;
+        },
+
+        __setitem__: function(key, value) {
+            this.map.set(this.key(key, true), value);
+        },
+
+        __delitem__: function(key) {
+            var k = this.key(key, false);
+            if (!this.map.delete(k)) {
+                throw new Error("KeyError: " + py.repr(key));
+            }
+            if (k instanceof Token) {
+                this.tokens.delete(hash(key));
+            }
+            else if (this.booleans !== null) {
+                this.booleans.delete(k);
+            }
+        },
+
+        __contains__: function(key) {
+            return this.map.has(this.key(key, false));
+        },
+
+        __len__: function() {
+            return this.map.size;
+        },
+
+        __iter__: function() {
+            return new MapIterator(this, this.map.keys(), KEYS);
+        },
+
+        __eq__: function(other) {
+            if (!(other instanceof Dict) || other.map.size !== this.map.size) {
+                return false;
+            }
+            var it = this.map.entries();
+            for (var e = it.next(); !e.done; e = it.next()) {
+                var key = this.pykey(e.value[0]);
+                if (!other.__contains__(key) || !py.eq(e.value[1], other.__getitem__(key))) {
+                    return false;
+                }
+            }
+            return true;
+        },
+
+        __repr__: function() {
+            var parts = [];
+            var it = this.map.entries();
+            for (var e = it.next(); !e.done; e = it.next()) {
+                parts.push(py.repr(this.pykey(e.value[0])) + ": " + py.repr(e.value[1]));
+            }
+            return "{" + parts.join(", ") + "}";
+        },
+
+        get: function(key, value) {
+            var k = this.key(key, false);
+            var v = this.map.get(k);
+            if (v === undefined && !this.map.has(k)) {
+                return value === undefined ? null : value;
+            }
+            return v;
+        },
+
+        has_key: function(key) {
+            return this.__contains__(key);
+        },
+
+        setdefault: function(key, value) {
+            var k = this.key(key, true);
+            if (this.map.has(k)) {
+                return this.map.get(k);
+            }
+            value = value === undefined ? null : value;
+            this.map.set(k, value);
+            return value;
+        },
+
+        pop: function(key, value) {
+            if (this.__contains__(key)) {
+                value = this.__getitem__(key);
+                this.__delitem__(key);
+            }
+            else if (value === undefined) {
+                throw new Error("KeyError: " + py.repr(key));
+            }
+            return value;
+        },
+
+        update: function(other) {
+            if (other instanceof Dict) {
+                var it = other.map.entries();
+                for (var e = it.next(); !e.done; e = it.next()) {
+                    this.__setitem__(other.pykey(e.value[0]), e.value[1]);
+                }
+            }
+            else {
+                for (var k in other) {
+                    if (hasOwn.call(other, k)) {
+                        this.__setitem__(k, other[k]);
+                    }
+                }
+            }
+        },
+
+        clear: function() {
+            this.map.clear();
+            this.tokens = this.booleans = null;
+        },
+
+        copy: function() {
+            var d = new Dict();
+            d.update(this);
+            return d;
+        },
+
+        keys: function() {
+            return collect(this.iterkeys());
+        },
+
+        values: function() {
+            return collect(this.itervalues());
+        },
+
+        items: function() {
+            return collect(this.iteritems());
+        },
+
+        iterkeys: function() {
+            return new MapIterator(this, this.map.keys(), KEYS);
+        },
+
+        itervalues: function() {
+            return new MapIterator(this, this.map.values(), VALUES);
+        },
+
+        iteritems: function() {
+            return new MapIterator(this, this.map.entries(), ITEMS);
+        }
+    };
+    Dict.prototype.constructor = Dict;
+
+    // iterators, which return py.stop from next when they are exhausted.
+    // They keep their state in properties instead of closures, so that
+    // creating one allocates a single object.
+
+    var stop = {};
+
+    function SequenceIterator(items) {
+        // iterator over an array or a string
+        this.items = items;
+        this.i = 0;
+    }
+
+    SequenceIterator.prototype.next = function() {
+        return this.i < this.items.length ? this.items[this.i++] : stop;
+    };
+
+    var KEYS = 0, VALUES = 1, ITEMS = 2;
+
+    function MapIterator(dict, it, kind) {
+        // iterator over the keys, values or items of a dict
+        this.dict = dict;
+        this.it = it;
+        this.kind = kind;
+    }
+
+    MapIterator.prototype.next = function() {
+        var e = this.it.next();
+        if (e.done) {
+            return stop;
+        }
+        if (this.kind === KEYS) {
+            return this.dict.pykey(e.value);
+        }
+        if (this.kind === VALUES) {
+            return e.value;
+        }
+        return [this.dict.pykey(e.value[0]), e.value[1]];
+    };
+
+    function NativeIterator(it) {
+        // iterator over a javascript iterable, like a Map or a Set
+        this.it = it;
+    }
+
+    NativeIterator.prototype.next = function() {
+        var e = this.it.next();
+        return e.done ? stop : e.value;
+    };
+
+    function collect(it) {
+        var items = [], x;
+        while ((x = it.next()) !== stop) {
+            items.push(x);
+        }
+        return items;
+    }
+
+    // methods of python lists and strings, which getattr binds to arrays
+    // and strings for the calls that aren't compiled to native methods
+
+    function compare(a, b) {
+        return a < b ? -1 : b < a ? 1 : 0;
+    }
+
+    var list_methods = {
+        append: function(x) {
+            this.push(x);
+            return null;
+        },
+
+        extend: function(items) {
+            items = Array.isArray(items) ? items.slice() : collect(py.iter(items));
+            for (var i = 0; i < items.length; i++) {
+                this.push(items[i]);
+            }
+            return null;
+        },
+
+        insert: function(i, x) {
+            if (i < 0) {
+                i = Math.max(0, i + this.length);
+            }
+            this.splice(i, 0, x);
+            return null;
+        },
+
+        pop: function(i) {
+            if (!this.length) {
+                throw new Error("IndexError: pop from empty list");
+            }
+            i = i === undefined || i === null ? this.length - 1 : i < 0 ? i + this.length : i;
+            if (i < 0 || i >= this.length) {
+                throw new Error("IndexError: pop index out of range");
+            }
+            return this.splice(i, 1)[0];
+        },
+
+        remove: function(x) {
+            this.splice(list_methods.index.call(this, x), 1);
+            return null;
+        },
+
+        index: function(x) {
+            for (var i = 0; i < this.length; i++) {
+                if (eq(this[i], x)) {
+                    return i;
+                }
+            }
+            throw new Error("ValueError: " + py.repr(x) + " is not in list");
+        },
+
+        count: function(x) {
+            var n = 0;
+            for (var i = 0; i < this.length; i++) {
+                if (eq(this[i], x)) {
+                    n++;
+                }
+            }
+            return n;
+        },
+
+        reverse: function() {
+            Array.prototype.reverse.call(this);
+            return null;
+        },
+
+        sort: function(cmp, key, reverse) {
+            // stable, also in reverse, like in python
+            var items = [];
+            for (var i = 0; i < this.length; i++) {
+                items.push([key ? key(this[i]) : this[i], i, this[i]]);
+            }
+            var sign = reverse ? -1 : 1;
+            cmp = cmp || compare;
+            items.sort(function(a, b) {
+                return sign * cmp(a[0], b[0]) || a[1] - b[1];
+            });
+            for (var i = 0; i < items.length; i++) {
+                this[i] = items[i][2];
+            }
+            return null;
+        }
+    };
+
+    function strip(s, chars, left, right) {
+        // the part of s without the chars at the left and the right end,
+        // whitespace by default
+        var i = 0, j = s.length;
+        var test = chars === undefined || chars === null ? function(c) { return /\s/.test(c); } : function(c) { return chars.indexOf(c) != -1; };
+        while (left && i < j && test(s.charAt(i))) {
+            i++;
+        }
+        while (right && j > i && test(s.charAt(j - 1))) {
+            j--;
+        }
+        return s.slice(i, j);
+    }
+
+    var str_methods = {
+        join: function(items) {
+            items = Array.isArray(items) ? items : collect(py.iter(items));
+            for (var i = 0; i < items.length; i++) {
+                if (typeof items[i] !== "string") {
+                    throw new Error("TypeError: sequence item " + i + ": expected string");
+                }
+            }
+            return items.join(String(this));
+        },
+
+        split: function(sep, maxsplit) {
+            var s = String(this), parts = [];
+            if (maxsplit === undefined || maxsplit === null || maxsplit < 0) {
+                maxsplit = Infinity;
+            }
+            if (sep === undefined || sep === null) {
+                // runs of whitespace, without empty strings at the ends
+                s = strip(s, null, true, false);
+                var m;
+                while (s && parts.length < maxsplit && (m = /\s/.exec(s)) !== null) {
+                    parts.push(s.slice(0, m.index));
+                    s = strip(s.slice(m.index), null, true, false);
+                }
+                if (s) {
+                    parts.push(s);
+                }
+                return parts;
+            }
+            if (sep === "") {
+                throw new Error("ValueError: empty separator");
+            }
+            parts = s.split(sep);
+            if (parts.length > maxsplit + 1) {
+                parts = parts.slice(0, maxsplit).concat([parts.slice(maxsplit).join(sep)]);
+            }
+            return parts;
+        },
+
+        strip: function(chars) {
+            return strip(String(this), chars, true, true);
+        },
+
+        lstrip: function(chars) {
+            return strip(String(this), chars, true, false);
+        },
+
+        rstrip: function(chars) {
+            return strip(String(this), chars, false, true);
+        },
+
+        upper: function() {
+            return String(this).toUpperCase();
+        },
+
+        lower: function() {
+            return String(this).toLowerCase();
+        },
+
+        startswith: function(prefix) {
+            var s = String(this), prefixes = Array.isArray(prefix) ? prefix : [prefix];
+            for (var i = 0; i < prefixes.length; i++) {
+                if (s.slice(0, prefixes[i].length) === prefixes[i]) {
+                    return true;
+                }
+            }
+            return false;
+        },
+
+        endswith: function(suffix) {
+            var s = String(this), suffixes = Array.isArray(suffix) ? suffix : [suffix];
+            for (var i = 0; i < suffixes.length; i++) {
+                if (s.length >= suffixes[i].length && s.slice(s.length - suffixes[i].length) === suffixes[i]) {
+                    return true;
+                }
+            }
+            return false;
+        },
+
+        replace: function(old, replacement, count) {
+            var s = String(this);
+            var parts = old === "" ? [""].concat(s.split(""), [""]) : s.split(old);
+            if (count !== undefined && count !== null && count >= 0 && parts.length > count + 1) {
+                parts = parts.slice(0, count).concat([parts.slice(count).join(old)]);
+            }
+            return parts.join(replacement);
+        },
+
+        find: function(sub, start) {
+            return String(this).indexOf(sub, start || 0);
+        },
+
+        index: function(sub, start) {
+            var i = String(this).indexOf(sub, start || 0);
+            if (i == -1) {
+                throw new Error("ValueError: substring not found");
+            }
+            return i;
+        },
+
+        count: function(sub) {
+            var s = String(this);
+            return sub === "" ? s.length + 1 : s.split(sub).length - 1;
+        }
+    };
+
+    // equality of python values, which compares tuples and lists by value
+    // and treats True and False as 1 and 0
+    function eq(a, b) {
+        if (a === b) {
+            return true;
+        }
+        var ta = typeof a, tb = typeof b;
+        if ((ta === "number" || ta === "boolean") && (tb === "number" || tb === "boolean")) {
+            return +a === +b;
+        }
+        if (ta !== "object" || tb !== "object" || a === null || b === null) {
+            return false;
+        }
+        if (Array.isArray(a)) {
+            if (!Array.isArray(b) || a.length !== b.length) {
+                return false;
+            }
+            for (var i = 0; i < a.length; i++) {
+                if (!eq(a[i], b[i])) {
+                    return false;
+                }
+            }
+            return true;
+        }
+        if (typeof a.__eq__ === "function") {
+            return a.__eq__(b);
+        }
+        return false;
+    }
+
+    // printing
+
+    var ESCAPES = {"\\": "\\\\", "\n": "\\n", "\r": "\\r", "\t": "\\t"};
+
+    function reprString(s) {
+        var quote = s.indexOf("'") !== -1 && s.indexOf('"') === -1 ? '"' : "'";
+        var result = quote;
+        for (var i = 0; i < s.length; i++) {
+            var c = s.charAt(i), code = s.charCodeAt(i);
+            if (c === quote) {
+                result += "\\" + c;
+            }
+            else if (hasOwn.call(ESCAPES, c)) {
+                result += ESCAPES[c];
+            }
+            else if (code < 0x20 || code >= 0x7f && code < 0x100) {
+                result += "\\x" + (code < 0x10 ? "0" : "") + code.toString(16);
+            }
+            else if (code >= 0x100) {
+                result += "\\u" + ("000" + code.toString(16)).slice(-4);
+            }
+            else {
+                result += c;
+            }
+        }
+        return result + quote;
+    }
+
+    function reprNumber(n) {
+        if (n !== n) {
+            return "nan";
+        }
+        if (n === Infinity || n === -Infinity) {
+            return n > 0 ? "inf" : "-inf";
+        }
+        return String(n);
+    }
+
+    // inline caches
+
+    // the most classes an inline cache remembers, the attribute accesses
+    // of a site that sees more of them always take the slow path
+    var MAX_CLASSES = 4;
+
+    // fills the unused slots for classes, it isn't the constructor of anything
+    var EMPTY = {};
+
+    // all the inline caches, for py.cache_stats
+    var caches = [];
+
+    function InlineCache(name, site) {
+        // the cache of one attribute access site, which remembers the
+        // classes of the objects it has seen: their constructor, which is
+        // much faster to read than their prototype
+        this.name = name;
+        this.site = site;
+        this.classes = [EMPTY, EMPTY, EMPTY, EMPTY];
+        this.seen = 0;
+        this.hits = 0;
+        this.misses = 0;
+        this.megamorphic = false;
+        this.get = this.compile;
+    }
+
+    InlineCache.prototype = {
+        compile: function(obj) {
+            // replaces get with a function of its own for the site on the
+            // first access, so that the engine's own inline cache for the
+            // property read is specific to the site too
+            var name = JSON.stringify(this.name);
+            try {
+                this.get = new Function("cache", "hasOwn", "bind",
+                    "var classes = cache.classes;\n" +
+                    "return function(obj) {\n" +
+                    "    if (obj !== null && typeof obj === 'object') {\n" +
+                    "        var c = obj.constructor, value;\n" +
+                    "        if ((c === classes[0] || c === classes[1] || c === classes[2] || c === classes[3]) && (value = obj[" + name + "]) !== undefined) {\n" +
+                    "            cache.hits++;\n" +
+                    "            return typeof value === 'function' && !hasOwn.call(obj, " + name + ") ? bind(value, obj) : value;\n" +
+                    "        }\n" +
+                    "    }\n" +
+                    "    return cache.miss(obj);\n" +
+                    "};")(this, hasOwn, bind);
+            }
+            catch (e) {
+                // new Function is not allowed by the content security policy
+                this.get = this.lookup;
+            }
+            return this.get(obj);
+        },
+
+        lookup: function(obj) {
+            // the same as the compiled get, for any site
+            if (obj !== null && typeof obj === "object" && this.classes.indexOf(obj.constructor) != -1) {
+                var value = obj[this.name];
+                if (value !== undefined) {
+                    this.hits++;
+                    return typeof value === "function" && !hasOwn.call(obj, this.name) ? bind(value, obj) : value;
+                }
+            }
+            return this.miss(obj);
+        },
+
+        slow: function(obj) {
+            // the get of a megamorphic site, which doesn't check the classes
+            this.misses++;
+            return py.getattr(obj, this.name);
+        },
+
+        miss: function(obj) {
+            // the attribute with all the rules of py.getattr, which raises
+            // AttributeError, remembering the class of obj
+            this.misses++;
+            var value = py.getattr(obj, this.name);
+            if (obj !== null && typeof obj === "object" && !Array.isArray(obj) && obj[this.name] !== undefined) {
+                var cls = obj.constructor;
+                if (this.classes.indexOf(cls) == -1) {
+                    if (this.seen < MAX_CLASSES) {
+                        this.classes[this.seen++] = cls;
+                    }
+                    else {
+                        this.megamorphic = true;
+                        this.get = this.slow;
+                    }
+                }
+            }
+            return value;
+        }
+    };
+
     var py = {
-        assert: function() {
-            
+        assert: function(test, fail) {
+            if (!py.bool(test)) {
+                throw new Error("AssertionError" + (fail === null || fail === undefined ? "" : ": " + py.str(fail)));
+            }
         },
+
+        bool: function(obj) {
+            // the truth value of obj in python
+            if (!obj) {
+                return false;
+            }
+            if (typeof obj !== "object") {
+                return true;
+            }
+            if (Array.isArray(obj)) {
+                return obj.length !== 0;
+            }
+            if (obj instanceof Dict) {
+                return obj.map.size !== 0;
+            }
+            if (typeof obj.__nonzero__ === "function") {
+                return !!obj.__nonzero__();
+            }
+            if (typeof obj.__len__ === "function") {
+                return obj.__len__() !== 0;
+            }
+            return true;
+        },
+
         floordiv: function(a, b) {
-            
+            if (typeof a === "number" && typeof b === "number") {
+                if (b === 0) {
+                    throw new Error("ZeroDivisionError: integer division or modulo by zero");
+                }
+                return Math.floor(a / b);
+            }
+            if (a !== null && a !== undefined && typeof a.__floordiv__ === "function") {
+                return a.__floordiv__(b);
+            }
+            throw new Error("TypeError: unsupported operand type(s) for //");
         },
+
+        eq: eq,
+
+        // called by the print statement with the items to print and "\n"
+        // as the last argument unless the statement ends with a comma
         print: function() {
+            var n = arguments.length, out = "";
+            var newline = n > 0 && arguments[n - 1] === "\n";
+            if (newline) {
+                n--;
+            }
+            for (var i = 0; i < n; i++) {
+                var s = py.str(arguments[i]);
+                if (py.softspace) {
+                    out += " ";
+                }
+                out += s;
+                // like python, no space after a string that ends with a newline or a tab
+                var last = s.charAt(s.length - 1);
+                py.softspace = !(typeof arguments[i] === "string" && last !== " " && /\s/.test(last));
+            }
+            if (newline) {
+                out += "\n";
+                py.softspace = false;
+            }
+            py.stdout.write(out);
+        },
+
+        softspace: false,
+
+        // writes complete lines to the console, can be replaced by any
+        // object with a write method
+        stdout: {
+            buffer: "",
+            write: function(s) {
+                var lines = (this.buffer + s).split("\n");
+                this.buffer = lines.pop();
+                for (var i = 0; i < lines.length; i++) {
+                    console.log(lines[i]);
+                }
+            }
+        },
+
+        repr: function(obj) {
+            switch (typeof obj) {
+            case "string":
+                return reprString(obj);
+            case "number":
+                return reprNumber(obj);
+            case "boolean":
+                return obj ? "True" : "False";
+            case "undefined":
+                return "None";
+            case "function":
+                return "<function " + (obj.name || "<lambda>") + ">";
+            }
+            if (obj === null) {
+                return "None";
+            }
+            if (Array.isArray(obj)) {
+                var parts = [];
+                for (var i = 0; i < obj.length; i++) {
+                    parts.push(py.repr(obj[i]));
+                }
+                return "[" + parts.join(", ") + "]";
+            }
+            if (typeof obj.__repr__ === "function") {
+                return obj.__repr__();
+            }
+            return String(obj);
+        },
+
+        str: function(obj) {
+            if (typeof obj === "string") {
+                return obj;
+            }
+            if (obj !== null && typeof obj === "object" && typeof obj.__str__ === "function") {
+                return obj.__str__();
+            }
+            return py.repr(obj);
+        },
+
+        signature: function(f, names, defaults, varargs, kwargs) {
+            // records the parameters of a compiled function, without self 
+            // for methods, for the calls that make_args resolves at runtime
+            f.__signature__ = {names: names, defaults: defaults || [], varargs: !!varargs, kwargs: !!kwargs};
+            return f;
+        },
+
+        staticmethod: function(f) {
+            // marks a method that is called without self, on its class too
+            f.__staticmethod__ = true;
+            return f;
+        },
+
+        classmethod: function(f) {
+            // marks a method that gets the class from this.constructor, on 
+            // its class too
+            f.__classmethod__ = true;
+            return f;
+        },
+
+        method: function(f) {
+            // returns a method that passes this as the first argument to f,
+            // which a decorator returned for a function that takes self
+            var method = function() {
+                return f.apply(this, [this].concat(Array.prototype.slice.call(arguments)));
+            };
+            var signature = f.__signature__;
+            if (signature !== undefined && signature.names.length) {
+                method.__signature__ = {names: signature.names.slice(1), defaults: signature.defaults,
+                    varargs: signature.varargs, kwargs: signature.kwargs};
+            }
+            return method;
+        },
+
+        call: function(f, self, args, star_args, dstar_args) {
+            // calls f with the positional args, *star_args and **dstar_args
+            return f.apply(self, py.make_args(f, args, star_args, dstar_args));
+        },
+
+        make_args: function(f, args, star_args, dstar_args) {
+            // returns the javascript arguments for calling f with args, 
+            // *star_args and **dstar_args: the keyword arguments go to the 
+            // positions of the parameters of their names, the missing ones 
+            // get their defaults and the extra ones are passed as a list 
+            // for *args and a dict for **kwargs, like in a resolved call
+            if (star_args !== null && star_args !== undefined) {
+                if (Array.isArray(star_args)) {
+                    args = args.concat(star_args);
+                }
+                else {
+                    var it = py.iter(star_args), x;
+                    while ((x = it.next()) !== stop) {
+                        args.push(x);
+                    }
+                }
+            }
+            var keywords = dstar_args !== null && dstar_args !== undefined && py.bool(dstar_args) ? dstar_args.items() : [];
+            var signature = typeof f === "function" ? f.__signature__ : undefined;
+            var name = (typeof f === "function" && f.name || "<lambda>") + "()";
+            if (signature === undefined) {
+                // a javascript function or a function without parameters
+                if (keywords.length) {
+                    throw new Error("TypeError: " + name + " takes no keyword arguments");
+                }
+                return args;
+            }
+
+            var names = signature.names, n = names.length;
+            if (args.length > n && !signature.varargs) {
+                throw new Error("TypeError: " + name + " takes at most " + n + " argument" + (n == 1 ? "" : "s") + " (" + args.length + " given)");
+            }
+            var result = args.slice(0, n), given = result.map(function() { return true; });
+            var extra = signature.kwargs ? py.dict() : null;
+            for (var i = 0; i < keywords.length; i++) {
+                var k = keywords[i][0], j = names.indexOf(k);
+                if (j != -1) {
+                    if (given[j]) {
+                        throw new Error("TypeError: " + name + " got multiple values for keyword argument '" + k + "'");
+                    }
+                    result[j] = keywords[i][1];
+                    given[j] = true;
+                }
+                else if (extra !== null) {
+                    extra.__setitem__(k, keywords[i][1]);
+                }
+                else {
+                    throw new Error("TypeError: " + name + " got an unexpected keyword argument '" + k + "'");
+                }
+            }
+            var first = n - signature.defaults.length;
+            for (var i = 0; i < n; i++) {
+                if (!given[i]) {
+                    if (i < first) {
+                        throw new Error("TypeError: " + name + " takes at least " + first + " argument" + (first == 1 ? "" : "s"));
+                    }
+                    result[i] = signature.defaults[i - first];
+                }
+            }
+            if (signature.varargs) {
+                result.push(args.slice(n));
+            }
+            if (extra !== null) {
+                result.push(extra);
+            }
+            return result;
+        },
+
+        // dicts
+
+        Dict: Dict,
+
+        dict: function(items) {
+            // returns a dict with the [key, value] pairs in items
+            return new Dict(items);
+        },
+
+        in: function(item, obj) {
+            // the in operator, with fast paths for strings, arrays and dicts
+            if (typeof obj === "string") {
+                if (typeof item !== "string") {
+                    throw new Error("TypeError: 'in <string>' requires string as left operand");
+                }
+                return obj.indexOf(item) !== -1;
+            }
+            if (obj === null || obj === undefined) {
+                throw new Error("TypeError: argument of type 'NoneType' is not iterable");
+            }
+            if (Array.isArray(obj)) {
+                switch (typeof item) {
+                case "string":
+                    return obj.indexOf(item) !== -1;
+                case "number":
+                    return obj.indexOf(item) !== -1 || (item === 0 || item === 1) && obj.indexOf(item === 1) !== -1;
+                case "boolean":
+                    return obj.indexOf(item) !== -1 || obj.indexOf(+item) !== -1;
+                }
+                for (var i = 0; i < obj.length; i++) {
+                    if (eq(item, obj[i])) {
+                        return true;
+                    }
+                }
+                return false;
+            }
+            if (obj instanceof Dict) {
+                return obj.__contains__(item);
+            }
+            if (typeof obj.__contains__ === "function") {
+                return obj.__contains__(item);
+            }
+            if ((typeof Map === "function" && obj instanceof Map) || (typeof Set === "function" && obj instanceof Set)) {
+                return obj.has(item);
+            }
+            if (typeof obj.next === "function" || typeof obj.__iter__ === "function") {
+                var it = py.iter(obj), x;
+                while ((x = it.next()) !== stop) {
+                    if (eq(item, x)) {
+                        return true;
+                    }
+                }
+                return false;
+            }
+            // other objects are iterated over their keys
+            return typeof item === "string" && hasOwn.call(obj, item);
+        },
+
+        // iterators
+
+        // returned by the next method of iterators when there are no more items
+        stop: stop,
+
+        iter: function(obj) {
+            // returns an iterator over the items of obj
+            if (typeof obj === "string" || Array.isArray(obj)) {
+                return new SequenceIterator(obj);
+            }
+            if (obj === null || obj === undefined) {
+                throw new Error("TypeError: 'NoneType' object is not iterable");
+            }
+            if (typeof obj.__iter__ === "function") {
+                return obj.__iter__();
+            }
+            if (hasSymbols && typeof obj[Symbol.iterator] === "function") {
+                return new NativeIterator(obj[Symbol.iterator]());
+            }
+            if (typeof obj.next === "function") {
+                return obj;
+            }
+            return new SequenceIterator(obj.length === undefined ? Object.keys(obj) : obj);
+        },
+
+        generator: function(step) {
+            // returns the generator object for the state machine of a
+            // compiled generator or a native javascript generator
+            if (typeof step !== "function") {
+                var native = step;
+                step = function(value) {
+                    var result = native.next(value);
+                    return result.done ? py.stop : result.value;
+                };
+            }
+            var done = false;
+            var generator = {
+                next: function() {
+                    return generator.send(undefined);
+                },
+                send: function(value) {
+                    if (done) {
+                        return py.stop;
+                    }
+                    try {
+                        var result = step(value);
+                    }
+                    catch (e) {
+                        done = true;
+                        throw e;
+                    }
+                    if (result === py.stop) {
+                        done = true;
+                    }
+                    return result;
+                }
+            };
+            return generator;
+        },
+
+        getattr: function(obj, name) {
+            // the methods of python lists and strings come before the 
+            // javascript methods of the same name
+            if (Array.isArray(obj) && hasOwn.call(list_methods, name)) {
+                return bind(list_methods[name], obj);
+            }
+            if (typeof obj === "string" && hasOwn.call(str_methods, name)) {
+                return bind(str_methods[name], obj);
+            }
+            if (obj !== null && obj !== undefined) {
+                var value = obj[name];
+                if (value !== undefined || name in Object(obj)) {
+                    // methods of objects are bound to the object, like in python
+                    if (typeof value === "function" && typeof obj === "object" && !hasOwn.call(obj, name)) {
+                        return bind(value, obj);
+                    }
+                    return value;
+                }
+            }
+            if (typeof obj === "function" && obj.prototype && name in obj.prototype) {
+                // an attribute of a class, where methods are unbound and
+                // take self as their first argument
+                var attr = obj.prototype[name];
+                if (typeof attr === "function" && attr.__staticmethod__) {
+                    return attr;
+                }
+                if (typeof attr === "function" && attr.__classmethod__) {
+                    return bind(attr, obj.prototype);
+                }
+                if (typeof attr === "function") {
+                    var unbound = function(self) {
+                        return attr.apply(self, Array.prototype.slice.call(arguments, 1));
+                    };
+                    var signature = attr.__signature__;
+                    if (signature !== undefined) {
+                        unbound.__signature__ = {names: ["self"].concat(signature.names), defaults: signature.defaults,
+                            varargs: signature.varargs, kwargs: signature.kwargs};
+                    }
+                    return unbound;
+                }
+                return attr;
+            }
+            throw new Error("AttributeError: " + name);
+        },
+
+        inline_caches: function(names, sites) {
+            // returns the inline caches of the attribute access sites of a module
+            var result = [];
+            for (var i = 0; i < names.length; i++) {
+                result.push(new InlineCache(names[i], sites[i]));
+            }
+            caches.push.apply(caches, result);
+            return result;
+        },
+
+        cache_stats: function() {
+            // returns the hits, misses and number of classes of the
+            // inline caches that have been used, the least hit first
+            var stats = [];
+            for (var i = 0; i < caches.length; i++) {
+                var c = caches[i];
+                if (c.hits + c.misses) {
+                    stats.push({site: c.site, name: c.name, hits: c.hits, misses: c.misses,
+                        classes: c.seen, megamorphic: c.megamorphic});
+                }
+            }
+            return stats.sort(function(a, b) {
+                return a.hits / (a.hits + a.misses) - b.hits / (b.hits + b.misses);
+            });
+        },
+
+        // modules
+
+        factories: {},
+        modules: {},
+
+        define: function(name, factory) {
+            py.factories[name] = factory;
+        },
+
+        import: function(name) {
+            // returns the module, running it when it is imported for the first time
+            if (name in py.modules) {
+                return py.modules[name];
+            }
+            if (!(name in py.factories)) {
+                throw new Error("ImportError: No module named " + name);
+            }
+
+            var i = name.lastIndexOf(".");
+            var parent = i == -1 ? null : py.import(name.substring(0, i));
+
+            // registered before running, so that circular imports get the module
+            var module = py.modules[name] = {};
+            var exports = py.factories[name]();
+            for (var k in exports) {
+                // copies the getters and setters of the globals that functions rebind
+                Object.defineProperty(module, k, Object.getOwnPropertyDescriptor(exports, k));
+            }
+            if (parent) {
+                parent[name.substring(i+1)] = module;
+            }
+            return module;
+        },
+
+        importfrom: function(name, attr) {
+            var module = py.import(name);
+            if (attr in module) {
+                return module[attr];
+            }
+            return py.import(name + "." + attr);
         },
-        
-        repr: function() {
-            
+
+        range_step: function(step) {
+            // checks the step of a range that is not a constant
+            if (step === 0) {
+                throw new Error("ValueError: range() step argument must not be zero");
+            }
+            return step;
         },
-        
-        make_args: function(args, star_args, dstar_args) {
-            
+
+        unpack: function(value, n) {
+            // checks that value has exactly n items for tuple assignment
+            if (!Array.isArray(value) && typeof value !== "string") {
+                // collects the items of other iterables, one more than 
+                // needed at most, which is enough to tell that there are too many
+                var items = [], it = py.iter(value), x;
+                while (items.length <= n && (x = it.next()) !== stop) {
+                    items.push(x);
+                }
+                value = items;
+            }
+            if (value.length > n) {
+                throw new Error("ValueError: too many values to unpack");
+            }
+            else if (value.length < n) {
+                throw new Error("ValueError: need more than " + value.length + " value" + (value.length == 1 ? "" : "s") + " to unpack");
+            }
+            return value;
         }
     };
-    
-    window.py = py;    
+
+    // keyword arguments of the methods of lists and strings
+    py.signature(list_methods.sort, ["cmp", "key", "reverse"], [null, null, false]);
+    py.signature(str_methods.split, ["sep", "maxsplit"], [null, -1]);
+
+    var root = typeof window !== "undefined" ? window : typeof global !== "undefined" ? global : this;
+    root.py = py;
+    if (typeof nil === "undefined") {
+        // the compiled code uses nil for None
+        root.nil = null;
+    }
+    if (typeof module !== "undefined" && module.exports) {
+        module.exports = py;
+    }
 })();
@@ -1,82 +1,517 @@
 """pyjs compiler.
 """
+import os
 import compiler
 from compiler import ast
 import json
+import hashlib
+import re
+import string
+from types import InstanceType
+
+import scope
+import optimizer
+import typeinfer
+import sourcemap
+import profiling
+import generators
+import frontend as frontends
+import inliner
+import ir
+
+__version__ = "0.0.1"
+
+_fingerprint = None
+
+def get_fingerprint():
+    """Returns the version of the compiler with a hash of the sources of
+    its modules and of the runtime, which changes with the generated code 
+    even when the version doesn't.
+    """
+    global _fingerprint
+    if _fingerprint is None:
+        sha = hashlib.sha1()
+        dirname = os.path.dirname(os.path.abspath(__file__))
+        for name in sorted(os.listdir(dirname)):
+            if name.endswith(".py") and not name.startswith("test_") or name == "py.js":
+                f = open(os.path.join(dirname, name), "rb")
+                try:
+                    sha.update("%s\n%s\n" % (name, f.read()))
+                finally:
+                    f.close()
+        _fingerprint = "%s-%s" % (__version__, sha.hexdigest()[:12])
+    return _fingerprint
 
 class CompilerError(Exception):
     pass
     
-def compile(code):
-    _ast = compiler.parse('""\n' + code)
-    return Visitor().visit(_ast)
+def compile(code, cache=None, optimize=0, minify=False, source_map=False, filename="<string>", profile=None, module=None, target="es5", frontend=None, inline_caches=False, inline=0):
+    """Compiles python code into javascript.
     
-class Visitor:       
+    When a cache is specified, the compiled code is looked up in the cache 
+    before compiling and stored in it afterwards.
+    
+    The optimize argument specifies the optimization level. Level 1 folds 
+    constant expressions and level 2 also removes unreachable code.
+    
+    When minify is true, the generated code has no optional whitespace, 
+    local variables of functions get short names and repeated strings are 
+    stored in variables.
+    
+    When source_map is true, returns the javascript and its source map in 
+    Source Map v3 format as a JSON string. The filename is the name of the 
+    python source in the map.
+    
+    When profile is True, the compilation is profiled and the report of 
+    the profile is returned after the javascript (and the source map). See 
+    profiling.Profiler.report for the format. The profile can also be a 
+    profiling.Profiler, which collects the profile of many compilations.
+    
+    When module is the name of a module, the code is compiled into a 
+    factory registered with py.define, which runs only on the first 
+    py.import of the module. The variables of the module are local to the 
+    factory and its exports are cached by the runtime after that.
+    
+    The target is the javascript version to generate code for. Generators 
+    are compiled into state machines for "es5" and into native javascript 
+    generators for "es6".
+    
+    The frontend is the parser to use, "ast" or "compiler". Both generate 
+    the same javascript. See frontend.parse.
+    
+    When inline_caches is true, each attribute access gets its own inline 
+    cache in the runtime, which reads the attribute directly from objects 
+    with a prototype it has seen before and counts its hits and misses. 
+    See py.cache_stats in py.js.
+    
+    When inline is a number, the calls to small functions of the module 
+    whose body is a single return without side effects are replaced by 
+    the expression that they return, if it has at most that many nodes. 
+    The inline can also be an inliner.Inliner, which collects the report of 
+    the inlined calls of one or more compilations.
+    """
+    buf = Buffer()
+    smap = source_map and sourcemap.SourceMap(filename) or None
+    profiler = profile is True and profiling.Profiler() or profile or None
+    
+    compile_to(buf, code, cache=cache, optimize=optimize, minify=minify, source_map=smap, profile=profiler, module=module, target=target, frontend=frontend, inline_caches=inline_caches, inline=inline)
+    
+    result = [buf.getvalue()]
+    if smap:
+        result.append(smap.to_json())
+    if profile is True:
+        result.append(profiler.report())
+    
+    if len(result) == 1:
+        return result[0]
+    return tuple(result)
+    
+def compile_to(stream, code, cache=None, optimize=0, minify=False, source_map=None, profile=None, module=None, target="es5", frontend=None, inline_caches=False, inline=0):
+    """Compiles python code and writes the javascript to stream.
+    
+    The code is written in small fragments as it is generated, without 
+    building the whole output in memory. Accepts the same options as compile,
+    except that source_map is a sourcemap.SourceMap to which the mappings 
+    are added and profile is a profiling.Profiler. The cache is not used 
+    when generating a source map or profiling.
+    """
+    options = dict(optimize=optimize, minify=bool(minify))
+    if module:
+        options["module"] = module
+    if target != "es5":
+        options["target"] = target
+    if frontend:
+        options["frontend"] = frontend
+    if inline_caches:
+        options["inline_caches"] = True
+    if inline:
+        options["inline"] = isinstance(inline, inliner.Inliner) and inline.budget or inline
+    
+    if isinstance(inline, inliner.Inliner):
+        # the inliner records the inlined calls of every compilation
+        _compile(code, options, stream.write, source_map, profile, inline)
+    elif source_map is not None or profile is not None:
+        _compile(code, options, stream.write, source_map, profile)
+    elif cache is not None:
+        key = cache.key(code, get_fingerprint(), options)
+        js = cache.get(key)
+        if js is None:
+            buf = Buffer()
+            _compile(code, options, buf.write)
+            js = buf.getvalue()
+            cache.put(key, js)
+        stream.write(js)
+    else:
+        _compile(code, options, stream.write)
+    
+def _compile(code, options, write, source_map=None, profiler=None, inlines=None):
+    timed = profiler and profiler.timed or _call
+    
+    _ast = timed("parse", frontends.parse, '""\n' + code, options.get("frontend"))
+    if options.get("inline"):
+        inlines = inlines or inliner.Inliner(options["inline"])
+        # the line added before the code isn't in the source
+        _ast = timed("inline", inlines.inline, _ast, 1)
+    _ast = timed("optimize", optimizer.optimize, _ast, options["optimize"])
+    scopes = timed("scope", scope.analyze, _ast)
+    visitor = Visitor(scopes, minify=options.get("minify"), module=options.get("module"), target=options.get("target", "es5"), 
+        inline_caches=options.get("inline_caches", False))
+    
+    if source_map is not None:
+        # the line added before the code isn't in the source
+        visitor.tracker = sourcemap.SourceMapWriter(write, source_map, line_offset=1)
+        write = visitor.tracker.write
+    if options.get("minify"):
+        write = Minifier(write).write
+    if profiler:
+        visitor.profiler = profiler
+        write = profiler.writer(write)
+    timed("codegen", visitor.emit, _ast, write)
+    
+def _call(phase, f, *args):
+    return f(*args)
+    
+class Buffer:
+    """File-like object that collects the written fragments."""
     def __init__(self):
+        self.fragments = []
+        self.write = self.fragments.append
+        
+    def getvalue(self):
+        return "".join(self.fragments)
+    
+class Minifier:
+    """Writer that removes the optional whitespace from the javascript 
+    written through it.
+    
+    Whitespace is kept only where it separates two words or two + or - 
+    signs. A line break that ends a statement without a semicolon is 
+    replaced by a semicolon. String literals are never split across 
+    fragments, so each fragment can be processed on its own.
+    """
+    TOKENS = re.compile(r'("(?:[^"\\]|\\.)*")|(\s+)|([^"\s]+)')
+    WORD = re.compile(r"[\w$]")
+    SPECIAL = re.compile(r'["\s]')
+    
+    def __init__(self, write):
+        self._write = write
+        self.last = None
+        self.space = None
+        
+    def write(self, fragment):
+        if not self.SPECIAL.search(fragment):
+            if fragment:
+                self.write_token(fragment)
+            return
+            
+        for literal, space, text in self.TOKENS.findall(fragment):
+            if space:
+                if self.space != "\n":
+                    self.space = "\n" in space and "\n" or " "
+            else:
+                self.write_token(literal or text)
+                
+    def write_token(self, text):
+        last, first = self.last, text[0]
+        if self.space and last:
+            if self.space == "\n" and last not in ";{}" and first != "}":
+                self._write(";")
+            elif self.WORD.match(last) and self.WORD.match(first) or last in "+-" and first == last:
+                self._write(" ")
+        self.space = None
+        self.last = text[-1]
+        self._write(text)
+
+# reserved words and names that the generated code uses, which 
+# can't be used as names of local variables
+JS_RESERVED = set("""
+    break case catch class const continue debugger default delete do else enum
+    export extends false finally for function if implements import in 
+    instanceof interface let new null package private protected public return
+    static super switch this throw true try typeof var void while with yield
+    arguments undefined NaN Infinity eval Math window py nil
+""".split())
+
+def short_name(n):
+    """Returns the n-th short identifier: a, b, ..., Z, aa, ba, ..."""
+    name = string.ascii_letters[n % 52]
+    n //= 52
+    while n:
+        n -= 1
+        name += (string.ascii_letters + string.digits)[n % 62]
+        n //= 62
+    return name
+    
+def get_number(node):
+    """Returns the value of node if it is a numeric constant, None otherwise."""
+    if isinstance(node, ast.UnarySub):
+        value = get_number(node.expr)
+        if value is not None:
+            return -value
+    elif isinstance(node, ast.Const) and isinstance(node.value, (int, long, float)):
+        return node.value
+        
+def is_constant(node):
+    """True if node is a constant, which can be evaluated anywhere."""
+    if isinstance(node, ast.Name):
+        return node.name in ("None", "True", "False")
+    return get_number(node) is not None or isinstance(node, ast.Const)
+    
+def get_decorators(node):
+    """Returns the decorator nodes of a Function node."""
+    return node.decorators and node.decorators.nodes or []
+    
+def get_slots(node):
+    """Returns the names in the __slots__ of a class node or None if it has
+    no __slots__ or they are not a constant.
+    """
+    slots = None
+    for n in node.code.nodes:
+        if isinstance(n, ast.Assign) and [a for a in n.nodes if isinstance(a, ast.AssName) and a.name == "__slots__"]:
+            value = n.expr
+            if isinstance(value, ast.Const) and isinstance(value.value, str):
+                slots = [value.value]
+            elif isinstance(value, (ast.Tuple, ast.List)) and all(isinstance(x, ast.Const) and isinstance(x.value, str) for x in value.nodes):
+                slots = [x.value for x in value.nodes]
+            else:
+                slots = None
+    return slots
+    
+def get_self_attributes(function):
+    """Returns the names of the attributes of self that a method assigns, 
+    in the order of the assignments.
+    """
+    if not function.argnames or not isinstance(function.argnames[0], str):
+        return []
+    names = []
+    stack = [function.code]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ast.AssAttr) and isinstance(node.expr, ast.Name) and node.expr.name == function.argnames[0]:
+            if node.attrname not in names:
+                names.append(node.attrname)
+        elif not isinstance(node, generators.SCOPE_NODES):
+            stack.extend(reversed(node.getChildNodes()))
+    return names
+    
+def get_iter(qual):
+    """Returns the iterable of a for clause of a list comprehension or a generator expression."""
+    if isinstance(qual, ast.ListCompFor):
+        return qual.list
+    return qual.iter
+        
+class Visitor:       
+    def __init__(self, scopes=None, module_names=(), minify=False, module=None, main=False, target="es5", inline_caches=False, definitions=None):
         self.indent = ""
-        self.globals = []
+        self.minify = minify
+        self.target = target
+        
+        # whether attribute accesses use inline caches, the index of the 
+        # cache of each Getattr node and the variable holding the caches
+        self.inline_caches = inline_caches
+        self.cache_sites = {}
+        self.cache_var = None
+        
+        # name of the module to compile into a factory or None and 
+        # whether it is run as __main__
+        self.module = module
+        self.main = main
+        
+        # symbol tables built by scope.analyze
+        self.scopes = scopes or {}
+        self.scope = None
         self.stack = []
+        
+        # nesting depth of the current loop in the current function and 
+        # the label to use for breaking out of it
+        self.loop_depth = 0
+        self.break_label = None
+        
+        # true in the body of a generator
+        self.generator = False
+        
+        # in a method, the name of self and the attributes and the methods 
+        # of its class, and the attributes and whether the instances are 
+        # sealed by Class node
+        self.instance = None
+        self.layouts = {}
+        
+        # the expressions of expression statements, whose value isn't used
+        self.discarded = set()
+        
+        # the temporaries that hold the arguments of resolved calls in the 
+        # current function, see resolve_args, and the number of them
+        self.temps = []
+        self.temp_count = 0
+        
+        # module_names are the names bound in other parts of the module, 
+        # when compiling a module in parts
+        self.types = typeinfer.TypeInference(module_names)
+        
+        # the Function and Class nodes of the def and class statements of 
+        # the whole module by name, when compiling a module in parts, see 
+        # get_definition
+        self.definitions = definitions
+        
+        # short names of the variables visible in the current function, 
+        # the number of short names used by the enclosing functions and 
+        # the names that must not be used as short names
+        self.renames = {}
+        self.next_name = 0
+        self.reserved = set(JS_RESERVED)
+        
+        # names of the variables holding pooled strings by value
+        self.strings = {}
+        
+        # visit functions by node class
+        self.handlers = {}
+        
+        # sourcemap.SourceMapWriter to mark the start of every node with a 
+        # line number or None
+        self.tracker = None
+        
+        # profiling.Profiler to profile the visit functions or None
+        self.profiler = None
          
     def visit(self, node, parent=None):
-        """Calls the appropriate visit function based on node type.
+        """Returns the code for node as a string.
         
         Puts the result between paranthesis if parent is specified and precedenace of node is less than that of parent.
         """
-        if node is None:
-            return ""
-            
-        nodetype = node.__class__.__name__
-        
-        f = getattr(self, "visit_" + nodetype, None)
-        if f:
-            code = f(node)
-        else:
-            code = self.visit_children(node)
-            
-        if code is None:
-            code = ""
-        elif isinstance(code, basestring):
-            pass
-        else:
-            code = "".join(code)
-        
-        if parent and self.get_precedence(node) < self.get_precedence(parent):
-            code = "(%s)" % code
-            
-        return code 
+        buf = Buffer()
+        self.emit(node, buf.write, parent)
+        return buf.getvalue()
     
     # syntactic sugar for calling visit
     __call__ = visit
     
+    def emit(self, node, write, parent=None):
+        """Generates code for node and writes it by calling write with each fragment.
+        
+        The visit functions either return the code as a string or return (or 
+        yield) fragments. A fragment can be a string, None, an AST node, whose 
+        code is emitted in its place, or a sequence of fragments. Returning 
+        nodes instead of the code of the nodes avoids copying the code of 
+        every node once for each of its ancestors.
+        
+        The tree is walked using an explicit stack of fragment iterators 
+        instead of recursion, so that very deep trees can be compiled.
+        """
+        if node is None:
+            return
+        
+        handlers = self.handlers
+        tracker = self.tracker
+        nodes = ir.NODES
+        stack = [iter((self.child(node, parent),))]
+        push = stack.append
+        pop = stack.pop
+        
+        while stack:
+            for code in stack[-1]:
+                # checking the exact types first is much faster than isinstance
+                t = type(code)
+                if t is str:
+                    write(code)
+                    continue
+                elif t is InstanceType or t in nodes:
+                    # AST node
+                    if tracker is not None and code.lineno:
+                        tracker.mark(code)
+                    f = handlers.get(code.__class__) or self.get_handler(code.__class__)
+                    code = f(code)
+                    t = type(code)
+                    if t is str:
+                        write(code)
+                        continue
+                    
+                if code is None:
+                    continue
+                elif isinstance(code, basestring):
+                    write(code)
+                elif isinstance(code, ast.Node):
+                    push(iter((code,)))
+                    break
+                else:
+                    push(iter(code))
+                    break
+            else:
+                pop()
+                
+    def get_handler(self, nodeclass):
+        """Returns the visit function for nodes of the given class.
+        
+        Visit functions are looked up only once per node class and 
+        remembered in self.handlers.
+        """
+        f = getattr(self, "visit_" + nodeclass.__name__, None) or self.visit_children
+        if self.profiler:
+            f = self.profiler.wrap(f, nodeclass.__name__)
+        self.handlers[nodeclass] = f
+        return f
+        
+    PRECEDENCE = ir.with_ir_classes({
+        ast.Add: 1,
+        ast.Sub: 1,
+        ast.Mul: 2,
+        ast.Div: 2,
+        ast.Getattr: 3,
+    })
+    
     def get_precedence(self, node):
-        precedence = {
-            ast.Add: 1,
-            ast.Sub: 1,
-            ast.Mul: 2,
-            ast.Div: 2,
-            ast.Getattr: 3,
-        }
-        return precedence.get(node.__class__, 100)
+        return self.PRECEDENCE.get(node.__class__, 100)
+    
+    def typeof(self, node):
+        """Returns the inferred type of the expression node or None if it is not known."""
+        return self.types.typeof(node, self.scope)
+        
+    def is_builtin(self, name):
+        """True if name refers to the builtin with that name in the current scope."""
+        return self.types.is_builtin(name, self.scope)
+        
+    def receiver(self, node):
+        """Returns fragments for node when used as the object of a property access."""
+        if isinstance(node, (ast.Name, ast.CallFunc, ast.Getattr, ast.Subscript, ast.List, ast.Tuple)):
+            return node
+        elif isinstance(node, ast.Const) and isinstance(node.value, basestring):
+            return node
+        else:
+            return "(", node, ")"
     
     def visit_children(self, node, sep=" "):
-        return sep.join(self.visit(n) for n in node.getChildNodes())
+        return self.join(sep, node.getChildNodes())
+        
+    def join(self, sep, nodes, parent=None):
+        """Returns fragments for nodes separated by sep."""
+        for i, n in enumerate(nodes):
+            if i:
+                yield sep
+            yield self.child(n, parent)
+            
+    def child(self, node, parent):
+        """Returns fragments for node, which is a child of parent, 
+        with paranthesis if required."""
+        if parent and self.get_precedence(node) < self.get_precedence(parent):
+            return "(", node, ")"
+        else:
+            return node
         
     # AST node visitors
 
     def visit_Add(self, node):
-        return self(node.left) + " + " + self(node.right)
+        return node.left, " + ", node.right
 
     def visit_And(self, node):
-        return " && ".join(self(n) for n in node.nodes)
+        return self.join(" && ", node.nodes)
 
     def visit_AssAttr(self, node):
         if node.flags != "OP_ASSIGN":
             raise CompilerError("Unrecognized node: " + repr(node))
         
         if isinstance(node.expr, compiler.ast.Name):
-            yield self(node.expr)
+            yield node.expr
         else:
-            yield "(" + self(node.expr) + ")"
+            yield "(", node.expr, ")"
         
         yield "."
         yield node.attrname
@@ -87,7 +522,7 @@ class Visitor:
         pass
 
     def visit_AssName(self, node):
-        return node.name
+        return self.rename(node.name)
 
     def visit_AssTuple(self, node):
         # this will never get called. 
@@ -95,11 +530,10 @@ class Visitor:
         pass
 
     def visit_Assert(self, node):
-        test = self(node.test)
         # when fail is None, use nil in js.
         fail = node.fail and self(node.fail) or "nil"
         
-        return "py.assert(%s, %s);" % (test, fail)
+        return "py.assert(", node.test, ", ", fail, ");"
 
     def visit_Assign(self, node):
         left = node.getChildNodes()[0]
@@ -109,57 +543,481 @@ class Visitor:
             return self._visit_multiple_assignment(left, right)
         else:
             # TODO: handle subscript and multiple assignments
-            return self(left) + " = " + self(right) + ";"
+            return left, " = ", right, ";"
             
     def _visit_multiple_assignment(self, left, right):
-        #if not isinstance(right, (ast.List, ast.Tuple)):
-        #    raise CompilerError("Expected list or tuple, found %s", right.__class__.__name__)
+        """Compiles assignment to a tuple or list of targets.
         
-        #if len(left.getChildNodes()) != len(right.getChildNodes()):
-        #    raise CompilerError("Number of items must be same on both sides for multiple assignment")
+        The values are kept in temporary local variables. When the right
+        side is a tuple or list literal of the same length as the target,
+        each item gets its own temporary and no array is created. Any other
+        value is unpacked with py.unpack, which checks the length.
+        """
+        temps = []
+        assignments = []
         
-        if isinstance(right, (ast.Tuple, ast.List)) :
-            yield "py.tmp = ["
-            yield ", ".join(self(n) for n in right.getChildNodes())
-            yield "]; "
+        if self.is_literal_match(left, right):
+            self._flatten_assignment(left, right, temps, assignments)
         else:
-            yield "py.tmp = %s; " % self(right);
+            assignments.append((left, right))
+        
+        if temps:
+            yield "var "
+            for i, (name, value) in enumerate(temps):
+                yield i and ", " or "", name, " = ", value
+            yield "; "
+            
+        for target, value in assignments:
+            yield self._unpack(target, value, temps)
+            
+    def is_literal_match(self, target, value):
+        return (isinstance(target, (ast.AssTuple, ast.AssList))
+            and isinstance(value, (ast.Tuple, ast.List))
+            and len(target.nodes) == len(value.nodes))
+            
+    def _flatten_assignment(self, target, value, temps, assignments):
+        """Matches the items of the tuple or list value to the items of the target.
         
-        for i, n in enumerate(left.getChildNodes()):
-            yield self(n) + " = py.tmp[%d]; " % i
+        Values that are not constants are evaluated into new temporaries,
+        which are appended to temps. The (target, value) pairs to assign are
+        appended to assignments.
+        """
+        for t, v in zip(target.nodes, value.nodes):
+            if self.is_literal_match(t, v):
+                self._flatten_assignment(t, v, temps, assignments)
+            elif isinstance(v, ast.Const):
+                assignments.append((t, v))
+            else:
+                name = "__t%d" % len(temps)
+                temps.append((name, v))
+                assignments.append((t, ir.Name(name)))
+                
+    def _unpack(self, target, value, temps):
+        if isinstance(target, (ast.AssTuple, ast.AssList)):
+            name = "__t%d" % len(temps)
+            temps.append((name, value))
+            yield "var ", name, " = py.unpack(", value, ", %d); " % len(target.nodes)
+            for i, t in enumerate(target.nodes):
+                yield self._unpack(t, ir.Name("%s[%d]" % (name, i)), temps)
+        else:
+            yield target, " = ", value, "; "
 
     def visit_AugAssign(self, node):
         left = node.node
         right = node.expr
-        return self(left) + " " + node.op + " " + self(right) + ";"
+        return left, " " + node.op + " ", right, ";"
 
     def visit_Backquote(self, node):
         yield "py.repr("
-        yield self(node.expr)
+        yield node.expr
         yield ")"
 
     def visit_Bitand(self, node):
-        return " & ".join(self(n) for n in node.nodes)
+        return self.join(" & ", node.nodes)
 
     def visit_Bitor(self, node):
-        return " | ".join(self(n) for n in node.nodes)
+        return self.join(" | ", node.nodes)
 
     def visit_Bitxor(self, node):
-        return " ^ ".join(self(n) for n in node.nodes)
+        return self.join(" ^ ", node.nodes)
 
     def visit_Break(self, node):
+        if self.break_label:
+            # skip the else clause of the loop
+            return "break %s;" % self.break_label
         return "break;"
 
+    # methods of str and list, which have equivalent javascript methods,
+    # by type and number of arguments
+    NATIVE_METHODS = {
+        (typeinfer.STR, "upper", 0): "toUpperCase",
+        (typeinfer.STR, "lower", 0): "toLowerCase",
+        (typeinfer.STR, "strip", 0): "trim",
+        (typeinfer.STR, "find", 1): "indexOf",
+        (typeinfer.STR, "split", 1): "split",
+        (typeinfer.LIST, "append", 1): "push",
+        (typeinfer.LIST, "reverse", 0): "reverse",
+    }
+    
+    # the methods above that return None in python, but not in javascript
+    NONE_METHODS = ("append", "reverse")
+
     def visit_CallFunc(self, node):
-        f = self(node.node)
-        args = ", ".join(self(n) for n in node.args)
-        if node.star_args or node.dstar_args:
-            return "%s.apply(this, py.make_args([%s], %s, %s))" % (f, args, self(node.star_args) or "nil", self(node.dstar_args) or "nil")
+        if not (node.star_args or node.dstar_args):
+            code = self.visit_native_call(node)
+            if code:
+                return code
+            
+        if self.is_method_call(node):
+            # a method of the class of self, called without binding it
+            return node.node.expr, ".", node.node.attrname, "(", self.join(", ", node.args), ")"
+            
+        resolved = self.resolve_call(node)
+        if resolved is not None:
+            temps, args = resolved
+            if isinstance(self.get_definition(node.node.name), ast.Class):
+                return self.bind(temps, ("new ", node.node, "(", self.join(", ", args), ")"))
+            return self.bind(temps, (node.node, "(", self.join(", ", args), ")"))
+            
+        unbound = self.get_unbound_method(node)
+        if unbound:
+            return unbound
+            
+        args = [a for a in node.args if not isinstance(a, ast.Keyword)]
+        keywords = [(ast.Const(a.name), a.expr) for a in node.args if isinstance(a, ast.Keyword)]
+        if node.star_args or node.dstar_args or keywords:
+            star_args = self(node.star_args) or "nil"
+            dstar_args = keywords and self(ir.Dict(keywords)) or self(node.dstar_args) or "nil"
+            return "py.call(", node.node, ", this, [", self.join(", ", args), "], ", star_args, ", ", dstar_args, ")"
         else:
-            return "%s(%s)" % (f, args)
-
+            return node.node, "(", self.join(", ", args), ")"
+            
+    def resolve_call(self, node):
+        """Returns the temporaries and the javascript arguments of a call 
+        to a function whose def is known, with the keyword arguments in the 
+        positions of their parameters and the missing arguments replaced by 
+        their defaults, or None if the call can't be resolved at compile time.
+        
+        The extra positional arguments are passed as a list for *args and 
+        the extra keyword arguments as a dict for **kwargs. Only constant
+        defaults are filled in, because the others are evaluated when the
+        function is defined. The arguments must be evaluated in the order 
+        of the call, so the temporaries, as (name, value) pairs, are 
+        assigned before the call when the order changes, see bind.
+        """
+        if not isinstance(node.node, ast.Name):
+            return None
+        return self.resolve_args(node, self.get_signature(self.get_definition(node.node.name)))
+        
+    def resolve_args(self, node, signature):
+        """Returns the arguments of the call node for a function with the 
+        given signature, see get_signature, or None. See resolve_call.
+        """
+        matched = self.match_args(node, signature)
+        if matched is None:
+            return None
+        values, positional, keywords, extra_keywords = matched
+        names, defaults, varargs, kwargs = signature
+        
+        args = values
+        if varargs:
+            args = args + [ir.List(positional[len(names):])]
+        if kwargs:
+            args = args + [ir.Dict(extra_keywords)]
+            
+        # the arguments are evaluated in the order of the call, so when 
+        # they are passed in another order, those that are not constants 
+        # are assigned to temporaries first, in the order of the call
+        order = [v for v in positional + [v for k, v in keywords] if not is_constant(v)]
+        new_order = [v for v in values + positional[len(names):] + [v for k, v in extra_keywords] if not is_constant(v)]
+        if order == new_order:
+            return [], args
+            
+        temps = []
+        replaced = {}
+        for value in order:
+            temps.append(("$k%d" % self.temp_count, value))
+            replaced[value] = ir.Name(temps[-1][0])
+            self.temp_count += 1
+        args = [replaced.get(v, v) for v in values]
+        if varargs:
+            args.append(ir.List([replaced.get(v, v) for v in positional[len(names):]]))
+        if kwargs:
+            args.append(ir.Dict([(k, replaced.get(v, v)) for k, v in extra_keywords]))
+        return temps, args
+        
+    def match_args(self, node, signature):
+        """Returns the values of the parameters of a function with the given
+        signature for the call node, the positional and the keyword 
+        arguments of the call and the keyword arguments for **kwargs, or 
+        None if the call can't be resolved at compile time.
+        """
+        if signature is None:
+            return None
+        names, defaults, varargs, kwargs = signature
+            
+        positional = [a for a in node.args if not isinstance(a, ast.Keyword)]
+        keywords = [(a.name, a.expr) for a in node.args if isinstance(a, ast.Keyword)]
+        if node.star_args:
+            if not isinstance(node.star_args, (ast.List, ast.Tuple)):
+                return None
+            positional.extend(node.star_args.nodes)
+        if node.dstar_args:
+            items = isinstance(node.dstar_args, ast.Dict) and node.dstar_args.items or None
+            if items is None or not all(isinstance(k, ast.Const) and isinstance(k.value, str) for k, v in items):
+                return None
+            keywords.extend((k.value, v) for k, v in items)
+            
+        if len(positional) > len(names) and not varargs:
+            return None
+            
+        values = positional[:len(names)] + [None] * (len(names) - len(positional))
+        extra_keywords = []
+        for name, value in keywords:
+            if name in names and values[names.index(name)] is None:
+                values[names.index(name)] = value
+            elif name not in names and kwargs:
+                extra_keywords.append((ir.Const(name), value))
+            else:
+                return None
+                
+        first_default = len(names) - len(defaults)
+        for i, value in enumerate(values):
+            if value is None:
+                if i < first_default or not is_constant(defaults[i - first_default]):
+                    return None
+                values[i] = defaults[i - first_default]
+        return values, positional, keywords, extra_keywords
+        
+    def is_self_attribute(self, node, kind):
+        """True if node is an attribute of self in a method, which is 
+        one of the attributes of the class for kind 1 and one of its 
+        methods for kind 2.
+        """
+        return (self.instance and isinstance(node, ast.Getattr) and isinstance(node.expr, ast.Name) 
+            and node.expr.name == self.instance[0] and node.attrname in self.instance[kind])
+            
+    def is_method_call(self, node):
+        """True if node calls a method of self with positional arguments."""
+        return (self.is_self_attribute(node.node, 2) and not (node.star_args or node.dstar_args)
+            and not [a for a in node.args if isinstance(a, ast.Keyword)])
+            
+    def get_unbound_method(self, node):
+        """Returns the code that calls the method of a class known at 
+        compile time for calls like Base.__init__(self, x), or None.
+        """
+        f = node.node
+        if isinstance(f, ast.Getattr) and isinstance(f.expr, ast.Name):
+            cls = self.get_definition(f.expr.name)
+            method = isinstance(cls, ast.Class) and self.get_method(cls, f.attrname)[0]
+            resolved = method and self.resolve_args(node, self.get_signature(method))
+            if resolved:
+                temps, args = resolved
+                return self.bind(temps, (f.expr, ".prototype.%s.call(" % f.attrname, self.join(", ", args), ")"))
+        
+    def get_signature(self, definition):
+        """Returns the names of the arguments, the defaults and whether 
+        there are *args and **kwargs of a Function node or of the __init__ 
+        of a Class node, without self, or None if they aren't known.
+        """
+        method = False
+        if isinstance(definition, ast.Class):
+            definition, known = self.get_method(definition, "__init__")
+            if definition is None:
+                return known and ([], (), False, False) or None
+            method = True
+        if definition is None:
+            return None
+            
+        names = list(definition.argnames)
+        kwargs = bool(definition.kwargs) and names.pop()
+        varargs = bool(definition.varargs) and names.pop()
+        if method:
+            if not names:
+                return None
+            names.pop(0)
+        if [n for n in names if isinstance(n, tuple)]:
+            return None
+        return names, definition.defaults, varargs, kwargs
+        
+    def get_definition(self, name, scope=None):
+        """Returns the Function or Class node of the def or class statement 
+        that binds name in the given scope, the current one by default, if 
+        it is the only binding of name, or None.
+        """
+        s = scope = scope or self.scope
+        if s is None:
+            return None
+        if name in s.globals:
+            while s.parent is not None:
+                s = s.parent
+        else:
+            # the names of class bodies aren't visible in their methods
+            while s is not None and not (s.is_local(name) and (s is scope or not isinstance(s.node, ast.Class))):
+                s = s.parent
+                
+        if self.definitions is not None and (s is None or s.parent is None):
+            # a name of the module, which other parts of it may bind
+            return self.definitions.get(name)
+        if s is None or name in s.args or not (name in s.functions or name in s.classes):
+            return None
+        if len([n for n, node in s.assignments if n == name]) != 1:
+            return None
+        if s.parent is None and [c for c in self.scopes.values() if name in c.globals and name in c.locals]:
+            # rebound by a function that declares it global
+            return None
+        return s.functions.get(name) or s.classes[name]
+
+    def visit_native_call(self, node):
+        """Compiles calls to builtins and methods of objects of known types 
+        to native javascript. Returns None if that is not possible.
+        """
+        f = node.node
+        nargs = len(node.args)
+        comprehension = nargs and isinstance(node.args[0], (ast.ListComp, ast.GenExpr))
+        if isinstance(f, ast.Name) and f.name == "len" and nargs == 1 and self.is_builtin("len"):
+            if self.typeof(node.args[0]) in (typeinfer.STR, typeinfer.LIST):
+                return self.receiver(node.args[0]), ".length"
+        elif isinstance(f, ast.Name) and f.name in self.REDUCTIONS and comprehension and self.is_builtin(f.name):
+            if nargs == 1 or f.name == "sum" and nargs == 2 and not isinstance(node.args[1], ast.Keyword):
+                return self.fused_loop(node.args[0], f.name, nargs == 2 and node.args[1] or None)
+        elif isinstance(f, ast.Getattr):
+            t = self.typeof(f.expr)
+            if t == typeinfer.STR and f.attrname == "join" and nargs == 1 and comprehension:
+                return self.fused_loop(node.args[0], "join", f.expr)
+            elif (t, f.attrname, nargs) in self.NATIVE_METHODS:
+                method = self.NATIVE_METHODS[t, f.attrname, nargs]
+                code = self.receiver(f.expr), ".", method, "(", self.join(", ", node.args), ")"
+                if f.attrname in self.NONE_METHODS and node not in self.discarded:
+                    return "(", code, ", nil)"
+                return code
+            elif t == typeinfer.STR and f.attrname == "join" and nargs == 1 and self.typeof(node.args[0]) == typeinfer.LIST:
+                return self.receiver(node.args[0]), ".join(", f.expr, ")"
+    
     def visit_Class(self, node):
-        pass
+        """Compiles a class into a constructor function, with the methods 
+        and the class attributes on its prototype.
+        
+        The constructor creates the attributes that __init__ assigns to 
+        self, after those of the base classes in the module, in a fixed 
+        order before calling __init__, so that all the instances have the 
+        same layout (hidden class) in javascript engines. The instances of 
+        a class with __slots__ get the attributes in the slots and are 
+        sealed. Calls to classes known at compile time use new, other calls 
+        create the instance with Object.create.
+        """
+        name = self.rename(node.name)
+        base = self.get_base(node)
+        fields, sealed = self.get_layout(node)
+        init, known = self.get_method(node, "__init__")
+        
+        # the arguments of __init__ without self
+        args = init and ["$%d" % i for i in range(len(init.argnames) - 1)] or []
+        yield "function %s(%s) {\n" % (name, ", ".join(args))
+        yield "var $self = this instanceof %s ? this : Object.create(%s.prototype);\n" % (name, name)
+        for field in fields:
+            yield "$self.%s = nil;\n" % field
+        if sealed:
+            yield "Object.seal($self);\n"
+        if init:
+            yield "$self.__init__(%s);\n" % ", ".join(args)
+        elif not known:
+            yield "if ($self.__init__) { $self.__init__.apply($self, arguments); }\n"
+        yield "return $self;\n}\n"
+        
+        if base:
+            yield name, ".prototype = Object.create(", base, ".prototype);\n"
+            yield name, ".prototype.constructor = ", name, ";\n"
+            
+        methods = self.get_methods(node)
+        for n in node.code.nodes:
+            if isinstance(n, ast.Function) and get_decorators(n):
+                yield name, ".prototype.%s = " % n.name, self.decorated_method(n), ";\n"
+            elif isinstance(n, ast.Function):
+                signature = self.signature(n, method=True)
+                if signature:
+                    yield name, ".prototype.%s = py.signature(" % n.name, self.function(n, method=(fields, methods)), ", ", signature, ");\n"
+                else:
+                    yield name, ".prototype.%s = " % n.name, self.function(n, method=(fields, methods)), ";\n"
+            elif isinstance(n, ast.Assign) and len(n.nodes) == 1 and isinstance(n.nodes[0], ast.AssName):
+                yield name, ".prototype.%s = " % n.nodes[0].name, n.expr, ";\n"
+            elif not isinstance(n, ast.Pass) and not (isinstance(n, ast.Discard) and isinstance(n.expr, ast.Const)):
+                raise CompilerError("Only methods and class attributes are supported in class bodies: " + repr(n))
+        if init and args:
+            # calls resolved at runtime pass the arguments of __init__
+            yield name, ".__signature__ = ", name, ".prototype.__init__.__signature__;\n"
+                
+    def decorated_method(self, node):
+        """Returns fragments for a method with decorators. Static methods 
+        get no self and class methods get the class of this. Other 
+        decorators get a function that takes self as its first argument, 
+        like in python, and py.method passes this to what they return.
+        """
+        decorators = get_decorators(node)
+        builtin = len(decorators) == 1 and isinstance(decorators[0], ast.Name) and self.is_builtin(decorators[0].name) and decorators[0].name
+        if builtin == "staticmethod":
+            return "py.staticmethod(", self.signed_function(node, self.signature(node)), ")"
+        if builtin == "classmethod":
+            return "py.classmethod(", self.signed_function(node, self.signature(node, method=True), receiver="this.constructor"), ")"
+        result = self.signed_function(node, self.signature(node))
+        for d in reversed(decorators):
+            result = d, "(", result, ")"
+        return "py.method(", result, ")"
+        
+    def signed_function(self, node, signature, receiver=None):
+        """Returns fragments for the anonymous function of a def statement
+        with its signature, see signature.
+        """
+        if signature:
+            return "py.signature(", self.function(node, receiver=receiver), ", ", signature, ")"
+        return self.function(node, receiver=receiver)
+        
+    def get_base(self, node):
+        """Returns the base class of a class node or None."""
+        bases = [b for b in node.bases if not (isinstance(b, ast.Name) and b.name == "object")]
+        if len(bases) > 1:
+            raise CompilerError("Multiple inheritance is not supported: " + node.name)
+        return bases and bases[0] or None
+        
+    def get_base_class(self, node):
+        """Returns the Class node of the base class of a class node, if it 
+        is known at compile time, or None.
+        """
+        base = self.get_base(node)
+        if isinstance(base, ast.Name):
+            base = self.get_definition(base.name, self.get_scope(node).parent)
+            if isinstance(base, ast.Class):
+                return base
+        
+    def get_method(self, node, name):
+        """Returns the Function node of the method of a class node or of 
+        its base classes and whether the result is known: when the class 
+        has a base class that isn't known at compile time, the method may 
+        be defined there.
+        """
+        while node is not None:
+            methods = [n for n in node.code.nodes if isinstance(n, ast.Function) and n.name == name]
+            if methods and get_decorators(methods[-1]):
+                # the decorators may return anything
+                return None, False
+            if methods:
+                return methods[-1], True
+            if self.get_base(node) is None:
+                return None, True
+            node = self.get_base_class(node)
+        return None, False
+        
+    def get_methods(self, node):
+        """Returns the names of the methods of a class node and of the base
+        classes that are known at compile time.
+        """
+        methods = set()
+        while node is not None:
+            methods.update(n.name for n in node.code.nodes if isinstance(n, ast.Function) and not get_decorators(n))
+            node = self.get_base_class(node)
+        return methods
+        
+    def get_layout(self, node):
+        """Returns the attributes that the constructor of a class node 
+        creates, in order, and whether its instances are sealed.
+        """
+        if node in self.layouts:
+            return self.layouts[node]
+            
+        base = self.get_base_class(node)
+        fields, sealed = base and self.get_layout(base) or ([], False)
+        slots = get_slots(node)
+        if slots is not None:
+            # a subclass of a class without slots has all its attributes
+            sealed = base is not None and sealed or self.get_base(node) is None
+            names = slots
+        else:
+            sealed = False
+            init = [n for n in node.code.nodes if isinstance(n, ast.Function) and n.name == "__init__"]
+            names = init and get_self_attributes(init[-1]) or []
+        fields = fields + [n for n in names if n not in fields]
+        self.layouts[node] = fields, sealed
+        return fields, sealed
 
     def visit_Compare(self, node):
         # special treatment if the operator is in or not in
@@ -168,24 +1026,32 @@ class Visitor:
                 raise CompilerError('Only 2 operands are supported for "in" and "not in" comparisions')
                 
             op, n = node.ops[0]
-            if op == "in":
-                yield "py.in(%s, %s)" % (self(node.expr), self(n))
+            # indexOf compares lists and tuples by identity, not by value
+            element = self.typeof(node.expr)
+            if self.typeof(n) == typeinfer.LIST and element in typeinfer.NUMERIC_TYPES + (typeinfer.STR,) \
+                    or self.typeof(n) == element == typeinfer.STR:
+                yield "(", self.receiver(n), ".indexOf(", node.expr, ")"
+                yield op == "in" and " !== -1)" or " === -1)"
+            elif op == "in":
+                yield "py.in(", node.expr, ", ", n, ")"
             elif op == "not in":
-                yield "!py.in(%s, %s)" % (self(node.expr), self(n))
+                yield "!py.in(", node.expr, ", ", n, ")"
             elif op == "is":
-                yield "%s === %s" % (self(node.expr), self(n))
+                yield node.expr, " === ", n
             else:
                 raise CompilerError("Unknown comparision operator: %s" % repr(op))
         else:
-            yield self(node.expr)
+            yield node.expr
             yield " "
             for op, n in node.ops:
                 yield op + " "
-                yield self(n) + " "
+                yield n, " "
 
     def visit_Const(self, node):
         if isinstance(node.value, basestring):
-            return json.dumps(node.value)
+            return self.strings.get(node.value) or json.dumps(node.value)
+        elif node.value is None:
+            return "nil"
         else:
             return repr(node.value)
 
@@ -196,13 +1062,20 @@ class Visitor:
         pass
 
     def visit_Dict(self, node):
-        return "py.dict([%s])" % ", ".join("[%s, %s]" % (self(name), self(value)) for name, value in node.items)
+        items = (("[", name, ", ", value, "]") for name, value in node.items)
+        return "py.dict([", self.join(", ", items), "])"
 
     def visit_Discard(self, node):
+        self.discarded.add(node.expr)
         return self.visit_children(node)
 
     def visit_Div(self, node):
-        return self.visit(node.left, parent=node) + " / " + self.visit(node.right, parent=node)
+        code = self.child(node.left, node), " / ", self.child(node.right, node)
+        if self.typeof(node.left) == self.typeof(node.right) == typeinfer.INT:
+            # integer division in python 2
+            return "Math.floor(", code, ")"
+        else:
+            return code
         
     def visit_Ellipsis(self, node):
         pass
@@ -211,81 +1084,302 @@ class Visitor:
         pass
 
     def visit_FloorDiv(self, node):
-        return "py.floordiv(%s, %s)" % (self(node.left), self(node.right))
+        if self.typeof(node.left) in typeinfer.NUMERIC_TYPES and self.typeof(node.right) in typeinfer.NUMERIC_TYPES:
+            div = ir.Div((node.left, node.right))
+            return "Math.floor(", self.child(node.left, div), " / ", self.child(node.right, div), ")"
+        return "py.floordiv(", node.left, ", ", node.right, ")"
 
     def visit_For(self, node):
+        """Compiles a for loop.
+        
+        Loops over range and xrange become counted loops and loops over 
+        lists and strings use an index with a cached length. Only the 
+        other loops use the iterator protocol of the runtime: py.iter 
+        returns an iterator whose next method returns the next item or 
+        py.stop when there are no more items.
+        
+        Temporary variables are numbered by the nesting depth of the loop.
+        When the loop has an else clause, the loop is put in a labelled 
+        block and break statements break out of that block.
+        """
         name, expr, code, else_part = node.asList()
-        assign = ast.Assign([name], ast.Name("py.loopvalue"))
-        yield "for (var __i in py.iter(%s)) { %s %s } " % (self(expr), self(assign), self(code))
+        return self.for_loop(name, self.get_iterable(expr), code, else_part)
+        
+    def get_iterable(self, expr):
+        """Returns the kind of loop to use for iterating over expr and the
+        parts of expr that the loop needs.
+        
+        The kind is "range" with the start, stop and step of a call to 
+        range and the value of step if it is a number, "sequence" with the
+        list or string expr or "iter" with expr for any other iterable.
+        """
+        if self.is_range(expr):
+            return "range", self.get_range_args(expr)
+        elif isinstance(expr, ast.List) or self.typeof(expr) in (typeinfer.LIST, typeinfer.STR):
+            return "sequence", (expr,)
+        else:
+            return "iter", (expr,)
+            
+    def for_loop(self, name, iterable, code, else_part=None):
+        """Returns fragments for a loop that assigns the items of the 
+        iterable, as returned by get_iterable, to name and runs code for 
+        each item.
+        """
+        kind, parts = iterable
+        depth = self.loop_depth + 1
+        i, n, s = "__i%d" % depth, "__n%d" % depth, "__s%d" % depth
+        label = else_part and "__loop%d" % depth
+        
+        if label:
+            yield label + ": { "
+        
+        if kind == "range":
+            start, stop, step, value = parts
+            yield "for (var ", i, " = ", start, ", ", n, " = ", stop
+            
+            if value is None:
+                yield ", ", s, " = ", step, "; ", s, " > 0 ? ", i, " < ", n, " : ", i, " > ", n, "; ", i, " += ", s, ") { "
+            elif value == 1:
+                yield "; ", i, " < ", n, "; ", i, "++) { "
+            elif value == -1:
+                yield "; ", i, " > ", n, "; ", i, "--) { "
+            elif value > 0:
+                yield "; ", i, " < ", n, "; ", i, " += ", step, ") { "
+            else:
+                yield "; ", i, " > ", n, "; ", i, " += ", step, ") { "
+            assign = ir.Assign([name], ir.Name(i))
+        elif kind == "sequence":
+            yield "for (var ", i, " = 0, ", s, " = ", parts[0], ", ", n, " = ", s, ".length; ", i, " < ", n, "; ", i, "++) { "
+            assign = ir.Assign([name], ir.Name("%s[%s]" % (s, i)))
+        else:
+            v = "__v%d" % depth
+            yield "for (var ", i, " = py.iter(", parts[0], "), ", v, "; (", v, " = ", i, ".next()) !== py.stop; ) { "
+            assign = ir.Assign([name], ir.Name(v))
+            
+        yield self.loop_body(depth, label, assign, " ", code), " } "
+        
+        if label:
+            yield else_part, "} "
+            
+    def is_range(self, node):
+        """True if node is a call to builtin range or xrange with 1 to 3 positional arguments."""
+        return (isinstance(node, ast.CallFunc)
+            and isinstance(node.node, ast.Name)
+            and node.node.name in ("range", "xrange")
+            and 1 <= len(node.args) <= 3
+            and not node.star_args and not node.dstar_args
+            and not [a for a in node.args if isinstance(a, ast.Keyword)]
+            and self.is_builtin(node.node.name))
+            
+    def get_range_args(self, node):
+        """Returns start, stop and step of a call to range and the value of 
+        step if it is a number other than 0 or None. A step that is not a 
+        nonzero number is checked at runtime with py.range_step.
+        """
+        args = node.args
+        if len(args) == 1:
+            start, stop, step = ir.Const(0), args[0], ir.Const(1)
+        else:
+            start, stop, step = (args + [ir.Const(1)])[:3]
+        value = get_number(step)
+        if not value:
+            return start, stop, ir.CallFunc(ir.Name("py.range_step"), [step]), None
+        return start, stop, step, value
+        
+    def loop_body(self, depth, label, *fragments):
+        """Returns fragments for the body of a loop at depth.
+        
+        The label is the label of the block to break out of or None if
+        plain break statements can be used.
+        """
+        saved = self.loop_depth, self.break_label
+        self.loop_depth, self.break_label = depth, label
+        yield fragments
+        self.loop_depth, self.break_label = saved
 
     def visit_From(self, node):
-        pass
+        """Compiles from-import using py.importfrom of the runtime.
+        
+        Relative imports and import * are supported only in bundles, 
+        which replace them with absolute imports of the names.
+        """
+        if node.modname == "__future__":
+            return
+        if node.level:
+            raise CompilerError("Relative imports are supported only in bundles")
+            
+        for name, asname in node.names:
+            if name == "*":
+                raise CompilerError("from %s import * is supported only in bundles" % node.modname)
+            yield self.rename(asname or name), " = py.importfrom(%s, %s); " % (json.dumps(node.modname), json.dumps(name))
         
-    def push(self):
-        self.stack.append(self.globals)
-        self.globals = []
+    def push(self, scope):
+        self.stack.append((self.scope, self.loop_depth, self.break_label, self.generator, self.renames, self.next_name, self.instance, self.temps))
+        self.scope = scope
+        self.temps = []
+        self.loop_depth = 0
+        self.break_label = None
+        self.generator = scope.generator
+        self.instance = None
+        if self.minify and scope.is_function():
+            self.renames = self.mangle(scope)
         
     def pop(self):
-        self.globals = self.stack.pop()
+        self.scope, self.loop_depth, self.break_label, self.generator, self.renames, self.next_name, self.instance, self.temps = self.stack.pop()
+        
+    def mangle(self, scope):
+        """Returns the short names of the variables visible in the function scope.
+        
+        Arguments and local variables get new names. Nested functions 
+        continue numbering from their parent, so that their names never 
+        hide the variables of the enclosing functions.
+        """
+        renames = dict(self.renames)
+        for name in scope.globals:
+            renames.pop(name, None)
+        for name in scope.args + scope.locals:
+            if scope.is_local(name):
+                renames[name] = self.new_name()
+        return renames
+        
+    def new_name(self):
+        while True:
+            name = short_name(self.next_name)
+            self.next_name += 1
+            if name not in self.reserved:
+                return name
+        
+    def rename(self, name):
+        return self.renames.get(name, name)
+        
+    def get_scope(self, node):
+        """Returns the scope of a module, function, lambda or class node."""
+        if node not in self.scopes:
+            # visiting a tree without its module
+            self.scopes.update(scope.analyze(node))
+        return self.scopes[node]
         
     def visit_Function(self, node):
-        vars = set(self.extract_vars(node.code))
-            
-        self.push()
-        self.globals = self.extract_gloabls(node.code)
-        vars = [name for name in vars if name not in self.globals and name not in node.argnames]
-        code = self.visit(node.code)
+        name = self.rename(node.name)
+        signature = self.signature(node)
+        if signature and self.needs_signature(node):
+            return self.function(node, name), "\npy.signature(", name, ", ", signature, ");"
+        return self.function(node, name)
+        
+    def needs_signature(self, node):
+        """False for a local function whose name is only called with 
+        positional arguments or in calls resolved at compile time, which 
+        don't need the signature of py.call.
+        """
+        s = self.scope
+        if not s.is_function() or self.get_definition(node.name) is not node:
+            return True
+        if [d for d in node.defaults if not is_constant(d)]:
+            # evaluated by py.signature
+            return True
+        signature = self.get_signature(node)
+        names = calls = 0
+        stack = [s.node.code]
+        while stack:
+            n = stack.pop()
+            if isinstance(n, generators.SCOPE_NODES) and n is not node and self.get_scope(n).is_local(node.name):
+                return True
+            if isinstance(n, ast.Name) and n.name == node.name:
+                names += 1
+            elif isinstance(n, ast.CallFunc) and isinstance(n.node, ast.Name) and n.node.name == node.name:
+                keywords = [a for a in n.args if isinstance(a, ast.Keyword)]
+                if not (keywords or n.star_args or n.dstar_args) or self.match_args(n, signature) is not None:
+                    calls += 1
+            stack.extend(n.getChildNodes())
+        return names != calls
+        
+    def signature(self, node, method=False):
+        """Returns fragments for the parameters of the function of a def 
+        statement, without self for a method, as the arguments of 
+        py.signature after the function, or None if it has none. The 
+        defaults are evaluated there, when the function is defined.
+        """
+        signature = self.get_signature(node)
+        if signature is None:
+            return None
+        names, defaults, varargs, kwargs = signature
+        if method:
+            names = names[1:]
+        if not (names or varargs or kwargs):
+            return None
+        elif not (defaults or varargs or kwargs):
+            return json.dumps(names)
+        return (json.dumps(names), ", [", self.join(", ", defaults), "], ", 
+            varargs and "true" or "false", ", ", kwargs and "true" or "false")
+        
+    def function(self, node, name=None, method=None, receiver=None):
+        """Returns fragments for the javascript function of a def statement,
+        with the given name or anonymous.
+        
+        The function of a method gets self from this. The method is the 
+        attributes and the methods of its class, which are accessed on self 
+        directly in the method. With a receiver instead, the first argument 
+        is the value of the receiver, like this.constructor.
+        """
+        s = self.get_scope(node)
+        
+        self.push(s)
+        args = [self.rename(a) for a in node.argnames]
+        vars = [self.rename(v) for v in s.get_vars()]
+        if (method or receiver) and args and isinstance(node.argnames[0], str):
+            vars.insert(0, "%s = %s" % (args.pop(0), receiver or "this"))
+            if method and not [n for n, _ in s.assignments if n == node.argnames[0]]:
+                self.instance = (node.argnames[0],) + method
+        
+        if name:
+            yield "function %s(%s) {\n" % (name, ", ".join(args))
+        else:
+            yield "function(%s) {\n" % ", ".join(args)
+        temps = self.temps
+        if s.generator:
+            yield self.generator_body(vars, node.code)
+        else:
+            if vars:
+                yield "var %s;\n" % ", ".join(vars)
+            yield node.code
+        yield self.declare_temps(temps)
         self.pop()
+        yield "\n}"
         
-        if vars:
-            var_line = "var %s;\n" % ", ".join(vars)
+    def generator_body(self, vars, code):
+        """Returns fragments for the body of a generator function, which 
+        returns the generator object.
+        """
+        if self.target == "es6":
+            if vars:
+                yield "var %s;\n" % ", ".join(vars)
+            yield "return py.generator(function* () {\n", code, "\n}());"
         else:
-            var_line = ""
-        
-        return "function %s(%s) {\n%s%s\n}" % (node.name, ", ".join(node.argnames), var_line, code)
-        
-    def extract_vars(self, node):
-        assignments = self.traverse_tree(node, skip=(ast.Function, ast.Lambda))
-        assignments = self.filter_nodes(assignments, (ast.Assign, ast.AugAssign))
-        for n in assignments:
-            if isinstance(n, ast.Assign):
-                left = n.getChildNodes()[0]
-                yield left.name
-            if isinstance(n, ast.AugAssign):
-                left = n.node
-                # TODO: what id left is not a AugName?
-                yield left.name
-            elif isinstance(n, (ast.List, ast.AssTuple)):
-                # TODO:
-                pass
-            else:
-                # TODO: handle subscript and multiple assignments
-                pass
-                
-    def extract_gloabls(self, node):
-        """Extracts variables declared as global."""
-        global_nodes = self.traverse_tree(node, skip=(ast.Function, ast.Lambda))
-        global_nodes = self.filter_nodes(global_nodes, ast.Global)
-        
-        global_names = []
-        for n in global_nodes:
-            global_names += n.names
-        return global_names
-        
-    def traverse_tree(self, node, skip=None):
-        if skip and isinstance(node, skip):
-            return
+            machine = generators.StateMachine(self)
+            cases = machine.compile(code)
+            yield "var %s;\n" % ", ".join(vars + machine.temps + ["__state = 0"])
+            yield "return py.generator(function(__sent) {\nwhile (true) { switch (__state) {\n", cases, "} }\n});"
         
-        yield node
-        for n in node.getChildNodes():
-            for n2 in self.traverse_tree(n, skip=skip):
-                yield n2
-                    
-    def filter_nodes(self, nodes, type):
-        return [node for node in nodes if isinstance(node, type)]
-
     def visit_GenExpr(self, node):
-        pass
+        """Compiles a generator expression into a generator function, 
+        which is called with the iterator of the outermost iterable.
+        """
+        s = self.get_scope(node)
+        inner = node.code
+        
+        body = ir.Discard(ir.Yield(inner.expr))
+        for q in reversed(inner.quals):
+            for cond in reversed(q.ifs):
+                body = ir.If([(cond.test, ir.Stmt([body]))], None)
+            iterable = q.is_outmost and ir.Name("__it") or q.iter
+            body = ir.For(q.assign, iterable, ir.Stmt([body]), None)
+            
+        self.push(s)
+        vars = [self.rename(v) for v in s.get_vars()]
+        yield "(function(__it) {\n", self.generator_body(vars, ir.Stmt([body])), self.declare_temps(self.temps), "\n})"
+        self.pop()
+        # the outermost iterable is evaluated when the expression is
+        yield "(py.iter(", inner.quals[0].iter, "))"
 
     def visit_GenExprFor(self, node):
         pass
@@ -297,7 +1391,12 @@ class Visitor:
         pass
 
     def visit_Getattr(self, node):
-        return "py.getattr(%s, %s)" % (self(node.expr), json.dumps(node.attrname))
+        if self.is_self_attribute(node, 1):
+            # created by the constructor, so it is an attribute of self
+            return node.expr, ".", node.attrname
+        if node in self.cache_sites:
+            return "%s[%d].get(" % (self.cache_var, self.cache_sites[node]), node.expr, ")"
+        return "py.getattr(", node.expr, ", %s)" % json.dumps(node.attrname)
 
     def visit_Global(self, node):
         pass
@@ -311,16 +1410,25 @@ class Visitor:
                 label = "else if"
 
             yield label
-            yield " (%s) { %s } " % (self(test), self(code))
+            yield " (", test, ") { ", code, " } "
 
         if node.else_:
-            yield "else { %s } " % self(node.else_)
+            yield "else { ", node.else_, " } "
 
     def visit_IfExp(self, node):
         pass
 
     def visit_Import(self, node):
-        pass
+        """Compiles import using py.import of the runtime, which returns the module."""
+        for name, asname in node.names:
+            if asname:
+                yield self.rename(asname), " = py.import(%s); " % json.dumps(name)
+            elif "." in name:
+                # import a.b imports a.b and binds a
+                yield "py.import(%s); " % json.dumps(name)
+                yield self.rename(name.split(".")[0]), " = py.import(%s); " % json.dumps(name.split(".")[0])
+            else:
+                yield self.rename(name), " = py.import(%s); " % json.dumps(name)
 
     def visit_Invert(self, node):
         pass
@@ -331,14 +1439,145 @@ class Visitor:
     def visit_Lambda(self, node):
         pass
 
+    def visit_Let(self, node):
+        # the expression of an inlined call, which is always parenthesized
+        # as the operators around it don't add parentheses
+        assignments = [(name, " = ", value, ", ") for name, value in zip(node.names, node.values)]
+        return "(", assignments, node.expr, ")"
+
     def visit_LeftShift(self, node):
         pass
 
     def visit_List(self, node):
-        pass
+        return "[", self.join(", ", node.nodes), "]"
 
     def visit_ListComp(self, node):
-        pass
+        return self.fused_loop(node)
+        
+    # builtins that reduce the items of a comprehension to a single value
+    REDUCTIONS = ("sum", "any", "all", "max", "min")
+    
+    def fused_loop(self, node, reduction=None, arg=None):
+        """Compiles the list comprehension or generator expression node 
+        into nested loops in a function that is called in place.
+        
+        Without a reduction, the loops store the items in the result array,
+        which is preallocated when there is a single loop over a range or a 
+        sequence. The reduction is one of REDUCTIONS or "join", which 
+        combine the items as they are produced, without any array. The arg 
+        is the start of sum or the separator of join.
+        """
+        if isinstance(node, ast.GenExpr):
+            expr, quals = node.code.expr, node.code.quals
+        else:
+            expr, quals = node.expr, node.quals
+        iterable = self.get_iterable(get_iter(quals[0]))
+        
+        vars = []
+        genexpr = isinstance(node, ast.GenExpr)
+        if genexpr:
+            # the outermost iterable and arg are evaluated in the enclosing 
+            # scope, the variables of the generator expression are local
+            kind, parts = iterable
+            iterable = kind, [isinstance(p, ast.Node) and self.visit(p) or p for p in parts]
+            arg = arg and self.visit(arg)
+            s = self.get_scope(node)
+            self.push(s)
+            self.avoid_shadowing(s, [get_iter(quals[0]), arg])
+            vars = [self.rename(v) for v in s.get_vars()]
+            
+        yield "(function() { "
+        if reduction is None and len(quals) == 1 and not quals[0].ifs and self.can_preallocate(iterable):
+            yield self.preallocated_loop(vars, quals[0].assign, iterable, expr)
+        else:
+            init, body, result = self.get_reduction(reduction, expr, arg)
+            if vars or init:
+                yield "var ", self.join(", ", vars + init), "; "
+            yield self.comprehension_loops(quals, iterable, body), result
+        if genexpr:
+            yield self.declare_temps(self.temps)
+        yield "})()"
+        
+        if genexpr:
+            self.pop()
+            
+    def avoid_shadowing(self, scope, nodes):
+        """Renames the variables of scope that have the same names as the 
+        variables used by nodes, which are evaluated inside the function 
+        of scope but refer to the enclosing scope.
+        """
+        if self.minify:
+            # the variables already have unique short names
+            return
+        used = set()
+        for node in nodes:
+            if isinstance(node, ast.Node):
+                stack = [node]
+                while stack:
+                    n = stack.pop()
+                    if isinstance(n, ast.Name):
+                        used.add(n.name)
+                    stack.extend(n.getChildNodes())
+        names = [name for name in scope.locals if name in used]
+        if names:
+            self.renames = dict(self.renames)
+            for name in names:
+                # python names can't contain $
+                self.renames[name] = name + "$"
+        
+    def can_preallocate(self, iterable):
+        kind, parts = iterable
+        return kind == "sequence" or kind == "range" and parts[3] is not None
+        
+    def preallocated_loop(self, vars, name, iterable, expr):
+        kind, parts = iterable
+        if kind == "sequence":
+            yield "var ", ", ".join(vars + ["__s = "]), parts[0], ", __n = __s.length, __r = new Array(__n); "
+            yield "for (var __i = 0; __i < __n; __i++) { ", ir.Assign([name], ir.Name("__s[__i]")), " __r[__i] = ", expr, "; } "
+        else:
+            start, stop, step, value = parts
+            if value == 1:
+                size = "__n - __i"
+            else:
+                size = "Math.ceil((__n - __i) / ", step, ")"
+            yield "var ", ", ".join(vars + ["__i = "]), start, ", __n = ", stop, ", __r = new Array(Math.max(", size, ", 0)), __k = 0; "
+            increment = value == 1 and "__i++" or ("__i += ", step)
+            yield "for (; ", value > 0 and "__i < __n" or "__i > __n", "; ", increment, ") { "
+            yield ir.Assign([name], ir.Name("__i")), " __r[__k++] = ", expr, "; } "
+        yield "return __r; "
+        
+    def get_reduction(self, reduction, expr, arg):
+        """Returns the declarations of the variables of the reduction, the 
+        code that adds an item to the result and the code that returns the 
+        result.
+        """
+        if reduction is None:
+            return ["__r = []"], ("__r.push(", expr, "); "), "return __r; "
+        elif reduction == "sum":
+            return [("__r = ", arg or "0")], ("__r += ", expr, "; "), "return __r; "
+        elif reduction == "any":
+            return [], ("if (", expr, ") { return true; } "), "return false; "
+        elif reduction == "all":
+            return [], ("if (!(", expr, ")) { return false; } "), "return true; "
+        elif reduction == "join":
+            init = ['__r = ""', ("__j = ", arg), "__e = true"]
+            return init, ("if (!__e) { __r += __j; } __r += ", expr, "; __e = false; "), "return __r; "
+        else:
+            op = reduction == "max" and " > " or " < "
+            body = "__v = ", expr, "; if (__e || __v", op, "__r) { __r = __v; __e = false; } "
+            error = 'if (__e) { throw new Error("ValueError: %s() arg is an empty sequence"); } ' % reduction
+            return ["__r", "__e = true", "__v"], body, (error, "return __r; ")
+            
+    def comprehension_loops(self, quals, iterable, body):
+        """Returns fragments for nested loops over the quals of a 
+        comprehension with body in the innermost loop.
+        """
+        q = quals[0]
+        if len(quals) > 1:
+            body = self.comprehension_loops(quals[1:], self.get_iterable(get_iter(quals[1])), body)
+        for cond in reversed(q.ifs):
+            body = "if (", cond.test, ") { ", body, "} "
+        return self.for_loop(q.assign, iterable, body)
 
     def visit_ListCompFor(self, node):
         pass
@@ -350,10 +1589,146 @@ class Visitor:
         pass
 
     def visit_Module(self, node):
-        return self.visit_children(node)
+        self.scope = self.get_scope(node)
+        self.types.module_names.update(self.scope.locals)
+        
+        if self.module:
+            yield self.module_header()
+        if self.minify:
+            self.reserve_names()
+            yield self.pool_strings(node)
+        if self.inline_caches:
+            yield self.make_caches(node)
+            
+        yield self.visit_children(node)
+        yield self.declare_temps(self.temps)
+        
+        if self.module:
+            yield self.module_footer()
+        
+    def declare_temps(self, temps):
+        """Returns the declaration of the temporaries of the current 
+        function, which is generated after its body, when they are known. 
+        Javascript hoists var declarations, so they can come after their use.
+        """
+        if temps:
+            yield "var %s;\n" % ", ".join(temps)
+            
+    def bind(self, temps, call):
+        """Returns fragments for the call after assigning the arguments to 
+        their temporaries, see resolve_args.
+        """
+        if not temps:
+            return call
+        self.temps.extend(t for t, value in temps)
+        return "(", [(t, " = ", value, ", ") for t, value in temps], call, ")"
+        
+    def get_declared_globals(self):
+        """Returns the names declared global in functions that are not 
+        bound at module level.
+        """
+        names = []
+        for s in self.scopes.values():
+            names.extend(n for n in s.globals if n not in self.scope.locals and n not in names)
+        return names
+        
+    def module_header(self):
+        yield "py.define(%s, function() {\n" % json.dumps(self.module)
+        if any("__name__" in s.uses for s in self.scopes.values()):
+            yield "var __name__ = %s;\n" % json.dumps(self.main and "__main__" or self.module)
+        names = self.scope.get_vars() + self.get_declared_globals()
+        if names:
+            yield "var %s;\n" % ", ".join(names)
+            
+    def module_footer(self):
+        names = self.scope.locals + self.get_declared_globals()
+        # the names that functions rebind after the module has run are 
+        # exported with a getter and a setter, so that the module sees them
+        rebound = set(n for s in self.scopes.values() if s is not self.scope for n in s.globals if n in s.locals)
+        exports = []
+        for name in names:
+            key = json.dumps(name)
+            if name in rebound:
+                exports.append("get %s() { return %s; }, set %s($v) { %s = $v; }" % (key, name, key, name))
+            else:
+                exports.append("%s: %s" % (key, name))
+        return "return {%s};\n});\n" % ", ".join(exports)
+        
+    def reserve_names(self):
+        """Adds the names that are not renamed to self.reserved.
+        
+        Those are the names bound outside functions and the names used in 
+        functions that are not variables of the function or its parents.
+        """
+        for s in self.scopes.values():
+            if s.is_function():
+                self.reserved.update(n for n in s.uses if not s.is_local(n) and n not in s.free)
+                self.reserved.update(s.globals)
+            else:
+                self.reserved.update(s.uses, s.locals)
+                
+    def pool_strings(self, tree):
+        """Stores the strings that occur in tree often enough to make the 
+        code shorter in variables and returns the declaration of the 
+        variables. Python names can't contain $, so the variables $0, $1, ...
+        can't clash with them.
+        """
+        counts = {}
+        order = []
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, ast.Const) and isinstance(node.value, basestring):
+                if node.value not in counts:
+                    counts[node.value] = 0
+                    order.append(node.value)
+                counts[node.value] += 1
+            else:
+                stack.extend(reversed(node.getChildNodes()))
+        
+        decls = []
+        for value in order:
+            try:
+                literal = json.dumps(value)
+            except UnicodeDecodeError:
+                # not valid utf-8, can't be in the output anyway
+                continue
+            name = "$%d" % len(decls)
+            n = counts[value]
+            # each use saves the difference in length and the declaration costs name=literal,
+            if n * (len(literal) - len(name)) > len(name) + len(literal) + 2:
+                self.strings[value] = name
+                decls.append("%s = %s" % (name, literal))
+                
+        if decls:
+            return "var %s;\n" % ", ".join(decls)
 
+    def make_caches(self, tree):
+        """Numbers the attribute accesses in tree and returns the 
+        declaration of the variable holding their inline caches.
+        
+        The name of the variable depends on the sites, so that scripts 
+        compiled separately don't replace each other's caches.
+        """
+        names = []
+        sites = []
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, ast.Getattr):
+                self.cache_sites[node] = len(names)
+                names.append(node.attrname)
+                # the line added before the code isn't in the source
+                sites.append("%s:%s" % (node.lineno and node.lineno - 1, node.attrname))
+            stack.extend(reversed(node.getChildNodes()))
+            
+        if names:
+            names, sites = json.dumps(names), json.dumps(sites)
+            self.cache_var = "$ic%s" % hashlib.md5(sites).hexdigest()[:8]
+            return "var %s = py.inline_caches(%s, %s);\n" % (self.cache_var, names, sites)
+            
     def visit_Mul(self, node):
-        return self.visit(node.left, parent=node) + " * " + self.visit(node.right, parent=node)
+        return self.child(node.left, node), " * ", self.child(node.right, node)
 
     def visit_Name(self, node):
         names = {
@@ -361,13 +1736,13 @@ class Visitor:
             "False": "false",
             "None": "nil"
         }
-        return names.get(node.name, node.name)
+        return names.get(node.name) or self.rename(node.name)
 
     def visit_Not(self, node):
-        return "!" + self(node.expr)
+        return "!", node.expr
 
     def visit_Or(self, node):
-        return " || ".join(self(n) for n in node.nodes)
+        return self.join(" || ", node.nodes)
 
     def visit_Pass(self, node):
         pass
@@ -376,16 +1751,19 @@ class Visitor:
         pass
 
     def visit_Print(self, node):
-        return 'py.print(%s);' % ', '.join(self(n) for n in node.nodes)
+        return 'py.print(', self.join(', ', node.nodes), ');'
 
     def visit_Printnl(self, node):
-        return r'py.print(%s, "\n");' % ', '.join(self(n) for n in node.nodes)
+        return 'py.print(', self.join(', ', node.nodes), r', "\n");'
 
     def visit_Raise(self, node):
         pass
 
     def visit_Return(self, node):
-        return "return %s;" % self.visit(node.value)
+        if self.generator:
+            # return in a generator has no value
+            return self.target == "es6" and "return;" or "return py.stop;"
+        return "return ", node.value, ";"
 
     def visit_RightShift(self, node):
         pass
@@ -398,10 +1776,11 @@ class Visitor:
 
     def visit_Stmt(self, node):
         for n in node.getChildNodes():
-            yield self(n) + "\n"
+            yield n
+            yield "\n"
 
     def visit_Sub(self, node):
-        return self(node.left) + " - " + self(node.right)
+        return node.left, " - ", node.right
 
     def visit_Subscript(self, node):
         pass
@@ -413,22 +1792,31 @@ class Visitor:
         pass
 
     def visit_Tuple(self, node):
-        pass
+        # tuples are represented as javascript arrays
+        return "[", self.join(", ", node.nodes), "]"
 
     def visit_UnaryAdd(self, node):
-        return "+" + self(node.expr)
+        return "+", node.expr
 
     def visit_UnarySub(self, node):
-        return "-" + self(node.expr)
+        return "-", node.expr
 
     def visit_While(self, node):
         condition, code, else_part = node.asList()
-        yield "while (%s) { %s } " % (self(condition), self(code))
-        #if else_part:
-        #    yield "else { %s } " % self(else_part)
+        depth = self.loop_depth + 1
+        label = else_part and "__loop%d" % depth
+        
+        if label:
+            yield label + ": { "
+        yield "while (", condition, ") { ", self.loop_body(depth, label, code), " } "
+        if label:
+            yield else_part, "} "
 
     def visit_With(self, node):
         pass
 
     def visit_Yield(self, node):
-        pass
+        if self.target == "es6" and self.generator:
+            return "(yield ", node.value, ")"
+        # the state machine can only stop at statements
+        raise CompilerError("yield is supported only as a statement or as the value of an assignment")
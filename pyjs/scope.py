@@ -0,0 +1,246 @@
+"""Scope analysis.
+
+Builds a symbol table for every function, lambda, class and generator
+expression of a module in a single pass over the tree.
+
+    >>> scopes = analyze(compiler.parse(code))
+    >>> scope = scopes[function_node]
+    >>> scope.args, scope.locals, scope.globals, scope.free
+"""
+from compiler import ast
+
+class Scope:
+    """Symbol table of a module, function, lambda, class or generator expression.
+
+    All names are kept in the order in which they first appear in the source.
+    """
+    def __init__(self, node, parent=None):
+        self.node = node
+        self.parent = parent
+        self.children = []
+
+        self.args = []
+        self.locals = []
+        self.globals = []
+        self.free = []
+
+        # all names referenced in this scope
+        self.uses = []
+
+        # names bound by def and class statements
+        self.defs = []
+
+        # Function and Class nodes of the def and class statements by name
+        self.functions = {}
+        self.classes = {}
+
+        # true for functions that contain yield and for generator expressions
+        self.generator = isinstance(node, ast.GenExpr)
+
+        # (name, node) for every binding of a name in this scope, where node
+        # is the Assign, AugAssign or For node that binds the name or None
+        # for any other kind of binding. Used for type inference.
+        self.assignments = []
+
+        self._bound = set()
+        self._used = set()
+
+        if parent:
+            parent.children.append(self)
+
+    def is_function(self):
+        return isinstance(self.node, (ast.Function, ast.Lambda, ast.GenExpr))
+
+    def add_arg(self, name):
+        if isinstance(name, tuple):
+            for n in name:
+                self.add_arg(n)
+        elif name not in self._bound:
+            self._bound.add(name)
+            self.args.append(name)
+
+    def add_local(self, name):
+        if name not in self._bound:
+            self._bound.add(name)
+            self.locals.append(name)
+
+    def add_def(self, name):
+        self.add_local(name)
+        self.defs.append(name)
+        self.assignments.append((name, None))
+
+    def add_assignment(self, name, node):
+        self.add_local(name)
+        self.assignments.append((name, node))
+
+    def add_global(self, name):
+        if name not in self.globals:
+            self.globals.append(name)
+
+    def add_use(self, name):
+        if name not in self._used:
+            self._used.add(name)
+            self.uses.append(name)
+
+    def is_local(self, name):
+        """True if name is an argument or a local variable of this scope."""
+        return name in self._bound and name not in self.globals
+
+    def get_vars(self):
+        """Returns the local variables that need to be declared in javascript.
+
+        Arguments, globals and the names bound by def statements, which are
+        declared by the javascript function statement, are excluded.
+        """
+        skip = set(self.globals + self.defs)
+        return [name for name in self.locals if name not in skip]
+
+    def __repr__(self):
+        return "<Scope %s args=%s locals=%s globals=%s free=%s>" % (
+            self.node.__class__.__name__, self.args, self.locals, self.globals, self.free)
+
+# the classes of the nodes that analyze does more for than visiting their children
+CHECKED_NODES = (ast.Name, ast.AssName, ast.Assign, ast.For, ast.AugAssign, ast.Yield, ast.Global,
+    ast.Import, ast.From, ast.Function, ast.Lambda, ast.Class, ast.GenExpr)
+
+def analyze(tree):
+    """Analyzes the tree and returns a dictionary mapping each scope node
+    (Module, Function, Lambda, Class and GenExpr) to its Scope.
+
+    The tree is walked iteratively, so that very deep trees do not hit
+    the recursion limit.
+    """
+    scopes = {}
+    if isinstance(tree, ast.Module):
+        root = scopes[tree] = Scope(tree)
+        stack = [(tree.node, root)]
+    else:
+        # analyzing a part of a module
+        root = Scope(None)
+        stack = [(tree, root)]
+
+    # AssName nodes of the assignments that are already recorded
+    assigned = set()
+
+    # whether the nodes of a class are checked below, by class, so that the
+    # checks are skipped for the other nodes
+    checked = {}
+
+    while stack:
+        node, scope = stack.pop()
+        children = None
+
+        cls = node.__class__
+        if cls not in checked:
+            checked[cls] = isinstance(node, CHECKED_NODES)
+
+        if not checked[cls]:
+            pass
+        elif isinstance(node, ast.Name):
+            scope.add_use(node.name)
+        elif isinstance(node, ast.AssName):
+            if node not in assigned:
+                scope.add_assignment(node.name, None)
+        elif isinstance(node, ast.Assign):
+            for n in node.nodes:
+                if isinstance(n, ast.AssName):
+                    scope.add_assignment(n.name, node)
+                    assigned.add(n)
+        elif isinstance(node, ast.For):
+            if isinstance(node.assign, ast.AssName):
+                scope.add_assignment(node.assign.name, node)
+                assigned.add(node.assign)
+        elif isinstance(node, ast.AugAssign):
+            if isinstance(node.node, ast.Name):
+                scope.add_assignment(node.node.name, node)
+        elif isinstance(node, ast.Yield):
+            scope.generator = True
+        elif isinstance(node, ast.Global):
+            for name in node.names:
+                scope.add_global(name)
+        elif isinstance(node, ast.Import):
+            for name, asname in node.names:
+                scope.add_assignment(asname or name.split(".")[0], None)
+        elif isinstance(node, ast.From):
+            for name, asname in node.names:
+                if name != "*":
+                    scope.add_assignment(asname or name, None)
+        elif isinstance(node, (ast.Function, ast.Lambda)):
+            if isinstance(node, ast.Function):
+                scope.add_def(node.name)
+                scope.functions[node.name] = node
+
+            child = scopes[node] = Scope(node, scope)
+            for arg in node.argnames:
+                child.add_arg(arg)
+
+            # defaults and decorators are evaluated in the enclosing scope
+            children = [(n, scope) for n in node.defaults]
+            if getattr(node, "decorators", None):
+                children.append((node.decorators, scope))
+            children.append((node.code, child))
+        elif isinstance(node, ast.Class):
+            scope.add_def(node.name)
+            scope.classes[node.name] = node
+            child = scopes[node] = Scope(node, scope)
+            children = [(n, scope) for n in node.bases]
+            if node.decorators:
+                children.append((node.decorators, scope))
+            children.append((node.code, child))
+        elif isinstance(node, ast.GenExpr):
+            child = scopes[node] = Scope(node, scope)
+            inner = node.code
+            children = [(inner.expr, child)]
+            for q in inner.quals:
+                # the outermost iterable is evaluated in the enclosing scope
+                if getattr(q, "is_outmost", False):
+                    children.append((q.iter, scope))
+                else:
+                    children.append((q.iter, child))
+                children.append((q.assign, child))
+                children.extend((n, child) for n in q.ifs)
+
+        if children is None:
+            children = [(n, scope) for n in node.getChildNodes()]
+
+        # push in reverse order to visit the children from left to right
+        children.reverse()
+        stack.extend(children)
+
+    find_free_vars(root)
+    return scopes
+
+def find_free_vars(root):
+    """Marks the names used in a function that are bound in an enclosing function as free."""
+    stack = [root]
+    while stack:
+        scope = stack.pop()
+        stack.extend(scope.children)
+
+        if not scope.is_function():
+            continue
+
+        for name in scope.uses:
+            if scope.is_local(name) or name in scope.globals:
+                continue
+
+            path = []
+            s = scope.parent
+            while s is not None:
+                if isinstance(s.node, ast.Class):
+                    # class scopes are not visible from the methods
+                    s = s.parent
+                elif not s.is_function() or name in s.globals:
+                    # bound at module level
+                    s = None
+                elif s.is_local(name):
+                    break
+                else:
+                    path.append(s)
+                    s = s.parent
+
+            if s is not None:
+                # name passes through the intermediate functions
+                for x in [scope] + path:
+                    if name not in x.free:
+                        x.free.append(name)
@@ -0,0 +1,215 @@
+"""Source maps.
+
+Generates source maps in the Source Map v3 format, which map positions in
+the generated javascript back to lines of the python source.
+
+    >>> js, source_map = pyjs.compile(code, source_map=True, filename="a.py")
+"""
+import json
+from compiler import ast
+
+BASE64 = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+BASE64_VALUES = dict((c, i) for i, c in enumerate(BASE64))
+
+def encode_vlq(value):
+    """Encodes an integer as a base64 VLQ."""
+    # sign is stored in the least significant bit
+    if value < 0:
+        value = (-value << 1) | 1
+    else:
+        value = value << 1
+
+    chars = []
+    while True:
+        digit = value & 31
+        value >>= 5
+        if value:
+            # continuation bit
+            digit |= 32
+        chars.append(BASE64[digit])
+        if not value:
+            return "".join(chars)
+
+def decode_vlq(text):
+    """Decodes a sequence of base64 VLQs into a list of integers."""
+    values = []
+    value = shift = 0
+    for c in text:
+        digit = BASE64_VALUES[c]
+        value += (digit & 31) << shift
+        if digit & 32:
+            shift += 5
+        else:
+            if value & 1:
+                values.append(-(value >> 1))
+            else:
+                values.append(value >> 1)
+            value = shift = 0
+    return values
+
+def parse_mappings(mappings):
+    """Decodes mappings and yields (line, column, source line, source column,
+    name index) for every segment. The name index is None for segments
+    without a name.
+    """
+    source_line = source_column = name = 0
+    for line, text in enumerate(mappings.split(";")):
+        column = 0
+        for segment in text.split(","):
+            if not segment:
+                continue
+            values = decode_vlq(segment)
+            column += values[0]
+            if len(values) == 1:
+                # segment without a source
+                continue
+            source_line += values[2]
+            source_column += values[3]
+            if len(values) > 4:
+                name += values[4]
+                yield line, column, source_line, source_column, name
+            else:
+                yield line, column, source_line, source_column, None
+
+class SourceMap:
+    """Source map of a javascript file generated from one python source.
+
+    All lines and columns are zero based.
+    """
+    def __init__(self, source, file=None):
+        self.source = source
+        self.file = file
+
+        # (line, column, source line, source column, name) of every mapping
+        self.segments = []
+        self.names = []
+        self._name_index = {}
+
+    @classmethod
+    def from_dict(cls, d):
+        """Creates a source map from the decoded JSON of a source map with a single source."""
+        m = cls(d["sources"][0], d.get("file"))
+        names = d.get("names", [])
+        for line, column, source_line, source_column, name in parse_mappings(d["mappings"]):
+            m.add(line, column, source_line, source_column, name is not None and names[name] or None)
+        return m
+
+    def add(self, line, column, source_line, source_column=0, name=None):
+        if name is not None and name not in self._name_index:
+            self._name_index[name] = len(self.names)
+            self.names.append(name)
+        self.segments.append((line, column, source_line, source_column, name))
+
+    def get_mappings(self):
+        """Returns the encoded mappings.
+
+        Lines of the generated code are separated by ";" and segments by ",".
+        The generated column is relative to the previous segment of the same
+        line, all other fields are relative to the previous segment.
+        """
+        lines = []
+        prev_source_line = prev_source_column = prev_name = 0
+        for line, column, source_line, source_column, name in self.segments:
+            if line >= len(lines):
+                lines.extend([] for i in range(line + 1 - len(lines)))
+                prev_column = 0
+
+            segment = encode_vlq(column - prev_column) + "A" + \
+                encode_vlq(source_line - prev_source_line) + \
+                encode_vlq(source_column - prev_source_column)
+            if name is not None:
+                index = self._name_index[name]
+                segment += encode_vlq(index - prev_name)
+                prev_name = index
+            lines[line].append(segment)
+
+            prev_column = column
+            prev_source_line = source_line
+            prev_source_column = source_column
+        return ";".join(",".join(segments) for segments in lines)
+
+    def lookup(self, line, column):
+        """Returns (source line, name) for a position in the generated code
+        or None if nothing is mapped to it.
+
+        The name is the name of the function if the position is the start
+        of a function.
+        """
+        result = None
+        for segment in self.segments:
+            if segment[:2] > (line, column):
+                break
+            if segment[0] == line:
+                result = segment[2], segment[4]
+        return result
+
+    def to_dict(self):
+        d = {
+            "version": 3,
+            "sources": [self.source],
+            "names": self.names,
+            "mappings": self.get_mappings(),
+        }
+        if self.file:
+            d["file"] = self.file
+        return d
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), sort_keys=True)
+
+class SourceMapWriter:
+    """Writer that keeps track of the position in the generated code and
+    adds a mapping to the source map for every node marked by the compiler.
+
+    Lines of the nodes are offset by line_offset, for the lines that the
+    compiler adds before the source.
+    """
+    def __init__(self, write, source_map, line_offset=0):
+        self._write = write
+        self.source_map = source_map
+        self.line_offset = line_offset
+        self.line = 0
+        self.column = 0
+
+        # the mapping to add at the start of the next code written
+        self.pending = None
+
+    def mark(self, node):
+        line = node.lineno - 1 - self.line_offset
+        if line < 0:
+            return
+        name = isinstance(node, ast.Function) and node.name or None
+        self.pending = line, name
+
+    def write(self, fragment):
+        if self.pending is not None:
+            # the code of the node starts after the separators
+            code = fragment.lstrip(" \t\n;")
+            if code:
+                self.advance(fragment[:len(fragment) - len(code)])
+                self.add_mapping()
+                self.advance(code)
+                self._write(fragment)
+                return
+        self.advance(fragment)
+        self._write(fragment)
+
+    def add_mapping(self):
+        source_line, name = self.pending
+        self.pending = None
+
+        segments = self.source_map.segments
+        if segments and name is None:
+            last = segments[-1]
+            if last[0] == self.line and last[2] == source_line:
+                # same line as the previous mapping
+                return
+        self.source_map.add(self.line, self.column, source_line, 0, name)
+
+    def advance(self, text):
+        n = text.count("\n")
+        if n:
+            self.line += n
+            self.column = len(text) - text.rindex("\n") - 1
+        else:
+            self.column += len(text)
@@ -0,0 +1,90 @@
+import pyjs
+import batch
+
+import os
+
+def write(path, text):
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    f = open(path, "w")
+    f.write(text)
+    f.close()
+
+def test_find_sources(tmpdir):
+    src = str(tmpdir.join("src"))
+    write(os.path.join(src, "a.py"), "")
+    write(os.path.join(src, "b.txt"), "")
+    write(os.path.join(src, "x", "c.py"), "")
+
+    assert list(batch.find_sources([src])) == [
+        (os.path.join(src, "a.py"), src), 
+        (os.path.join(src, "x", "c.py"), src)
+    ]
+    assert list(batch.find_sources([os.path.join(src, "*.py")])) == [(os.path.join(src, "a.py"), src)]
+
+def test_get_target():
+    assert batch.get_target("src/a.py", "src") == "src/a.js"
+    assert batch.get_target("src/x/a.py", "src", "build") == "build/x/a.js"
+
+def test_main(tmpdir):
+    src = str(tmpdir.join("src"))
+    out = str(tmpdir.join("out"))
+    write(os.path.join(src, "a.py"), "def f(x): return x")
+    write(os.path.join(src, "x", "b.py"), "y = 1")
+
+    assert batch.main([src, "-o", out, "-j", "2", "-q"]) == 0
+    assert open(os.path.join(out, "a.js")).read() == pyjs.compile("def f(x): return x")
+    assert open(os.path.join(out, "x", "b.js")).read() == pyjs.compile("y = 1")
+
+    # up-to-date files are not compiled again
+    os.utime(os.path.join(out, "a.js"), (0, 0))
+    os.utime(os.path.join(src, "a.py"), (0, 0))
+    os.remove(os.path.join(out, "x", "b.js"))
+    assert batch.main([src, "-o", out, "-j", "1", "-q"]) == 0
+    assert os.path.exists(os.path.join(out, "x", "b.js"))
+    assert os.path.getmtime(os.path.join(out, "a.js")) == 0
+
+    # the files compiled with other options are not up-to-date
+    assert batch.main([src, "-o", out, "-q", "--minify"]) == 0
+    assert open(os.path.join(out, "a.js")).read() == 'function f(a){return a;}py.signature(f,["x"]);'
+    assert open(os.path.join(out, "x", "b.js")).read() == pyjs.compile("y = 1", minify=True)
+    assert batch.main([src, "-o", out, "-q"]) == 0
+    assert open(os.path.join(out, "a.js")).read() == pyjs.compile("def f(x): return x")
+
+    # the options are those of each file
+    assert batch.main([os.path.join(src, "a.py"), "-o", out, "-q", "--minify"]) == 0
+    assert batch.main([src, "-o", out, "-q", "--minify"]) == 0
+    assert open(os.path.join(out, "x", "b.js")).read() == pyjs.compile("y = 1", minify=True)
+    
+    assert batch.main([src, "-o", out, "-f", "-q", "--minify"]) == 0
+    assert open(os.path.join(out, "a.js")).read() == 'function f(a){return a;}py.signature(f,["x"]);'
+
+    write(os.path.join(src, "bad.py"), "def (")
+    assert batch.main([src, "-o", out, "-q"]) == 1
+
+def test_profile(tmpdir, capsys):
+    src = str(tmpdir.join("src"))
+    write(os.path.join(src, "a.py"), "def f(x): return x")
+
+    assert batch.main([src, "-j", "1", "-q", "--profile"]) == 0
+    out, err = capsys.readouterr()
+    assert out.splitlines()[0].split() == ["phase", "time"]
+    assert "Function" in out
+
+    # the files that are up-to-date are profiled too
+    assert batch.main([src, "-j", "1", "--profile"]) == 0
+    out, err = capsys.readouterr()
+    assert out.startswith("compiled 1 files (0 up-to-date, 0 failed)")
+
+def test_bundle(tmpdir):
+    src = str(tmpdir.join("src"))
+    out = str(tmpdir.join("app.js"))
+    write(os.path.join(src, "main.py"), "import lib\nx = lib.f()")
+    write(os.path.join(src, "lib.py"), "def f(): return 1\ndef g(): return 2")
+
+    assert batch.main([src, "--bundle", "main", "-o", out, "-q"]) == 0
+    js = open(out).read()
+    assert 'py.define("lib", function() {' in js
+    assert "function g" not in js
+
+    assert batch.main([src, "--bundle", "missing", "-o", out, "-q"]) == 1
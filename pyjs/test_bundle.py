@@ -0,0 +1,137 @@
+import pyjs
+import bundle
+
+import os
+import subprocess
+from distutils.spawn import find_executable
+
+import pytest
+
+def write(path, text):
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    f = open(path, "w")
+    f.write(text)
+    f.close()
+
+def make_tree(root, files):
+    for name, code in files.items():
+        write(os.path.join(root, name), code)
+    return root
+
+FILES = {
+    "main.py": "\n".join([
+        "import pkg.util",
+        "from pkg import helpers",
+        "from pkg.deep import *",
+        "",
+        "def unused():",
+        "    import extra",
+        "",
+        "def used(x):",
+        "    return pkg.util.double(x) + helpers.inc(x)",
+        "",
+        "result = [used(3), triple(2), pkg.VERSION]",
+    ]),
+    "pkg/__init__.py": "VERSION = '1.0'\n",
+    "pkg/util.py": "def double(x): return x * 2\ndef unused(x): return x\n",
+    "pkg/helpers.py": "def inc(x): return add(x, 1)\ndef add(a, b): return a + b\ndef dead(): return 0\n",
+    "pkg/deep.py": "__all__ = ['triple']\ndef triple(x): return x * 3\ndef _private(): pass\n",
+    "extra.py": "x = 1\n",
+}
+
+def test_bundle(tmpdir):
+    root = make_tree(str(tmpdir), FILES)
+    b = bundle.Bundler(root)
+    js = b.bundle("main")
+
+    assert sorted(m.name for m in b.modules) == ["main", "pkg", "pkg.deep", "pkg.helpers", "pkg.util"]
+    assert sorted(b.dropped) == ["main.unused", "pkg.deep._private", "pkg.helpers.dead", "pkg.util.unused"]
+    assert b.missing == []
+
+    assert 'py.define("pkg.helpers", function() {' in js
+    assert 'return {"inc": inc, "add": add};' in js
+    assert 'triple = py.importfrom("pkg.deep", "triple");' in js
+    assert js.endswith('py.import("main");\n')
+
+def test_no_shake(tmpdir):
+    root = make_tree(str(tmpdir), FILES)
+    b = bundle.Bundler(root, shake=False)
+    b.bundle("main")
+    assert "extra" in [m.name for m in b.modules]
+    assert b.dropped == []
+
+def test_relative_imports(tmpdir):
+    root = make_tree(str(tmpdir), {
+        "a/__init__.py": "",
+        "a/b.py": "from . import c\nfrom .c import f\nimport c as c2\nx = c.f() + f() + c2.f()\n",
+        "a/c.py": "def f(): return 1\n",
+    })
+    b = bundle.Bundler(root)
+    js = b.bundle("a.b")
+    assert 'c = py.importfrom("a", "c");' in js
+    assert 'f = py.importfrom("a.c", "f");' in js
+    assert 'c2 = py.import("a.c");' in js
+    assert b.dropped == []
+
+def test_missing(tmpdir):
+    root = make_tree(str(tmpdir), {"main.py": "import os\nx = os.getcwd()\n"})
+    b = bundle.Bundler(root)
+    b.bundle("main")
+    assert b.missing == ["os"]
+    pytest.raises(pyjs.CompilerError, b.bundle, "nothere")
+
+def test_module_as_value(tmpdir):
+    root = make_tree(str(tmpdir), {
+        "main.py": "import m\nx = m\n",
+        "m.py": "def f(): pass\ndef g(): pass\n",
+    })
+    b = bundle.Bundler(root)
+    b.bundle("main")
+    assert b.dropped == []
+
+def test_eager(tmpdir):
+    root = make_tree(str(tmpdir), FILES)
+    js = bundle.bundle("main", root, lazy=False)
+    imports = js[js.index('py.import("main");\n'):].splitlines()
+    assert sorted(imports[1:]) == ['py.import("pkg");', 'py.import("pkg.deep");', 'py.import("pkg.helpers");', 'py.import("pkg.util");']
+    assert js.count("py.import(") == bundle.bundle("main", root).count("py.import(") + 4
+
+def run(tmpdir, js, expr):
+    """Runs the bundle js with node and returns the JSON of expr."""
+    node = find_executable("node")
+    if not node:
+        pytest.skip("node is not installed")
+
+    runtime = open(os.path.join(os.path.dirname(__file__), "py.js")).read()
+    js = "var window = {};\n" + runtime + "var py = window.py;\n" + js
+    js += "console.log(JSON.stringify(%s));\n" % expr
+
+    path = str(tmpdir.join("bundle.js"))
+    write(path, js)
+    return subprocess.check_output([node, path]).strip()
+
+def test_run(tmpdir):
+    root = make_tree(str(tmpdir.join("src")), FILES)
+    js = bundle.bundle("main", root, minify=True)
+    assert run(tmpdir, js, "py.import('main').result") == '[10,6,"1.0"]'
+
+def test_run_lazy(tmpdir):
+    root = make_tree(str(tmpdir.join("src")), {
+        "main.py": "def rare():\n    import log\n    return log.x\nhandlers = [rare]\n",
+        "log.py": "import counter\ncounter.n = counter.n + 1\nx = counter.n\n",
+        "counter.py": "n = 0\n",
+    })
+    expr = "[py.modules.log === undefined, py.import('main').rare(), py.import('main').rare()]"
+    assert run(tmpdir, bundle.bundle("main", root), expr) == "[true,1,1]"
+    assert run(tmpdir, bundle.bundle("main", root, lazy=False), expr) == "[false,1,1]"
+
+def test_run_rebind(tmpdir):
+    root = make_tree(str(tmpdir.join("src")), {
+        "main.py": "import lib\nlib.inc()\nlib.inc()\nresult = lib.count\ndef read():\n    return lib.get()\nhandlers = [read]\n",
+        "lib.py": "count = 0\ndef inc():\n    global count\n    count += 1\ndef get():\n    return count\n",
+    })
+    # globals rebound in functions are read and written through the module
+    expr = "[py.import('main').result, (py.import('lib').count = 5, py.import('main').read())]"
+    assert run(tmpdir, bundle.bundle("main", root), expr) == "[2,5]"
+    assert run(tmpdir, bundle.bundle("main", root, minify=True), expr) == "[2,5]"
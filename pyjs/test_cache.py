@@ -0,0 +1,67 @@
+import pyjs
+from cache import Cache
+
+import os
+
+def test_compile_with_cache(tmpdir):
+    cache = Cache(str(tmpdir))
+    code = "def square(x): return x*x"
+
+    assert pyjs.compile(code, cache=cache) == pyjs.compile(code)
+    assert cache.stats() == dict(hits=0, misses=1, evictions=0)
+
+    assert pyjs.compile(code, cache=cache) == pyjs.compile(code)
+    assert cache.stats() == dict(hits=1, misses=1, evictions=0)
+
+    # cache is persistent across Cache objects
+    cache = Cache(str(tmpdir))
+    assert pyjs.compile(code, cache=cache) == pyjs.compile(code)
+    assert cache.stats() == dict(hits=1, misses=0, evictions=0)
+
+def test_fingerprint(tmpdir):
+    assert pyjs.get_fingerprint().startswith(pyjs.__version__ + "-")
+
+    # the entries of another build of the compiler are not used
+    cache = Cache(str(tmpdir))
+    code = "x = 1"
+    cache.put(cache.key(code, pyjs.__version__, {}), "stale")
+    assert pyjs.compile(code, cache=cache) == pyjs.compile(code)
+
+def test_replace(tmpdir):
+    # replacing an entry doesn't count its size twice
+    cache = Cache(str(tmpdir))
+    cache.put("a" * 40, "0123456789")
+    for i in range(3):
+        cache.put("b" * 40, "0123456789")
+    assert cache._size == 20
+
+def test_key():
+    cache = Cache("/nonexistant")
+    key = cache.key("x = 1", "0.1", {})
+    assert key == cache.key("x = 1", "0.1", {})
+    assert key != cache.key("x = 2", "0.1", {})
+    assert key != cache.key("x = 1", "0.2", {})
+    assert key != cache.key("x = 1", "0.1", {"optimize": 1})
+
+def test_eviction(tmpdir):
+    cache = Cache(str(tmpdir), max_size=25)
+
+    cache.put("a" * 40, "0123456789")
+    cache.put("b" * 40, "0123456789")
+
+    # make "a" the most recently used entry
+    t = os.path.getmtime(cache._filename("b" * 40))
+    os.utime(cache._filename("a" * 40), (t+10, t+10))
+
+    cache.put("c" * 40, "0123456789")
+
+    assert cache.get("a" * 40) == "0123456789"
+    assert cache.get("b" * 40) is None
+    assert cache.get("c" * 40) == "0123456789"
+    assert cache.evictions == 1
+
+def test_no_partial_files(tmpdir):
+    cache = Cache(str(tmpdir))
+    cache.put("a" * 40, "x = 1;")
+    names = os.listdir(os.path.join(str(tmpdir), "aa"))
+    assert names == ["a" * 38 + ".js"]
@@ -1,4 +1,6 @@
 import pyjs
+from cache import Cache
+import pytest
 from compiler import ast
 import os, re
 
@@ -28,13 +30,23 @@ class TestVisitor(BaseTest):
         assert self("(a+b).x = 1") == "(a + b).x = 1;"
 
     def test_AssList(self):
-        assert self("[a, b] = b, a") == "py.tmp = [b, a]; a = py.tmp[0]; b = py.tmp[1];"
+        assert self("[a, b] = b, a") == "var __t0 = b, __t1 = a; a = __t0; b = __t1;"
+        assert self("[a, b] = c") == "var __t0 = py.unpack(c, 2); a = __t0[0]; b = __t0[1];"
 
     def test_AssName(self):
         assert self("a = 1") == "a = 1;"
 
     def test_AssTuple(self):
-        assert self("a, b = b, a") == "py.tmp = [b, a]; a = py.tmp[0]; b = py.tmp[1];"
+        assert self("a, b = b, a") == "var __t0 = b, __t1 = a; a = __t0; b = __t1;"
+        assert self("a, b = 1, x") == "var __t0 = x; a = 1; b = __t0;"
+        
+        # length mismatch is left to the runtime
+        assert self("a, b = x, y, z") == "var __t0 = py.unpack([x, y, z], 2); a = __t0[0]; b = __t0[1];"
+        
+    def test_AssTuple_nested(self):
+        assert self("a, (b, c) = x, (y, 2)") == "var __t0 = x, __t1 = y; a = __t0; b = __t1; c = 2;"
+        assert self("a, (b, c) = x, y") == "var __t0 = x, __t1 = y; a = __t0; var __t2 = py.unpack(__t1, 2); b = __t2[0]; c = __t2[1];"
+        assert self("a, (b, c) = x") == "var __t0 = py.unpack(x, 2); a = __t0[0]; var __t1 = py.unpack(__t0[1], 2); b = __t1[0]; c = __t1[1];"
 
     def test_Assert(self):
         assert self("assert True") == "py.assert(true, nil);"
@@ -62,10 +74,79 @@ class TestVisitor(BaseTest):
 
     def test_CallFunc(self):
         assert self("f(1)") == "f(1)"
-        assert self("f(1, 2, *a, **kw)") == "f.apply(this, py.make_args([1, 2], a, kw))"
+        assert self("f(1, 2, *a, **kw)") == "py.call(f, this, [1, 2], a, kw)"
+        assert self("f(1, x=2)") == 'py.call(f, this, [1], nil, py.dict([["x", 2]]))'
+        
+    def test_CallFunc_resolved(self):
+        # keywords and defaults of a known function are resolved at compile time
+        f = "def f(a, b=1, c=None): pass\n"
+        assert self(f + "f(c=2, a=g())").endswith("f(g(), 1, 2)")
+        assert self(f + "f(*(1, 2), **{'c': 3})").endswith("f(1, 2, 3)")
+        assert self("def f(a, b=-1): pass\ndef g(): return f(a=1)").endswith("return f(1, -1); }")
+        
+        f = "def f(a, *args, **kw): pass\n"
+        assert self(f + "f(1, 2, 3, x=4)").endswith('f(1, [2, 3], py.dict([["x", 4]]))')
+        assert self(f + "f(1)").endswith("f(1, [], py.dict([]))")
+        
+        # arguments passed in another order are evaluated in the order of the call
+        assert self("def f(a, b): pass\nf(b=g(), a=h())").endswith("($k0 = g(), $k1 = h(), f($k1, $k0)) var $k0, $k1;")
+        assert self("def f(a, b): pass\nf(b=g(), a=x)").endswith("($k0 = g(), $k1 = x, f($k1, $k0)) var $k0, $k1;")
+        assert self("def f(a, b): pass\ndef h(): return f(b=g(), a=1)") == 'function f(a, b) {  } py.signature(f, ["a", "b"]); function h() { return f(1, g()); }'
+        assert self("def f(a, b): pass\ndef h(x): return f(b=g(), a=x)") \
+            == 'function f(a, b) {  } py.signature(f, ["a", "b"]); function h(x) { return ($k0 = g(), $k1 = x, f($k1, $k0)); var $k0, $k1; } py.signature(h, ["x"]);'
+        
+        # otherwise the keywords are passed at runtime
+        make_args = 'py.call(f, this, [], nil, py.dict([["a", 1]]))'
+        assert self("def f(a): pass\nf = g\nf(a=1)").endswith(make_args)
+        assert self("def f(a, b=[]): pass\nf(a=1)").endswith(make_args)
+
+        assert self("def f(a): pass\nf(1, b=2)").endswith('py.dict([["b", 2]]))')
+        assert self("def f(a): pass\ndef g(f): return f(a=1)").endswith(make_args + '; } py.signature(g, ["f"]);')
 
     def test_Class(self):
-        pass
+        code = "class A:\n    x = 1\n    def __init__(self, a):\n        self.a = a\n    def get(self):\n        return self.a + self.b"
+        assert self(code) == ("function A($0) { var $self = this instanceof A ? this : Object.create(A.prototype); "
+            "$self.a = nil; $self.__init__($0); return $self; } "
+            "A.prototype.x = 1; "
+            'A.prototype.__init__ = py.signature(function(a) { var self = this; self.a = a; }, ["a"]); '
+            'A.prototype.get = function() { var self = this; return self.a + py.getattr(self, "b"); }; '
+            "A.__signature__ = A.prototype.__init__.__signature__;")
+        
+        # the attributes of __init__ are created in the order of their first assignment
+        code = "class A:\n    def __init__(self, x):\n        if x: self.b = x\n        self.a = self.b = 1\n        self.c = lambda self: self.d"
+        assert "$self.b = nil; $self.a = nil; $self.c = nil; $self.__init__($0);" in self(code)
+        
+    def test_Class_slots(self):
+        assert self("class A(object):\n    __slots__ = ('a', 'b')") == ("function A() { "
+            "var $self = this instanceof A ? this : Object.create(A.prototype); $self.a = nil; $self.b = nil; Object.seal($self); return $self; } "
+            'A.prototype.__slots__ = ["a", "b"];')
+        
+        # subclasses of classes without slots have all their attributes
+        js = self("class A(B):\n    __slots__ = 'a'")
+        assert "$self.a = nil; if ($self.__init__) { $self.__init__.apply($self, arguments); } return $self; }" in js
+        assert "A.prototype = Object.create(B.prototype); A.prototype.constructor = A;" in js
+        
+    def test_Class_calls(self):
+        base = "class A:\n    def __init__(self, a, b=2):\n        self.a = a\n    def f(self, x=1):\n        return x\n"
+        assert self(base + "a = A(b=3, a=1)").endswith("a = new A(1, 3);")
+        assert self(base + "class B(A):\n    def __init__(self):\n        A.__init__(self, 0)").endswith(
+            "$self.a = nil; $self.__init__(); return $self; } B.prototype = Object.create(A.prototype); B.prototype.constructor = B; "
+            "B.prototype.__init__ = function() { var self = this; A.prototype.__init__.call(self, 0, 2) };")
+        
+        # methods of self are called directly
+        assert self(base + "    def g(self):\n        return self.f() + self.h()").endswith(
+            'return self.f() + py.getattr(self, "h")(); }; A.__signature__ = A.prototype.__init__.__signature__;')
+        assert self("def f(A): return A(1)") == 'function f(A) { return A(1); } py.signature(f, ["A"]);'
+        
+        # decorated methods are not called directly
+        code = base + "    @staticmethod\n    def s(x):\n        return x\n    @classmethod\n    def c(cls):\n        return cls\n    @d\n    def g(self):\n        return self.s(1) + self.g()"
+        js = self(code)
+        assert 'A.prototype.s = py.staticmethod(py.signature(function(x) { return x; }, ["x"]));' in js
+        assert "A.prototype.c = py.classmethod(function() { var cls = this.constructor; return cls; });" in js
+        assert ('A.prototype.g = py.method(d(py.signature(function(self) { '
+            'return py.getattr(self, "s")(1) + py.getattr(self, "g")(); }, ["self"])));') in js
+        assert self(code + "\n" + "A.s(1)").endswith('py.getattr(A, "s")(1)')
+        
 
     def test_Compare(self):
         assert self("a == b") == "a == b"
@@ -105,16 +186,44 @@ class TestVisitor(BaseTest):
         assert self("a // b") == "py.floordiv(a, b)"
 
     def test_For(self):
-        pass
+        assert self("for x in a: y = x") == "for (var __i1 = py.iter(a), __v1; (__v1 = __i1.next()) !== py.stop; ) { x = __v1; y = x; }"
+        assert self("for x in [1, 2]: y = x") == "for (var __i1 = 0, __s1 = [1, 2], __n1 = __s1.length; __i1 < __n1; __i1++) { x = __s1[__i1]; y = x; }"
+        
+    def test_For_range(self):
+        assert self("for i in range(n): x = i") == "for (var __i1 = 0, __n1 = n; __i1 < __n1; __i1++) { i = __i1; x = i; }"
+        assert self("for i in xrange(1, n, 2): x = i") == "for (var __i1 = 1, __n1 = n; __i1 < __n1; __i1 += 2) { i = __i1; x = i; }"
+        assert self("for i in range(n, 0, -1): x = i") == "for (var __i1 = n, __n1 = 0; __i1 > __n1; __i1--) { i = __i1; x = i; }"
+        assert self("for i in range(a, b, c): x = i") == "for (var __i1 = a, __n1 = b, __s1 = py.range_step(c); __s1 > 0 ? __i1 < __n1 : __i1 > __n1; __i1 += __s1) { i = __i1; x = i; }"
+        
+        # nested loops use different counters
+        assert self("for i in range(n):\n for j in range(i): x = j") == "for (var __i1 = 0, __n1 = n; __i1 < __n1; __i1++) { i = __i1; for (var __i2 = 0, __n2 = i; __i2 < __n2; __i2++) { j = __i2; x = j; }  }"
+        
+        # shadowed range
+        assert self("def range(n): pass\nfor i in range(n): x = i").endswith("for (var __i1 = py.iter(range(n)), __v1; (__v1 = __i1.next()) !== py.stop; ) { i = __v1; x = i; }")
+        
+    def test_For_else(self):
+        assert self("for i in range(n):\n if i: break\nelse: x = 1") == "__loop1: { for (var __i1 = 0, __n1 = n; __i1 < __n1; __i1++) { i = __i1; if (i) { break __loop1; }  } x = 1; }"
+        assert self("for i in range(n):\n for j in a: break\nelse: x = 1") == "__loop1: { for (var __i1 = 0, __n1 = n; __i1 < __n1; __i1++) { i = __i1; for (var __i2 = py.iter(a), __v2; (__v2 = __i2.next()) !== py.stop; ) { j = __v2; break; }  } x = 1; }"
 
     def test_From(self):
-        pass
+        assert self("from a.b import c, d as e") == 'c = py.importfrom("a.b", "c"); e = py.importfrom("a.b", "d");'
+        assert self("from __future__ import division") == ""
+        pytest.raises(pyjs.CompilerError, self, "from a import *")
+        pytest.raises(pyjs.CompilerError, self, "from . import a")
 
     def test_Function(self):
-        pass
+        assert self("def f(a, b=1): pass") == 'function f(a, b) {  } py.signature(f, ["a", "b"], [1], false, false);'
+        
+        # local functions that are only called don't need their signature
+        code = "def g(y):\n    def f(a, b=2): return a\n    def h(a): return a\n    def k(a): return a\n    m(k)\n    return f(b=1, a=y) + h(1) + h(b=1)"
+        js = self(code)
+        assert "py.signature(f, " not in js and "py.signature(h, " in js and "py.signature(k, " in js
+        assert "py.signature(f, " in self(code.replace("def f(a, b=2)", "def f(a, b=[])"))
 
     def test_GenExpr(self):
-        pass
+        js = self("x = (a for a in b)")
+        assert js.startswith("x = (function(__it) { var a, __g0, __g1, __state = 0; return py.generator(function(__sent) {")
+        assert js.endswith("})(py.iter(b));")
 
     def test_GenExprFor(self):
         pass
@@ -129,6 +238,14 @@ class TestVisitor(BaseTest):
         assert self("a.x") == 'py.getattr(a, "x")'
         assert self("(a+b).x") == 'py.getattr(a + b, "x")'
 
+    def test_Getattr_inline_caches(self):
+        js = pyjs.compile("x = a.b.c\ny = a.b", inline_caches=True)
+        decl, x, y = js.strip().splitlines()
+        var = re.match(r"var (\$ic\w+) = ", decl).group(1)
+        assert decl.endswith('py.inline_caches(["c", "b", "b"], ["1:c", "1:b", "2:b"]);')
+        assert x == "x = %s[0].get(%s[1].get(a));" % (var, var)
+        assert y == "y = %s[2].get(a);" % var
+        
     def test_Global(self):
         pass
 
@@ -139,7 +256,9 @@ class TestVisitor(BaseTest):
         pass
 
     def test_Import(self):
-        pass
+        assert self("import a") == 'a = py.import("a");'
+        assert self("import a.b as c") == 'c = py.import("a.b");'
+        assert self("import a.b") == 'py.import("a.b"); a = py.import("a");'
 
     def test_Invert(self):
         pass
@@ -154,10 +273,17 @@ class TestVisitor(BaseTest):
         pass
 
     def test_List(self):
-        pass
+        assert self("[]") == "[]"
+        assert self("[1, a]") == "[1, a]"
 
     def test_ListComp(self):
-        pass
+        assert self("[x * 2 for x in range(n)]") == ("(function() { var __i = 0, __n = n, __r = new Array(Math.max(__n - __i, 0)), __k = 0; "
+            "for (; __i < __n; __i++) { x = __i; __r[__k++] = x * 2; } return __r; })()")
+        assert self("[x for x in [a, b]]") == ("(function() { var __s = [a, b], __n = __s.length, __r = new Array(__n); "
+            "for (var __i = 0; __i < __n; __i++) { x = __s[__i]; __r[__i] = x; } return __r; })()")
+        assert self("[(x, y) for x in a if x for y in b]") == ("(function() { var __r = []; "
+            "for (var __i1 = py.iter(a), __v1; (__v1 = __i1.next()) !== py.stop; ) { x = __v1; if (x) { "
+            "for (var __i2 = py.iter(b), __v2; (__v2 = __i2.next()) !== py.stop; ) { y = __v2; __r.push([x, y]); } } } return __r; })()")
 
     def test_ListCompFor(self):
         pass
@@ -169,7 +295,10 @@ class TestVisitor(BaseTest):
         pass
 
     def test_Module(self):
-        pass
+        js = pyjs.compile("import b\nx = 1\ndef f():\n    global y\n    y = __name__", module="a")
+        assert js.startswith('py.define("a", function() {\nvar __name__ = "a";\nvar b, x, y;\n')
+        # y is rebound by f after the module has run
+        assert js.endswith('return {"b": b, "x": x, "f": f, get "y"() { return y; }, set "y"($v) { y = $v; }};\n});\n')
 
     def test_Mul(self):
         pass
@@ -233,7 +362,7 @@ class TestVisitor(BaseTest):
         pass
 
     def test_Tuple(self):
-        pass
+        assert self("(1, a)") == "[1, a]"
 
     def test_UnaryAdd(self):
         assert self("+1") == "+1"
@@ -244,26 +373,136 @@ class TestVisitor(BaseTest):
         assert self("-a") == "-a"
 
     def test_While(self):
-        pass
+        assert self("while x: x -= 1") == "while (x) { x -= 1; }"
+        assert self("while x:\n if y: break\nelse: z = 1") == "__loop1: { while (x) { if (y) { break __loop1; }  } z = 1; }"
 
     def test_With(self):
         pass
 
     def test_Yield(self):
-        pass
+        assert self("def f(x):\n yield x") == ("function f(x) { var __state = 0; return py.generator(function(__sent) { "
+            'while (true) { switch (__state) { case 0: __state = 1; return x; case 1: return py.stop; } } }); } py.signature(f, ["x"]);')
+        assert self("def f(x):\n while x:\n  x = yield x") == ("function f(x) { var __state = 0; return py.generator(function(__sent) { "
+            "while (true) { switch (__state) { case 0: case 1: if (!(x)) { __state = 3; continue; } __state = 2; return x; "
+            'case 2: x = __sent; __state = 1; continue; case 3: return py.stop; } } }); } py.signature(f, ["x"]);')
+        pytest.raises(pyjs.CompilerError, self, "def f(x):\n g((yield x))")
+
+    def test_Yield_es6(self):
+        js = pyjs.compile("def f(x):\n y = g((yield x))\n return", target="es6")
+        assert js == "function f(x) {\nvar y;\nreturn py.generator(function* () {\ny = g((yield x));\nreturn;\n\n}());\n}\npy.signature(f, [\"x\"]);\n"
 
     def test_complex_code(self):
         assert self("(1 + 2) * 3") == "(1 + 2) * 3"
         
+class TestTypes(BaseTest):
+    def test_Div(self):
+        assert self("x = 5 / 2") == "x = Math.floor(5 / 2);"
+        assert self("x = 5 / 2.0") == "x = 5 / 2.0;"
+        assert self("def f(a): b = 1; return b / (a + 1)") == 'function f(a) { var b; b = 1; return b / (a + 1); } py.signature(f, ["a"]);'
+        
+    def test_FloorDiv(self):
+        assert self("x = 5.0 // 2") == "x = Math.floor(5.0 / 2);"
+        assert self("def f(a): b = a + 1; c = b * 2; return c // (c - 1)") == 'function f(a) { var b, c; b = a + 1; c = b * 2; return py.floordiv(c, c - 1); } py.signature(f, ["a"]);'
+        assert self("def f(): b = 1; c = b * 2; return c // (c - 1)") == "function f() { var b, c; b = 1; c = b * 2; return Math.floor(c / (c - 1)); }"
+        
+    def test_in(self):
+        assert self("def f(x): a = [1, 2]; return 2 in a") == 'function f(x) { var a; a = [1, 2]; return (a.indexOf(2) !== -1); } py.signature(f, ["x"]);'
+        assert self("def f(x): a = [1, 2]; return str(x) in a") == 'function f(x) { var a; a = [1, 2]; return (a.indexOf(str(x)) !== -1); } py.signature(f, ["x"]);'
+        # lists and tuples are compared by value
+        assert self("def f(x): a = [1, 2]; return x in a") == 'function f(x) { var a; a = [1, 2]; return py.in(x, a); } py.signature(f, ["x"]);'
+        assert self("def f(): a = [[1], [2]]; return [1] in a") == "function f() { var a; a = [[1], [2]]; return py.in([1], a); }"
+        assert self("def f(): a = [(1, 2)]; return (1, 2) not in a") == "function f() { var a; a = [[1, 2]]; return !py.in([1, 2], a); }"
+        assert self("def f(x): a = 'abc'; return 'b' not in a") == 'function f(x) { var a; a = "abc"; return (a.indexOf("b") === -1); } py.signature(f, ["x"]);'
+        assert self("def f(x): a = 'abc'; return x in a") == 'function f(x) { var a; a = "abc"; return py.in(x, a); } py.signature(f, ["x"]);'
+        
+    def test_methods(self):
+        assert self("def f(x): a = []; a.append(x)") == 'function f(x) { var a; a = []; a.push(x) } py.signature(f, ["x"]);'
+        # the result of append is None
+        assert self("def f(x): a = []; y = a.append(x); return [a.reverse()]") == (
+            'function f(x) { var a, y; a = []; y = (a.push(x), nil); return [(a.reverse(), nil)]; } py.signature(f, ["x"]);')
+        assert self("def f(x): s = str(x); return s.upper()") == 'function f(x) { var s; s = str(x); return s.toUpperCase(); } py.signature(f, ["x"]);'
+        assert self("def f(x): s = str(x); return s.upper(1)") == 'function f(x) { var s; s = str(x); return py.getattr(s, "upper")(1); } py.signature(f, ["x"]);'
+        assert self("def f(x): a = []; return ','.join(a)") == 'function f(x) { var a; a = []; return a.join(","); } py.signature(f, ["x"]);'
+        
+    def test_reductions(self):
+        assert self("sum(x for x in range(n))") == ("(function() { var x, __r = 0; "
+            "for (var __i1 = 0, __n1 = n; __i1 < __n1; __i1++) { x = __i1; __r += x; } return __r; })()")
+        assert self("sum([x for x in a], 1)") == ("(function() { var __r = 1; "
+            "for (var __i1 = py.iter(a), __v1; (__v1 = __i1.next()) !== py.stop; ) { x = __v1; __r += x; } return __r; })()")
+        assert self("any(x for x in a)") == ("(function() { var x; "
+            "for (var __i1 = py.iter(a), __v1; (__v1 = __i1.next()) !== py.stop; ) { x = __v1; if (x) { return true; } } return false; })()")
+        assert self("all(x for x in a)").endswith("if (!(x)) { return false; } } return true; })()")
+        assert self("max(x for x in a)").endswith('if (__e || __v > __r) { __r = __v; __e = false; } } '
+            'if (__e) { throw new Error("ValueError: max() arg is an empty sequence"); } return __r; })()')
+        assert self("' '.join(s for s in a)").startswith('(function() { var s, __r = "", __j = " ", __e = true;')
+        
+        # the variable of the generator expression doesn't hide the iterable
+        assert self("sum(x for x in x)").startswith("(function() { var x$, __r = 0; for (var __i1 = py.iter(x), __v1;")
+        
+        # shadowed builtins and other arguments are not reduced
+        assert self("def f(sum): return sum(x for x in a)").startswith("function f(sum) { return sum((function(__it)")
+        assert self("max((x for x in a), key=f)").startswith("py.call(max, this, [(function(__it)")
+        
+    def test_len(self):
+        assert self("def f(x): a = []; return len(a) + len(x)") == 'function f(x) { var a; a = []; return a.length + len(x); } py.signature(f, ["x"]);'
+        assert self("def f(len): a = []; return len(a)") == 'function f(len) { var a; a = []; return len(a); } py.signature(f, ["len"]);'
+        
 class TestFunctionVars(BaseTest):
     def test_with_assignment(self):
-        assert self("def f(a, b): sum = a + b; return sum") == "function f(a, b) { var sum; sum = a + b; return sum; }"
+        assert self("def f(a, b): sum = a + b; return sum") == 'function f(a, b) { var sum; sum = a + b; return sum; } py.signature(f, ["a", "b"]);'
 
     def test_with_AugAssign(self):
-        assert self("def f(a): sum += a; return sum") == "function f(a) { var sum; sum += a; return sum; }"
+        assert self("def f(a): sum += a; return sum") == 'function f(a) { var sum; sum += a; return sum; } py.signature(f, ["a"]);'
         
     def test_globals(self):
-        assert self("def f(a): global x; x = a; return x") == "function f(a) { x = a; return x; }"
+        assert self("def f(a): global x; x = a; return x") == 'function f(a) { x = a; return x; } py.signature(f, ["a"]);'
+
+    def test_order(self):
+        assert self("def f(a): y = a; x = y; return x") == 'function f(a) { var y, x; y = a; x = y; return x; } py.signature(f, ["a"]);'
+
+    def test_nested(self):
+        assert self("def f(a):\n def g(b): c = a + b; return c\n return g") == 'function f(a) { function g(b) { var c; c = a + b; return c; } py.signature(g, ["b"]); return g; } py.signature(f, ["a"]);'
+    
+class TestMinify:
+    def __call__(self, code):
+        return pyjs.compile(code, minify=True)
+        
+    def test_whitespace(self):
+        assert self("x = a + b\ny = -x") == "x=a+b;y=-x;"
+        assert self("x = a - -b") == "x=a- -b;"
+        assert self("print 'a b', 'c d'") == 'py.print("a b","c d","\\n");'
+        assert self("a.append(x)\ny = 1") == 'py.getattr(a,"append")(x);y=1;'
+        
+    def test_locals(self):
+        assert self("def f(x, y): z = x + y; return z") == 'function f(a,b){var c;c=a+b;return c;}py.signature(f,["x","y"]);'
+        
+        # names used by the function aren't used as short names
+        assert self("def f(x): return x + a") == 'function f(b){return b+a;}py.signature(f,["x"]);'
+        assert self("def f(x): global a; a = x") == 'function f(b){a=b;}py.signature(f,["x"]);'
+        
+    def test_nested(self):
+        assert self("def f(x):\n def g(y): return x + y\n return g") == 'function f(a){function b(c){return a+c;}py.signature(b,["y"]);return b;}py.signature(f,["x"]);'
+        
+    def test_strings(self):
+        assert self("a = 'hello world'\nb = 'hello world'\nc = 'hi'\nd = 'hi'") == 'var $0="hello world";a=$0;b=$0;c="hi";d="hi";'
+        
+    def test_cache(self, tmpdir):
+        cache = Cache(str(tmpdir))
+        assert pyjs.compile("x = 1", cache=cache) == "x = 1;\n"
+        assert pyjs.compile("x = 1", cache=cache, minify=True) == "x=1;"
+        
+def test_compile_to():
+    from cStringIO import StringIO
+    code = "def f(a, b):\n    if a > b:\n        return a * (b + 1)\n    return b"
+    
+    f = StringIO()
+    pyjs.compile_to(f, code)
+    assert f.getvalue() == pyjs.compile(code)
+    
+def test_deep_expression():
+    # must not hit the recursion limit
+    code = "x = " + " + ".join(["a"] * 5000)
+    assert pyjs.compile(code).strip() == "x = " + " + ".join(["a"] * 5000) + ";"
     
 def test_samples():
     path = os.path.join(os.path.dirname(__file__), "test_samples.txt")
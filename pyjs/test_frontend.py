@@ -0,0 +1,142 @@
+import frontend
+import pyjs
+import compiler
+from compiler import ast
+import glob
+import os
+import pytest
+
+from test_compiler import parse_samples
+
+CASES = [
+    # docstrings
+    '"doc"\nx = 1',
+    '("not a doc")\nx = 1',
+    'def f():\n    "doc"\n    return 1',
+    'class A:\n    """doc\n    more"""\n    x = 1',
+
+    # numbers
+    "x = -1", "x = -0", "x = - 1.5", "x = -1j", "x = -0j", "x = -(1)", "x = --1", "x = -1 ** 2",
+
+    # operators
+    "a + b - c * d / e % f // g ** h",
+    "a | b | c", "(a | b) | c", "a | (b | c)", "a ^ b ^ c & d & e", "a | b ^ c | d",
+    "a and b or not c", "(a and b) and c",
+    "a < b <= c != d <> e is f is not g in h not in i",
+
+    # subscripts
+    "a[1]", "a[1, 2]", "a[(1, 2)]", "a[()]", "a[1:2]", "a[:]", "a[::]", "a[1:2:3]", "a[::None]",
+    "a[..., 1:2, ::3]", "a[1:2] = b", "del a[1], a[2:]", "a[1] += 2", "a[1:] += b",
+
+    # targets
+    "a = b = c", "a, (b, c) = d", "[a, b] = c", "a.b, c[1] = d", "del a", "del a, b", "del (a, b)",
+    "a += 1", "a.b += 1",
+
+    # statements
+    "if a:\n    b\nelif c:\n    d\nelse:\n    e",
+    "if a:\n    b\nelse:\n    if c:\n        d",
+    "for a, b in c:\n    break\nelse:\n    continue",
+    "while a:\n    pass\nelse:\n    b",
+    "try:\n    a\nexcept E, e:\n    b\nexcept:\n    c\nelse:\n    d\nfinally:\n    e",
+    "try:\n    try:\n        a\n    except:\n        b\nfinally:\n    c",
+    "with a as b, c:\n    d",
+    "with a:\n    with b:\n        c",
+    "print a, b,\nprint >>f, a\nprint",
+    "exec a\nexec a in b\nexec a in b, c\nexec(a, b)",
+    "raise\nraise E\nraise E, v, tb",
+    "assert a\nassert a, b",
+    "import a.b as c, d\nfrom . import e\nfrom ..f import *\nfrom g import (h as i, j)",
+    "global a, b",
+    "return\nreturn a",
+
+    # semicolons
+    "a = 1;\nb = 2; c = 3;",
+    "if a: b;",
+    "a = ';'\nb = '''\n;\n'''",
+    "a = 1; # comment;",
+
+    # functions
+    "@d\n@e.f(1)\n\ndef g(a, (b, c), d=1, *e, **f):\n    yield",
+    "def f(): pass",
+    "def f(*a): pass",
+    "lambda: 1",
+    "lambda a, b=1, *c, **d: a",
+    "@d\nclass A(B, C):\n    pass",
+    "class A(): pass",
+
+    # calls
+    "f(a, b=1, *c, **d)",
+    "f(b=1, *c)",
+    "f(x for x in y)",
+    "f(\n    a)",
+
+    # literals and comprehensions
+    "[]", "()", "{}", "[1, 2]", "(1,)", "{1: 2, 3: 4}", "{1, 2}", "`a`", "'a' 'b'", "u'a'",
+    "[x for x in y if x for z in x]",
+    "(x for x in y if x if z for w in x)",
+    "{x for x in y}",
+    "{x: y for x, y in z}",
+    "a if b else c",
+    "(a,\n b)",
+]
+
+def compare(code, types=ast.Node):
+    code = '""\n' + code
+    expected = compiler.parse(code)
+    tree = frontend.parse(code, frontend="ast")
+    assert repr(tree) == repr(expected)
+    assert get_linenos(tree, types) == get_linenos(expected, types)
+
+def get_linenos(tree, types):
+    """Returns the classes and lines of the nodes of the given types in tree."""
+    result = []
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, types):
+            result.append((node.__class__.__name__, node.lineno))
+        stack.extend(node.getChildNodes())
+    return result
+
+# some nodes in expressions that span many lines have different lines
+STATEMENTS = (ast.Function, ast.Class, ast.If, ast.For, ast.While, ast.TryExcept, ast.TryFinally,
+    ast.With, ast.Return, ast.Assign, ast.AugAssign, ast.Print, ast.Printnl, ast.Pass)
+
+def test_parse():
+    for code in CASES:
+        yield compare, code
+
+def test_is_outmost():
+    tree = frontend.parse("(x for x in y for z in x)", frontend="ast")
+    quals = tree.node.nodes[0].expr.code.quals
+    assert [q.is_outmost for q in quals] == [True, False]
+
+def test_future():
+    # the ast module treats print as a function with this import
+    code = "from __future__ import print_function\nprint(a, b)"
+    assert repr(frontend.parse(code, frontend="ast")) == repr(compiler.parse(code))
+
+def test_long_chain():
+    # the compiler package and the visitor handle very long chains without recursion
+    code = "x = " + " + ".join("a%d" % i for i in range(5000))
+    assert pyjs.compile(code, frontend="ast") == pyjs.compile(code, frontend="compiler")
+
+def test_samples():
+    path = os.path.join(os.path.dirname(__file__), "test_samples.txt")
+    for py, js in parse_samples(open(path).read()):
+        yield compare, py, STATEMENTS
+
+def test_modules():
+    # the sources of the compiler itself
+    for path in glob.glob(os.path.join(os.path.dirname(__file__), "*.py")):
+        yield compare, open(path).read(), STATEMENTS
+
+def test_compile():
+    code = "def f(a, b):\n    if a: return b;\n    return [x * 2 for x in a if x]"
+    assert pyjs.compile(code, frontend="ast") == pyjs.compile(code, frontend="compiler")
+
+def test_unknown():
+    with pytest.raises(ValueError):
+        frontend.parse("x = 1", frontend="foo")
+    with pytest.raises(ValueError):
+        pyjs.compile("x = 1", frontend="foo")
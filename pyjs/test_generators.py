@@ -0,0 +1,132 @@
+"""Runs generators and comprehensions compiled for both targets with node."""
+import pyjs
+
+import os
+import json
+import subprocess
+from distutils.spawn import find_executable
+
+import pytest
+
+node = find_executable("node")
+if not node:
+    pytest.skip("node is not installed", allow_module_level=True)
+
+RUNTIME = open(os.path.join(os.path.dirname(__file__), "py.js")).read()
+
+# collects the items of an iterator in an array
+COLLECT = """
+function collect(obj) {
+    var it = py.iter(obj), items = [], x;
+    while ((x = it.next()) !== py.stop) {
+        items.push(x);
+    }
+    return items;
+}
+"""
+
+def run(tmpdir, code, expr, target):
+    """Compiles code for target, runs it with node and returns the value of the javascript expr."""
+    js = "var window = {}, nil = null;\n" + RUNTIME + "var py = window.py;\n" + COLLECT
+    js += pyjs.compile(code, target=target)
+    js += "console.log(JSON.stringify(%s));\n" % expr
+
+    path = str(tmpdir.join("test.js"))
+    f = open(path, "w")
+    f.write(js)
+    f.close()
+    return json.loads(subprocess.check_output([node, path]))
+
+@pytest.fixture(params=["es5", "es6"])
+def target(request):
+    return request.param
+
+def test_while(tmpdir, target):
+    code = "def count(n):\n i = 0\n while i < n:\n  yield i\n  i = i + 1"
+    assert run(tmpdir, code, "collect(count(3))", target) == [0, 1, 2]
+
+def test_for(tmpdir, target):
+    code = "\n".join([
+        "def f(a):",
+        "    for x in a:",
+        "        if x == 2:",
+        "            continue",
+        "        elif x == 4:",
+        "            break",
+        "        yield x",
+        "    else:",
+        "        yield 100",
+        "    for i in range(6, 0, -2):",
+        "        yield i",
+        "    return",
+        "    yield -1",
+    ])
+    assert run(tmpdir, code, "[collect(f([1, 2, 3, 4, 5])), collect(f([1, 2]))]", target) == [[1, 3, 6, 4, 2], [1, 100, 6, 4, 2]]
+
+def test_native_loops(tmpdir, target):
+    code = "\n".join([
+        "def f(a):",
+        "    for x in a:",
+        "        t = 0",
+        "        for i in range(x):",
+        "            t = t + i",
+        "        yield t",
+        "        for y in a:",
+        "            pass",
+        "        else:",
+        "            break",
+    ])
+    assert run(tmpdir, code, "collect(f([3, 4]))", target) == [3]
+
+def test_send(tmpdir, target):
+    code = "def acc():\n total = 0\n while True:\n  value = yield total\n  total = total + value"
+    assert run(tmpdir, code, "(function(g) { return [g.next(), g.send(5), g.send(2)]; })(acc())", target) == [0, 5, 7]
+
+def test_pipeline(tmpdir, target):
+    code = "\n".join([
+        "def numbers(n):",
+        "    for i in xrange(n):",
+        "        yield i",
+        "def squares(items):",
+        "    for x in items:",
+        "        yield x * x",
+        "def total(items):",
+        "    t = 0",
+        "    for x in items:",
+        "        t = t + x",
+        "    return t",
+        "result = total(squares(numbers(1000)))",
+    ])
+    assert run(tmpdir, code, "result", target) == sum(i * i for i in range(1000))
+
+def test_genexpr(tmpdir, target):
+    code = "def pairs(a):\n return ([x, y] for x in a if x > 1 for y in a if y < x)"
+    assert run(tmpdir, code, "collect(pairs([1, 2, 3]))", target) == [[2, 1], [3, 1], [3, 2]]
+
+def test_exhausted(tmpdir, target):
+    code = "def f():\n yield 1"
+    assert run(tmpdir, code, "(function(g) { return [g.next(), g.next() === py.stop, g.next() === py.stop]; })(f())", target) == [1, True, True]
+
+def test_comprehensions(tmpdir, target):
+    code = "\n".join([
+        "def f(a, n):",
+        "    b = ['x', 'y']",
+        "    return [",
+        "        [x * 2 for x in range(n)],",
+        "        [x for x in range(10, 0, -3)],",
+        "        [s + s for s in b],",
+        "        [[x, y] for x in a if x > 1 for y in a if y < x],",
+        "        sum(x for x in a), sum([x * x for x in a], 10),",
+        "        any(x > 2 for x in a), all(x > 2 for x in a),",
+        "        max(x for x in a), min(x for x in a),",
+        "        '-'.join(s for s in b),",
+        "    ]",
+    ])
+    assert run(tmpdir, code, "f([1, 2, 3], 3)", target) == [
+        [0, 2, 4], [10, 7, 4, 1], ["xx", "yy"], [[2, 1], [3, 1], [3, 2]],
+        6, 24, True, False, 3, 1, "x-y",
+    ]
+
+def test_empty_max(tmpdir, target):
+    code = "def f(a):\n return max(x for x in a)"
+    assert run(tmpdir, code, "(function() { try { f([]); } catch (e) { return e.message; } })()", target) == "ValueError: max() arg is an empty sequence"
@@ -0,0 +1,97 @@
+import pyjs
+from incremental import IncrementalCompiler, split_statements
+
+def test_split_statements():
+    assert split_statements("") == []
+    assert split_statements("x = 1\ny = 2") == ["x = 1\n", "y = 2"]
+    assert split_statements("# comment\nx = 1\n\n# more\ny = 2\n") == ["# comment\nx = 1\n\n# more\n", "y = 2\n"]
+    assert split_statements("if x:\n    y = 1\nelse:\n    y = 2\nz = 1\n") == ["if x:\n    y = 1\nelse:\n    y = 2\n", "z = 1\n"]
+    assert split_statements("@d\ndef f():\n    pass\n") == ["@d\ndef f():\n    pass\n"]
+    assert split_statements('x = """\nfoo\n"""\ny = (1,\n2)\n') == ['x = """\nfoo\n"""\n', 'y = (1,\n2)\n']
+
+def test_incremental():
+    code = "\n".join([
+        "def f(x):",
+        "    return x",
+        "",
+        "def g(x):",
+        "    y = x * x",
+        "    return y",
+        "",
+        "a = f(1); b = g(2)",
+        "print a, b",
+    ])
+    c = IncrementalCompiler()
+    assert c.compile(code) == pyjs.compile(code)
+    assert (c.reused, c.compiled) == (0, 5)
+
+    assert c.compile(code) == pyjs.compile(code)
+    assert (c.reused, c.compiled) == (5, 0)
+
+    code = code.replace("y = x * x", "y = x + x")
+    assert c.compile(code) == pyjs.compile(code)
+    assert (c.reused, c.compiled) == (4, 1)
+
+    code = code.replace("print a, b", "print a\nprint b")
+    assert c.compile(code) == pyjs.compile(code)
+    assert (c.reused, c.compiled) == (4, 2)
+
+def test_shadowed_builtins():
+    code = "def f():\n    s = 'abc'\n    return len(s)\n"
+    c = IncrementalCompiler()
+    assert c.compile(code) == pyjs.compile(code)
+
+    # a new definition of len changes the code of f
+    code2 = code + "def len(x):\n    return 0\n"
+    assert c.compile(code2) == pyjs.compile(code2)
+    assert c.compile(code) == pyjs.compile(code)
+
+def test_definitions():
+    # calls are resolved with the definitions in the other statements
+    code = "\n".join([
+        "def f(a, b=2):",
+        "    return a + b",
+        "x = f(1, b=3)",
+        "y = f(b=x, a=f(0))",
+        "",
+    ])
+    c = IncrementalCompiler()
+    assert c.compile(code) == pyjs.compile(code)
+    assert "x = f(1, 3);" in c.compile(code)
+
+    # a changed body doesn't change the calls, a changed signature does
+    code2 = code.replace("return a + b", "return a * b")
+    assert c.compile(code2) == pyjs.compile(code2)
+    assert c.compiled == 1
+    code3 = code2.replace("def f(a, b=2):", "def f(a, c=1, b=2):")
+    assert c.compile(code3) == pyjs.compile(code3)
+    assert c.compiled == 3
+
+    # and so does another binding of the name
+    code4 = code3 + "f = None\n"
+    assert c.compile(code4) == pyjs.compile(code4)
+    assert "py.call(f, this, [1], nil, " in c.compile(code4)
+
+def test_class_definitions():
+    code = "\n".join([
+        "class A:",
+        "    def __init__(self, x):",
+        "        self.x = x",
+        "class B(A):",
+        "    def __init__(self, x, y=1):",
+        "        A.__init__(self, x)",
+        "a = A(1)",
+        "b = B(y=2, x=a)",
+        "",
+    ])
+    c = IncrementalCompiler()
+    assert c.compile(code) == pyjs.compile(code)
+    assert "a = new A(1);" in c.compile(code)
+
+    # the attributes of A change the layout of B and so the calls to B
+    code2 = code.replace("self.x = x", "self.x = self.y = x")
+    assert c.compile(code2) == pyjs.compile(code2)
+    assert c.compiled == 4
+    code3 = code2.replace("A.__init__(self, x)", "A.__init__(self, y)")
+    assert c.compile(code3) == pyjs.compile(code3)
+    assert c.compiled == 1
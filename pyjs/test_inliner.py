@@ -0,0 +1,57 @@
+import pyjs
+import inliner
+
+CODE = """
+def square(x):
+    return x * x
+
+def norm(x, y=1):
+    return square(x) + square(y)
+"""
+
+def compile(code, inline=inliner.DEFAULT_BUDGET, optimize=0):
+    js = pyjs.compile(CODE + code, inline=inline, optimize=optimize)
+    return js.strip().splitlines()[-1]
+
+def test_inline():
+    assert compile("a = square(2)") == "a = (2 * 2);"
+    assert compile("a = square(x)") == "a = (x * x);"
+    assert compile("a = norm(x)") == "a = ((x * x) + (1 * 1));"
+    assert compile("a = norm(y=x, x=2)") == "a = ((2 * 2) + (x * x));"
+    assert compile("a = norm(2)", optimize=1) == "a = 5;"
+
+def test_arguments():
+    # the arguments are evaluated once and in order
+    assert compile("a = square(f())") == "a = ($a0 = f(), $a0 * $a0);"
+    assert compile("a = norm(x, f())") == "a = ($a0 = x, $a1 = f(), ($a0 * $a0) + ($a1 * $a1));"
+    assert compile("a = norm(f(), x)") == "a = ($a0 = f(), ($a0 * $a0) + (x * x));"
+
+def test_not_inlined():
+    assert compile("a = square(*x)") == "a = py.call(square, this, [], x, nil);"
+    assert compile("a = square(f)", inline=2) == "a = square(f);"
+    assert "return square(1);" in pyjs.compile(CODE + "def f(square):\n    return square(1)", inline=20)
+
+    code = "\n".join([
+        "def fact(n):",
+        "    return n and n * fact(n - 1)",
+        "def log(x):",
+        "    return f(x)",
+        "def get(x):",
+        "    return x.y",
+        "def twice(x):",
+        "    return square(x)",
+        "def twice(x):",
+        "    return x + x",
+        "a = [fact(1), log(1), get(x), twice(1)]",
+    ])
+    assert compile(code) == 'a = [fact(1), log(1), (py.getattr(x, "y")), twice(1)];'
+
+def test_report():
+    inl = inliner.Inliner()
+    pyjs.compile(CODE + "a = norm(2)", inline=inl)
+    assert inl.report() == [
+        {"line": 6, "function": "square", "caller": "norm", "size": 3},
+        {"line": 6, "function": "square", "caller": "norm", "size": 3},
+        {"line": 7, "function": "norm", "caller": "<module>", "size": 9},
+    ]
+    assert inliner.format_report(inl.report()).splitlines()[-1].split() == ["7", "norm", "<module>", "9"]
@@ -0,0 +1,80 @@
+import ir
+import frontend
+import optimizer
+import pyjs
+from compiler import ast
+
+def test_classes():
+    for cls in ast.nodes.values():
+        if isinstance(cls, str):
+            continue
+        node_class = ir.CLASSES[cls]
+        assert node_class.__name__ == cls.__name__
+        assert issubclass(node_class, cls)
+        assert getattr(ir, cls.__name__) is node_class
+        assert node_class in ir.NODES
+
+def test_slots():
+    node = ir.Function(None, "f", ("a",), (), 0, None, ir.Stmt([]), lineno=1)
+    assert repr(node) == repr(ast.Function(None, "f", ("a",), (), 0, None, ast.Stmt([])))
+    assert node.varargs is None and node.lineno == 1
+
+    # no dict unless an attribute that is not in the slots is set
+    node.name = "g"
+    assert vars(node) == {}
+
+def test_attributes():
+    node = ir.Getattr(ir.Name("a"), "b")
+    assert dict(ir.attributes(node)) == {"expr": node.expr, "attrname": "b", "lineno": None}
+    node = ast.Getattr(ast.Name("a"), "b")
+    assert dict(ir.attributes(node)) == {"expr": node.expr, "attrname": "b", "lineno": None}
+
+def test_get_child_nodes():
+    items = [ir.Name("a"), ir.Tuple([ir.Name("b")])]
+    for cls in [ir.Stmt, ir.List, ir.Tuple, ir.And, ir.Bitor]:
+        assert cls(items).getChildNodes() == tuple(items)
+
+def test_with_ir_classes():
+    table = ir.with_ir_classes({ast.Add: "+"})
+    assert table == {ast.Add: "+", ir.Add: "+"}
+
+def test_frontend():
+    tree = frontend.parse("x = [a + 1, f(*b)]", frontend="ast")
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        assert type(node) in ir.NODES
+        stack.extend(node.getChildNodes())
+
+def test_optimize():
+    # the optimizer replaces children in the slots of IR nodes
+    code = "x = f(1 + 2, -(3), a[4 * 5])"
+    tree = optimizer.optimize(frontend.parse(code, frontend="ast"), 1)
+    assert repr(tree) == repr(optimizer.optimize(frontend.parse(code, frontend="compiler"), 1))
+    assert pyjs.compile(code, optimize=1, frontend="ast") == pyjs.compile(code, optimize=1, frontend="compiler")
+
+def test_no_dict():
+    # the passes create IR nodes and set no attributes outside the slots
+    import scope
+    import inliner
+    code = "\n".join([
+        "def f(a, b=1):",
+        "    return a * b",
+        "def g(xs):",
+        "    for i in range(0, len(xs), 2 - 1):",
+        "        if 0: yield i",
+        "        yield f(i, b=2) + (x for x in xs if x).next()",
+        "class A:",
+        "    def __init__(self, x):",
+        "        self.x = [2 * 3, -1, x]",
+        "y = f(b=g(1), a=2) if 1 + 1 else None",
+    ])
+    tree = frontend.parse('""\n' + code, frontend="ast")
+    tree = inliner.Inliner(20).inline(tree, 1)
+    tree = optimizer.optimize(tree, 2)
+    pyjs.Visitor(scope.analyze(tree), inline_caches=True).visit(tree)
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        assert type(node) in ir.NODES and vars(node) == {}, node
+        stack.extend(node.getChildNodes())
@@ -0,0 +1,53 @@
+import pyjs
+
+def compile(code, level):
+    js = pyjs.compile(code, optimize=level).strip()
+    return js.replace("\n", " ").replace("  ", " ")
+
+def test_level0():
+    assert compile("x = 60 * 60 * 24", 0) == "x = 60 * 60 * 24;"
+
+def test_fold_arithmetic():
+    assert compile("x = 60 * 60 * 24", 1) == "x = 86400;"
+    assert compile("x = (1 + 2) * y", 1) == "x = 3 * y;"
+    assert compile("x = 7 / 2", 1) == "x = 3;"
+    assert compile("x = 7 / 2.0", 1) == "x = 3.5;"
+    assert compile("x = -(1 + 1)", 1) == "x = -2;"
+    assert compile("x = 1 << 4 | 1", 1) == "x = 17;"
+
+def test_no_fold():
+    # errors are left to runtime
+    assert compile("x = 1.0 / 0", 1) == "x = 1.0 / 0;"
+    # numbers that can't be represented exactly in javascript
+    assert compile("x = 1073741824 * 1073741824", 1) == "x = 1073741824 * 1073741824;"
+    assert compile("x = 1 + 'a'", 1) == 'x = 1 + "a";'
+
+def test_fold_strings():
+    assert compile("x = 'a' + 'b'", 1) == 'x = "ab";'
+    assert compile("x = 'a' + 'b' + y", 1) == 'x = "ab" + y;'
+
+def test_fold_boolean():
+    assert compile("x = not 0", 1) == "x = true;"
+    assert compile("x = not None", 1) == "x = true;"
+    assert compile("x = 1 and y", 1) == "x = y;"
+    assert compile("x = y and 0 and z", 1) == "x = y && 0;"
+    assert compile("x = y and 1", 1) == "x = y && 1;"
+    assert compile("x = 0 or y", 1) == "x = y;"
+    assert compile("x = y or True or z", 1) == "x = y || true;"
+
+def test_dead_code():
+    assert compile("if False:\n    debug()\nx = 1", 1) == "if (false) { debug() } x = 1;"
+    assert compile("if False:\n    debug()\nx = 1", 2) == "x = 1;"
+    assert compile("if 0: a = 1\nelif x: a = 2\nelse: a = 3", 2) == "if (x) { a = 2; } else { a = 3; }"
+    assert compile("if x: a = 1\nelif 1: a = 2\nelse: a = 3", 2) == "if (x) { a = 1; } else { a = 2; }"
+    assert compile("if 1: a = 1\nelse: a = 2", 2) == "a = 1;"
+    assert compile("while False: a = 1", 2) == ""
+    assert compile("while 0: a = 1\nelse: a = 2", 2) == "a = 2;"
+    assert compile("def f(x):\n    return x\n    x = 1", 2) == 'function f(x) { return x; } py.signature(f, ["x"]);'
+    assert compile("while x:\n    break\n    x = 1", 2) == "while (x) { break; }"
+
+def test_dead_yield():
+    # a yield that is never executed still makes the function a generator
+    for code in ["def g():\n    return\n    yield 1", "def g():\n    if 0:\n        yield 1", "def g():\n    while 0:\n        yield 1"]:
+        assert compile(code, 2) == compile(code, 0)
+        assert "function g() { return nil; }" not in compile(code, 2)
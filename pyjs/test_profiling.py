@@ -0,0 +1,45 @@
+import pyjs
+import profiling
+
+CODE = """
+def f(x):
+    return x + 1 + 2
+
+y = f(1)
+"""
+
+def test_report():
+    js, report = pyjs.compile(CODE, profile=True)
+    assert js == pyjs.compile(CODE)
+    assert sorted(report["phases"]) == ["codegen", "optimize", "parse", "scope"]
+
+    nodes = report["nodes"]
+    assert nodes["Function"]["calls"] == 1
+    assert nodes["Add"]["calls"] == 2
+    assert nodes["Name"]["calls"] == 2
+    assert nodes["Module"]["bytes"] == len(js)
+
+    # nested nodes of the same type are counted once in cumulative values
+    assert nodes["Add"]["bytes"] == len("x + 1 + 2")
+    assert nodes["Add"]["self_bytes"] == len(" + ") * 2
+    assert sum(stats["self_bytes"] for stats in nodes.values()) == len(js)
+
+    for stats in nodes.values():
+        assert 0 <= stats["self"] <= stats["cumulative"]
+
+def test_profiler():
+    profiler = profiling.Profiler()
+    js = pyjs.compile(CODE, profile=profiler)
+    js = pyjs.compile(CODE, profile=profiler)
+    assert profiler.report()["nodes"]["Function"]["calls"] == 2
+    assert profiler.stack == []
+
+def test_format_report():
+    js, report = pyjs.compile(CODE, profile=True)
+    report = profiling.merge_reports([report, report])
+    assert report["nodes"]["Function"]["calls"] == 2
+
+    lines = profiling.format_report(report).splitlines()
+    assert lines[0].split() == ["phase", "time"]
+    assert [line.split()[0] for line in lines[1:6]] == ["parse", "optimize", "scope", "codegen", "total"]
+    assert "Function" in [line.split()[0] for line in lines[8:]]
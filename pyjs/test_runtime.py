@@ -1,9 +1,25 @@
-"""Tests the runtime using python-spidermonkey.
+"""Tests the runtime using python-spidermonkey or node.
 """
 import pyjs
 
+import os
+import json
+import subprocess
+from distutils.spawn import find_executable
+
 import pytest
-spidermonkey = pytest.importorskip("spidermonkey")
+
+try:
+    import spidermonkey
+except ImportError:
+    spidermonkey = None
+
+needs_spidermonkey = pytest.mark.skipif(spidermonkey is None, reason="python-spidermonkey is not installed")
+
+node = find_executable("node")
+needs_node = pytest.mark.skipif(not node, reason="node is not installed")
+
+RUNTIME = os.path.join(os.path.dirname(__file__), "py.js")
 
 def jseval(code, **env):
     """Compiles the given python code and executes the generated javascript code in the given environment.
@@ -11,22 +27,309 @@ def jseval(code, **env):
     ctx = spidermonkey.Runtime().new_context()
     for k, v in env.items():
         ctx.add_global(k, v)
-    
+
     jscode = pyjs.compile(code)
     print jscode.strip()
     return ctx.execute(jscode)
-    
+
+def run(tmpdir, code, expr, setup="", **options):
+    """Compiles code with the given options, runs it with the runtime in 
+    node after the javascript setup and returns the value of the javascript 
+    expr.
+    """
+    js = "var py = require(%s);\n" % json.dumps(RUNTIME)
+    js += setup + pyjs.compile(code, **options)
+    js += "console.log(JSON.stringify(%s));\n" % expr
+
+    path = str(tmpdir.join("test.js"))
+    f = open(path, "w")
+    f.write(js)
+    f.close()
+    return json.loads(subprocess.check_output([node, path]))
+
+def error(f):
+    """Returns javascript for the message of the error raised by the javascript function f."""
+    return "(function() { try { (%s)(); } catch (e) { return e.message; } })()" % f
+
+@needs_spidermonkey
 def test_binary_operations():
     assert jseval("5 + 2") == 7
     assert jseval("5 - 2") == 3
     assert jseval("5 * 2") == 10
     assert jseval("5 / 2") == 2
-    
+
+@needs_spidermonkey
 def test_assignment():
     assert jseval("a = 1; b = a+a; b") == 2
-    
+
+@needs_spidermonkey
 def test_functions():
     double = jseval("def double(x): return x+x\ndouble")
     assert double(0) == 0
     assert double(1) == 2
     assert double(1.2) == 2.4
+
+@needs_node
+def test_dict(tmpdir):
+    code = "d = {'a': 1, 2: 'b', (1, 'x'): 3, True: 4}"
+    assert run(tmpdir, code, "py.repr(d)") == "{'a': 1, 2: 'b', (1, 'x'): 3, True: 4}".replace("(1, 'x')", "[1, 'x']")
+    assert run(tmpdir, code, "[d.__getitem__([1, 'x']), d.get(1), d.get('2', 0), d.__len__()]") == [3, 4, 0, 4]
+
+    # tuples are equal by value and don't collide with strings
+    assert run(tmpdir, code, "[d.__contains__([1, 'x']), d.__contains__('(1,\"x\")'), d.__contains__([1, 'y'])]") == [True, False, False]
+    assert run(tmpdir, code, "(d.__delitem__([1, 'x']), d.pop(2), d.keys())") == ["a", True]
+    assert run(tmpdir, code, error("function() { d.__getitem__('z'); }")) == "KeyError: 'z'"
+
+@needs_node
+def test_dict_methods(tmpdir):
+    code = "d = {'a': 1}"
+    assert run(tmpdir, code, "(d.setdefault('b', 2), d.update(py.dict([['c', 3]])), d.items())") == [["a", 1], ["b", 2], ["c", 3]]
+    assert run(tmpdir, code, "[d.copy().__eq__(d), d.__eq__(py.dict()), d.values()]") == [True, False, [1]]
+
+@needs_node
+def test_iter(tmpdir):
+    code = "\n".join([
+        "def collect(items):",
+        "    result = []",
+        "    for x in items:",
+        "        result.append(x)",
+        "    return result",
+    ])
+    assert run(tmpdir, code, "collect([1, 2])") == [1, 2]
+    assert run(tmpdir, code, "collect('ab')") == ["a", "b"]
+    assert run(tmpdir, code, "collect(py.dict([['a', 1], [[1, 2], 2]]))") == ["a", [1, 2]]
+    assert run(tmpdir, code, "collect(py.dict([['a', 1]]).iteritems())") == [["a", 1]]
+    assert run(tmpdir, code, "collect(new Set([3, 4]))") == [3, 4]
+    assert run(tmpdir, code, "collect({x: 1})") == ["x"]
+
+@needs_node
+def test_in(tmpdir):
+    code = "def f(a, b): return a in b"
+    assert run(tmpdir, code, "[f(2, [1, 2]), f(3, [1, 2]), f(true, [1]), f(1, [true]), f([1, 2], [[1, 2]]), f([1], [[2]])]") \
+        == [True, False, True, True, True, False]
+    assert run(tmpdir, code, "[f('b', 'abc'), f('ac', 'abc'), f('a', py.dict([['a', 1]])), f([1], py.dict([[[1], 1]]))]") \
+        == [True, False, True, True]
+    assert run(tmpdir, code, error("function() { f(1, 'abc'); }")) == "TypeError: 'in <string>' requires string as left operand"
+
+@needs_node
+def test_floordiv(tmpdir):
+    code = "def f(a, b): return a // b"
+    assert run(tmpdir, code, "[f(7, 2), f(-7, 2), f(7.5, 2)]") == [3, -4, 3]
+    assert run(tmpdir, code, error("function() { f(1, 0); }")).startswith("ZeroDivisionError")
+
+@needs_node
+def test_repr(tmpdir):
+    code = "def f(x): return `x`"
+    assert run(tmpdir, code, "[f(nil), f(true), f(1), f(1.5), f('a'), f(\"it's\"), f('a\\n'), f([1, ['b']])]") \
+        == ["None", "True", "1", "1.5", "'a'", '"it\'s"', "'a\\n'", "[1, ['b']]"]
+
+@needs_node
+def test_print(tmpdir):
+    code = "print 'a', 1,\nprint 'b'\nprint 'c\\n',\nprint 'd'"
+    setup = "var out = ''; py.stdout = {write: function(s) { out += s; }};\n"
+    assert run(tmpdir, code, "out", setup) == "a 1 b\nc\nd\n"
+
+@needs_node
+def test_assert(tmpdir):
+    code = "def f(x):\n    assert x, 'empty'"
+    assert run(tmpdir, code, error("function() { f([]); }")) == "AssertionError: empty"
+    assert run(tmpdir, code, "f([1]) === undefined") is True
+
+@needs_node
+def test_getattr(tmpdir):
+    code = "d = {'a': 1}\nget = d.get"
+    assert run(tmpdir, code, "get('a')") == 1
+    assert run(tmpdir, code, error("function() { py.getattr(d, 'foo'); }")) == "AttributeError: foo"
+
+@needs_node
+def test_list_and_str_methods(tmpdir):
+    # the types of xs and s are not known at module level
+    code = "\n".join([
+        "xs = [3, 1]",
+        "xs.append(2)",
+        "xs.extend((4, 0))",
+        "a = xs.pop(0)",
+        "xs.sort(reverse=True)",
+        "s = ' a, b ,c '",
+        "b = [x.strip() for x in s.split(',')]",
+        "c = '-'.join(b).upper()",
+        "d = s.split(None, 1)",
+        "e = [s.find('b'), s.count(','), s.replace(' ', ''), 'abc'.startswith(('x', 'a'))]",
+    ])
+    assert run(tmpdir, code, "[a, xs, b, c, d, e]") == [3, [4, 2, 1, 0], ["a", "b", "c"], "A-B-C", ["a,", "b ,c "],
+        [4, 2, "a,b,c", True]]
+    assert run(tmpdir, code, error("function() { py.getattr([], 'pop')(); }")) == "IndexError: pop from empty list"
+    assert run(tmpdir, code, error("function() { py.getattr([1], 'remove')(2); }")) == "ValueError: 2 is not in list"
+
+@needs_node
+def test_make_args(tmpdir):
+    code = "def f(a, b, c): return [a, b, c]\ndef g(args): return f(1, *args)"
+    assert run(tmpdir, code, "[py.call(f, this, [1], [2, 3], nil), g([5, 6])]") == [[1, 2, 3], [1, 5, 6]]
+    assert run(tmpdir, code, "py.call(f, this, [1], py.iter([2, 3]), py.dict())") == [1, 2, 3]
+
+    # calls that are not resolved at compile time use the signature of the function
+    code = "\n".join([
+        "def f(a, b=2, *args, **kw):",
+        "    return [a, b, args, kw.items()]",
+        "def k(a, b):",
+        "    return [a, b]",
+        "class A:",
+        "    def __init__(self, x, y=0):",
+        "        self.s = x + y",
+        "    def m(self, z=1):",
+        "        return self.s + z",
+        "def call(g, *args, **kw):",
+        "    return g(*args, **kw)",
+    ])
+    expr = "[call(f, [1], py.dict()), call(f, [1, 3, 4], py.dict([['c', 5]])), call(k, [], py.dict([['b', 1], ['a', 0]])), " \
+        "call(A, [1], py.dict([['y', 2]])).s, call(py.getattr(A(1, 0), 'm'), [], py.dict([['z', 3]])), call(py.getattr(A, 'm'), [A(2, 0)], py.dict())]"
+    assert run(tmpdir, code, expr) == [[1, 2, [], []], [1, 3, [4], [["c", 5]]], [0, 1], 3, 4, 3]
+    assert run(tmpdir, code, error("function() { call(k, [1], py.dict([['a', 2]])); }")) == "TypeError: k() got multiple values for keyword argument 'a'"
+    assert run(tmpdir, code, error("function() { call(k, [1], py.dict([['c', 2]])); }")) == "TypeError: k() got an unexpected keyword argument 'c'"
+    assert run(tmpdir, code, error("function() { call(k, [1, 2, 3], py.dict()); }")) == "TypeError: k() takes at most 2 arguments (3 given)"
+    assert run(tmpdir, code, error("function() { call(k, [], py.dict([['b', 1]])); }")) == "TypeError: k() takes at least 2 arguments"
+    assert run(tmpdir, code, error("function() { call(Math.max, [], py.dict([['b', 1]])); }")) == "TypeError: max() takes no keyword arguments"
+
+@needs_node
+def test_resolved_call(tmpdir):
+    code = "\n".join([
+        "def f(a, b=2, *args, **kw):",
+        "    return [a, b, args, kw.items()]",
+        "x = f(b=1, a=0)",
+        "y = f(0, 1, 2, c=3)",
+    ])
+    assert run(tmpdir, code, "[x, y]") == [[0, 1, [], []], [0, 1, [2], [["c", 3]]]]
+
+    # the keyword arguments are evaluated in the order of the call
+    code = "\n".join([
+        "n = 0",
+        "def f(a, b):",
+        "    return [a, b]",
+        "def g():",
+        "    global n",
+        "    n = n + 1",
+        "    return n",
+        "x = f(b=g(), a=n)",
+    ])
+    assert run(tmpdir, code, "x") == [1, 1]
+
+@needs_node
+def test_inline_caches(tmpdir):
+    code = "def get(o): return o.x\ndef keys(o): return o.keys()"
+    setup = "function C() { this.x = 3; }\n"
+    expr = "[get({x: 1}), get({x: 2}), keys(py.dict([['k', 1]])), keys(py.dict()), get(new C()), py.cache_stats()]"
+    assert run(tmpdir, code, expr, setup, inline_caches=True) == [1, 2, ["k"], [], 3, [
+        {"site": "1:x", "name": "x", "hits": 1, "misses": 2, "classes": 2, "megamorphic": False},
+        {"site": "2:keys", "name": "keys", "hits": 1, "misses": 1, "classes": 1, "megamorphic": False},
+    ]]
+
+    # a site that sees more than 4 classes is megamorphic
+    setup = "function objects() { return [1, 2, 3, 4, 5].map(function(i) { return new (function() { this.x = i; })(); }); }\n"
+    expr = "[objects().map(get), objects().map(get), py.cache_stats()[0].megamorphic]"
+    assert run(tmpdir, code, expr, setup, inline_caches=True) == [[1, 2, 3, 4, 5], [1, 2, 3, 4, 5], True]
+
+    # misses raise AttributeError and own functions are not bound
+    assert run(tmpdir, code, error("function() { get({}); }"), inline_caches=True) == "AttributeError: x"
+    own = "(function() { var o = {x: function() {}}; get({x: 1}); return get(o) === o.x; })()"
+    assert run(tmpdir, code, own, inline_caches=True) is True
+
+@needs_node
+def test_classes(tmpdir):
+    code = "\n".join([
+        "class A:",
+        "    n = 0",
+        "    def __init__(self, x, y=1):",
+        "        self.x = x",
+        "        self.y = y",
+        "    def sum(self):",
+        "        return self.x + self.y",
+        "class B(A):",
+        "    __slots__ = ('x', 'y', 'z')",
+        "    def __init__(self, x):",
+        "        A.__init__(self, x, y=2)",
+        "        self.z = 3",
+        "    def sum(self):",
+        "        return A.sum(self) + self.z",
+        "class P(object):",
+        "    __slots__ = ['x']",
+        "    def __init__(self, x):",
+        "        self.x = x",
+        "        self.y = 1",
+        "def make(cls, *args):",
+        "    return cls(*args)",
+    ])
+    expr = "[A(1, 1).sum(), B(1).sum(), make(B, [2]).sum(), make(A, [1, 1]) instanceof A, py.getattr(A, 'n'), py.getattr(A, 'sum')(B(0))]"
+    assert run(tmpdir, code, expr) == [2, 6, 7, True, 0, 2]
+
+    # the instances have the same attributes in the same order
+    assert run(tmpdir, code, "[Object.keys(A(1, 1)), Object.keys(B(1)), Object.keys(make(B, [1]))]") == [["x", "y"], ["x", "y", "z"], ["x", "y", "z"]]
+    assert run(tmpdir, code, "[Object.isSealed(P(1)), P(1).y, Object.isSealed(B(1))]") == [True, None, False]
+
+@needs_node
+def test_decorated_methods(tmpdir):
+    code = "\n".join([
+        "def twice(f):",
+        "    def g(self, y):",
+        "        return f(self, y) * 2",
+        "    return g",
+        "class A:",
+        "    def __init__(self, x):",
+        "        self.x = x",
+        "    @staticmethod",
+        "    def s(a, b):",
+        "        return a + b",
+        "    @classmethod",
+        "    def c(cls, x):",
+        "        return cls(x)",
+        "    @twice",
+        "    def t(self, y):",
+        "        return self.x + y",
+        "class B(A):",
+        "    pass",
+    ])
+    expr = ("[A(1).s(1, 2), py.getattr(A, 's')(1, 3), py.call(py.getattr(A, 's'), null, [1], null, py.dict([['b', 4]])), "
+        "A(1).t(2), py.getattr(A, 't')(A(2), 1), A(1).c(3).x, py.getattr(A, 'c')(4).x, py.getattr(B, 'c')(5) instanceof B]")
+    assert run(tmpdir, code, expr) == [3, 4, 5, 6, 6, 3, 4, True]
+
+@needs_node
+def test_inline(tmpdir):
+    code = "\n".join([
+        "def square(x):",
+        "    return x * x",
+        "def add(x, y):",
+        "    return y + x",
+        "a = [square(f(3)), add(f(1), f(2))]",
+    ])
+    # the arguments are evaluated once and in order
+    setup = "var calls = []; function f(x) { calls.push(x); return x; }\n"
+    assert run(tmpdir, code, "[a, calls]", setup, inline=20) == [[9, 3], [3, 1, 2]]
+
+@needs_node
+def test_unpack(tmpdir):
+    code = "\n".join([
+        "def first(d):",
+        "    for k, v in d.iteritems():",
+        "        return [k, v]",
+        "def pair(items):",
+        "    a, b = items",
+        "    return [a, b]",
+        "def count():",
+        "    i = 0",
+        "    while True:",
+        "        yield i",
+        "        i += 1",
+    ])
+    assert run(tmpdir, code, "[first(py.dict([['a', 1]])), pair(py.dict([['a', 1], ['b', 2]])), pair('xy'), pair(new Set([1, 2]))]") \
+        == [["a", 1], ["a", "b"], ["x", "y"], [1, 2]]
+    assert run(tmpdir, code, error("function() { pair(count()); }")) == "ValueError: too many values to unpack"
+    assert run(tmpdir, code, error("function() { pair(py.dict([['a', 1]])); }")) == "ValueError: need more than 1 value to unpack"
+
+@needs_node
+def test_range_step(tmpdir):
+    code = "def f(a, b, s):\n    result = []\n    for i in range(a, b, s):\n        result.append(i)\n    return result"
+    assert run(tmpdir, code, "[f(0, 5, 2), f(5, 0, -2)]") == [[0, 2, 4], [5, 3, 1]]
+    assert run(tmpdir, code, error("function() { f(0, 5, 0); }")) == "ValueError: range() step argument must not be zero"
+    assert run(tmpdir, "def g():\n    for i in range(0, 5, 0):\n        pass", error("g")) == "ValueError: range() step argument must not be zero"
+    assert run(tmpdir, "def g():\n    return [i for i in range(0, 5, 0)]", error("g")) == "ValueError: range() step argument must not be zero"
+    code = "def g(s):\n    for i in range(0, 5, s):\n        yield i"
+    assert run(tmpdir, code, error("function() { py.iter(g(0)).next(); }")) == "ValueError: range() step argument must not be zero"
@@ -0,0 +1,50 @@
+import compiler
+from scope import analyze
+
+def get_scopes(code):
+    tree = compiler.parse(code)
+    scopes = analyze(tree)
+    return dict((getattr(node, "name", None), s) for node, s in scopes.items())
+
+def test_locals():
+    s = get_scopes("def f(a, b=1):\n c = a\n d, (e, a) = b\n for i in c: g += 1\n import x.y\n def h(): pass")["f"]
+    assert s.args == ["a", "b"]
+    assert s.locals == ["c", "d", "e", "i", "g", "x", "h"]
+    assert s.defs == ["h"]
+
+def test_globals():
+    s = get_scopes("def f(a):\n x = a\n global x, y\n y = 1\n z = 2")["f"]
+    assert s.globals == ["x", "y"]
+    assert s.get_vars() == ["z"]
+
+def test_nested_functions():
+    scopes = get_scopes("\n".join([
+        "def f(a):",
+        "    b = 1",
+        "    def g():",
+        "        def h():",
+        "            return a + b + c + len",
+        "        return h",
+        "    return g",
+        "c = 1",
+    ]))
+    assert scopes["f"].locals == ["b", "g"]
+    assert scopes["f"].free == []
+    assert scopes["g"].free == ["a", "b"]
+    assert scopes["h"].free == ["a", "b"]
+    assert scopes[None].locals == ["f", "c"]
+
+def test_generators():
+    scopes = get_scopes("def f(a):\n yield a\ndef g(a):\n def h(): yield 1\n return h")
+    assert scopes["f"].generator
+    assert not scopes["g"].generator
+    assert scopes["h"].generator
+
+def test_class_scope():
+    scopes = get_scopes("def f():\n x = 1\n class A:\n  x = 2\n  def g(self): return x")
+    assert scopes["A"].locals == ["x", "g"]
+    assert scopes["g"].free == ["x"]
+
+def test_deep_nesting():
+    code = "x = " + " + ".join(["a"] * 5000)
+    assert get_scopes(code)[None].uses == ["a"]
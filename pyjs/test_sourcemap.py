@@ -0,0 +1,65 @@
+import pyjs
+from sourcemap import encode_vlq, decode_vlq, SourceMap
+
+import json
+
+def test_vlq():
+    assert encode_vlq(0) == "A"
+    assert encode_vlq(1) == "C"
+    assert encode_vlq(-1) == "D"
+    assert encode_vlq(15) == "e"
+    assert encode_vlq(16) == "gB"
+    assert encode_vlq(123) == "2H"
+
+    values = [0, 1, -1, 16, -17, 123456, -98765]
+    assert decode_vlq("".join(encode_vlq(v) for v in values)) == values
+
+def test_mappings():
+    m = SourceMap("a.py")
+    m.add(0, 0, 0, 0, "f")
+    m.add(0, 10, 1)
+    m.add(2, 4, 3)
+    assert m.get_mappings() == "AAAAA,UACA;;IAEA"
+    assert m.to_dict() == {"version": 3, "sources": ["a.py"], "names": ["f"], "mappings": "AAAAA,UACA;;IAEA"}
+
+    assert m.lookup(0, 0) == (0, "f")
+    assert m.lookup(0, 12) == (1, None)
+    assert m.lookup(1, 0) is None
+    assert m.lookup(2, 5) == (3, None)
+
+    m2 = SourceMap.from_dict(json.loads(m.to_json()))
+    assert m2.segments == m.segments
+
+CODE = """def square(x):
+    y = x * x
+    return y
+
+z = square(2)
+"""
+
+def find(js, text):
+    """Returns the (line, column) of text in js."""
+    offset = js.index(text)
+    line = js.count("\n", 0, offset)
+    return line, offset - (js.rfind("\n", 0, offset) + 1)
+
+def lookup(js, smap, text):
+    return SourceMap.from_dict(json.loads(smap)).lookup(*find(js, text))
+
+def test_compile():
+    js, smap = pyjs.compile(CODE, source_map=True, filename="square.py")
+    assert js == pyjs.compile(CODE)
+    assert json.loads(smap)["sources"] == ["square.py"]
+    assert json.loads(smap)["names"] == ["square"]
+
+    assert lookup(js, smap, "function square") == (0, "square")
+    assert lookup(js, smap, "y = x * x") == (1, None)
+    assert lookup(js, smap, "return y") == (2, None)
+    assert lookup(js, smap, "z = square(2)") == (4, None)
+
+def test_minify():
+    js, smap = pyjs.compile(CODE, source_map=True, minify=True)
+    assert js == 'function square(a){var b;b=a*a;return b;}py.signature(square,["x"]);z=square(2);'
+    assert lookup(js, smap, "b=a*a") == (1, None)
+    assert lookup(js, smap, "return b") == (2, None)
+    assert lookup(js, smap, "z=square") == (4, None)
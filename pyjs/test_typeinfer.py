@@ -0,0 +1,40 @@
+import compiler
+from scope import analyze
+from typeinfer import TypeInference, INT, FLOAT, NUMBER, STR, LIST, DICT
+
+def infer(code):
+    tree = compiler.parse(code)
+    scopes = analyze(tree)
+    for node, s in scopes.items():
+        if getattr(node, "name", None) == "f":
+            return TypeInference().get_env(s)
+
+def test_literals():
+    assert infer("def f(): a = 1; b = 1.5; c = 'x'; d = []; e = {}; g = None") == dict(
+        a=INT, b=FLOAT, c=STR, d=LIST, e=DICT)
+
+def test_arithmetic():
+    env = infer("def f(x): a = 1; b = a * 2 + 1; c = b / 2; d = b / 2.0; e = a + x; g = 'a' * b")
+    assert env == dict(a=INT, b=INT, c=INT, d=FLOAT, g=STR)
+
+    # a /= 2 is compiled to the javascript /=, which gives a float
+    assert infer("def f():\n a = 7\n a /= 2\n b = 7\n b *= 2") == dict(a=NUMBER, b=INT)
+
+def test_join():
+    assert infer("def f():\n a = 1\n if a: a = 1.5") == dict(a=NUMBER)
+    assert infer("def f():\n a = 1\n if a: a = 'x'") == {}
+    assert infer("def f(x):\n a = 1\n a = x") == {}
+
+def test_loops():
+    assert infer("def f(n):\n s = 0\n for i in range(n): s += i") == dict(s=INT, i=INT)
+    assert infer("def f(n):\n s = 0\n for i in n: s += i") == {}
+    assert infer("def f(n):\n for c in 'abc': pass") == dict(c=STR)
+
+def test_builtins():
+    assert infer("def f(x): a = len(x); b = str(x); c = x.upper()") == dict(a=INT, b=STR)
+    assert infer("def f(x): s = str(x); a = s.upper(); b = s.split(',')") == dict(s=STR, a=STR, b=LIST)
+    # shadowed builtins
+    assert infer("def f(x, len): a = len(x)") == {}
+
+def test_cycles():
+    assert infer("def f():\n a = 1\n while a: b = a + 1; a = b") == dict(a=INT, b=INT)
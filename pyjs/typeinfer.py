@@ -0,0 +1,233 @@
+"""Local type inference.
+
+Infers the types of the local variables of functions from the values
+assigned to them, so that the compiler can use native javascript operations
+instead of calls to the runtime when the types are known.
+
+A variable has a type only if every value assigned to it in the function
+has that type. Arguments, globals and variables of enclosing functions are
+never typed.
+"""
+from compiler import ast
+import ir
+
+INT = "int"
+FLOAT = "float"
+NUMBER = "number" # int or float
+STR = "str"
+LIST = "list"
+DICT = "dict"
+
+NUMERIC_TYPES = (INT, FLOAT, NUMBER)
+
+# types of the values returned by builtin functions
+BUILTIN_TYPES = {
+    "int": INT,
+    "len": INT,
+    "ord": INT,
+    "float": FLOAT,
+    "str": STR,
+    "repr": STR,
+    "chr": STR,
+    "list": LIST,
+    "range": LIST,
+    "sorted": LIST,
+    "dict": DICT,
+}
+
+# types of the values returned by methods of str
+STR_METHODS = {
+    "upper": STR,
+    "lower": STR,
+    "strip": STR,
+    "lstrip": STR,
+    "rstrip": STR,
+    "join": STR,
+    "replace": STR,
+    "find": INT,
+    "count": INT,
+    "split": LIST,
+}
+
+# builtins that are compiled specially when they are not shadowed
+KNOWN_BUILTINS = set(BUILTIN_TYPES) | set(["xrange"])
+
+# marker for variables whose type is not computed yet
+PENDING = object()
+
+def join(t1, t2):
+    """Returns the type of a variable that can be of type t1 or t2."""
+    if t1 is PENDING:
+        return t2
+    elif t2 is PENDING or t1 == t2:
+        return t1
+    elif t1 in NUMERIC_TYPES and t2 in NUMERIC_TYPES:
+        return NUMBER
+    else:
+        return None
+
+def numeric(t1, t2):
+    """Returns the type of an arithmetic operation on numbers of types t1 and t2."""
+    if t1 == t2 == INT:
+        return INT
+    elif FLOAT in (t1, t2):
+        return FLOAT
+    else:
+        return NUMBER
+
+class TypeInference:
+    """Infers types of expressions.
+
+    The module_names are the names bound at module level, which shadow
+    the builtins.
+    """
+    def __init__(self, module_names=()):
+        self.module_names = set(module_names)
+
+        # types of local variables by scope
+        self.envs = {}
+
+    def get_env(self, scope):
+        """Returns a dictionary with types of the local variables of scope."""
+        if scope is None or not scope.is_function():
+            return {}
+        if scope not in self.envs:
+            self.envs[scope] = self.infer(scope)
+        return self.envs[scope]
+
+    def infer(self, scope):
+        """Infers the types of the local variables of a function.
+
+        Types of the variables depend on each other, so they are computed
+        repeatedly, starting with PENDING, until they don't change anymore.
+        """
+        names = set(scope.get_vars())
+        env = dict((name, PENDING) for name in names)
+
+        changed = True
+        while changed:
+            changed = False
+            for name, node in scope.assignments:
+                if name not in names or env[name] is None:
+                    continue
+                t = join(env[name], self.typeof_assignment(name, node, scope, env))
+                if t != env[name]:
+                    env[name] = t
+                    changed = True
+
+        return dict((name, t) for name, t in env.items() if t not in (None, PENDING))
+
+    def typeof_assignment(self, name, node, scope, env):
+        if isinstance(node, ast.Assign):
+            return self._typeof(node.expr, scope, env)
+        elif isinstance(node, ast.AugAssign):
+            left = self._typeof(node.node, scope, env)
+            right = self._typeof(node.expr, scope, env)
+            t = self.typeof_binary(node.op[:-1], left, right)
+            if node.op == "/=" and t == INT:
+                # compiled to the javascript /=, which doesn't round
+                return NUMBER
+            return t
+        elif isinstance(node, ast.For):
+            return self.typeof_item(node.list, scope, env)
+        else:
+            return None
+
+    def typeof_item(self, node, scope, env):
+        """Returns the type of the items produced by iterating over node."""
+        if self.is_builtin_call(node, scope, ("range", "xrange")):
+            return INT
+        elif self._typeof(node, scope, env) == STR:
+            return STR
+        else:
+            return None
+
+    def typeof(self, node, scope):
+        """Returns the type of the expression node in scope or None if unknown."""
+        t = self._typeof(node, scope, self.get_env(scope))
+        if t is PENDING:
+            return None
+        return t
+
+    def _typeof(self, node, scope, env):
+        if isinstance(node, ast.Const):
+            if isinstance(node.value, bool):
+                return None
+            elif isinstance(node.value, (int, long)):
+                return INT
+            elif isinstance(node.value, float):
+                return FLOAT
+            elif isinstance(node.value, basestring):
+                return STR
+        elif isinstance(node, ast.Name):
+            return env.get(node.name)
+        elif isinstance(node, (ast.List, ast.ListComp)):
+            return LIST
+        elif isinstance(node, ast.Dict):
+            return DICT
+        elif isinstance(node, (ast.UnaryAdd, ast.UnarySub)):
+            t = self._typeof(node.expr, scope, env)
+            if t in NUMERIC_TYPES or t is PENDING:
+                return t
+        elif isinstance(node, (ast.Add, ast.Sub, ast.Mul, ast.Div, ast.FloorDiv, ast.Mod)):
+            left = self._typeof(node.left, scope, env)
+            right = self._typeof(node.right, scope, env)
+            return self.typeof_binary(BINARY_OPERATORS[node.__class__], left, right)
+        elif isinstance(node, ast.CallFunc):
+            f = node.node
+            if isinstance(f, ast.Name) and f.name in BUILTIN_TYPES and self.is_builtin(f.name, scope):
+                return BUILTIN_TYPES[f.name]
+            elif isinstance(f, ast.Getattr) and f.attrname in STR_METHODS:
+                t = self._typeof(f.expr, scope, env)
+                if t == STR:
+                    return STR_METHODS[f.attrname]
+                elif t is PENDING:
+                    return PENDING
+        elif isinstance(node, ast.Subscript):
+            if len(node.subs) == 1 and self._typeof(node.expr, scope, env) == STR:
+                return STR
+        return None
+
+    def typeof_binary(self, op, left, right):
+        if left is PENDING or right is PENDING:
+            return PENDING
+
+        if left in NUMERIC_TYPES and right in NUMERIC_TYPES:
+            if op == "/" and left == right == INT:
+                # python 2 division
+                return INT
+            else:
+                return numeric(left, right)
+        elif op == "+" and left == right and left in (STR, LIST):
+            return left
+        elif op == "*" and (left, right) in [(STR, INT), (INT, STR)]:
+            return STR
+        elif op == "*" and (left, right) in [(LIST, INT), (INT, LIST)]:
+            return LIST
+        elif op == "%" and left == STR:
+            return STR
+        return None
+
+    def is_builtin(self, name, scope):
+        """True if name refers to the builtin with that name in scope."""
+        s = scope
+        while s is not None:
+            if s.node is not None and not isinstance(s.node, ast.Module) and s.is_local(name):
+                return False
+            s = s.parent
+        return name not in self.module_names
+
+    def is_builtin_call(self, node, scope, names):
+        return (isinstance(node, ast.CallFunc)
+            and isinstance(node.node, ast.Name)
+            and node.node.name in names
+            and self.is_builtin(node.node.name, scope))
+
+BINARY_OPERATORS = ir.with_ir_classes({
+    ast.Add: "+",
+    ast.Sub: "-",
+    ast.Mul: "*",
+    ast.Div: "/",
+    ast.FloorDiv: "//",
+    ast.Mod: "%",
+})